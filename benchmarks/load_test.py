@@ -0,0 +1,260 @@
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from utils.synthetic_data import generate_users_db, SyntheticPriceProvider, stub_llm_provider
+from utils import stock_data, ai_advisor
+from utils import auth as auth_module
+from utils.auth import AuthManager
+from utils.analysis_cache import (get_cache, cached_stock_data, cached_indicators, cached_prediction,
+                                  cached_stock_analysis)
+from utils.chart_helper import create_stock_chart
+from utils.portfolio_manager import analyze_portfolio_health
+from utils.metrics import get_registry, span
+
+# The utils modules log every call at INFO; keep load test output readable
+logging.disable(logging.INFO)
+
+SYMBOLS = ["AAPL", "MSFT", "META", "GOOG", "AMZN", "NVDA", "COST", "QQQ"]
+# Periods long enough for the predictor's lookback window, so errors mean contention rather than short data
+PERIODS = ["6mo", "1y", "2y", "5y"]
+# Relative weight of each action in a session's click stream
+DEFAULT_MIX = {"market_analysis": 5, "portfolio_analysis": 1, "chat_post": 3, "chat_poll": 10}
+
+class RSSSampler:
+    """Background sampler of this process' resident set size, in MB"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start_mb = self.peak_mb = self.current_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+
+    @staticmethod
+    def current_mb():
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        # ru_maxrss is the peak, in KB on Linux; the best we can do without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self.current_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_mb = self.current_mb()
+        self.peak_mb = max(self.peak_mb, self.end_mb)
+        return False
+
+class Session:
+    """One simulated browser session: logs in, then clicks through a weighted mix of sections"""
+
+    def __init__(self, index, manager, config):
+        self.username = f"user{index % config['users']}"
+        self.manager = manager
+        self.config = config
+        self.rng = random.Random(config["seed"] + index)
+        self.last_message_id = -1
+
+    def login(self):
+        if not self.manager.verify_user(self.username, "benchmark"):
+            raise Exception(f"Login failed for {self.username}")
+
+    def market_analysis(self):
+        symbol, period = self.rng.choice(SYMBOLS), self.rng.choice(PERIODS)
+        self.manager.save_user_activity(self.username, "search", {"symbol": symbol, "period": period})
+        if self.config["no_cache"]:
+            hist, info = stock_data.get_stock_data(symbol, period)
+            df = stock_data.calculate_technical_indicators(hist)
+            from utils.ml_predictor import StockPredictor
+            StockPredictor().analyze_stock(hist)
+            ai_advisor.get_stock_analysis(info, stock_data.get_key_metrics(info))
+        else:
+            cached_stock_data(symbol, period)
+            df = cached_indicators(symbol, period)
+            cached_prediction(symbol, period)
+            cached_stock_analysis(symbol, period)
+        create_stock_chart(df).to_json()
+
+    def portfolio_analysis(self):
+        analyze_portfolio_health(self.rng.sample(SYMBOLS, 3))
+
+    def chat_post(self):
+        self.manager.save_chat_message(self.username, f"Load test message from {self.username}")
+        self.chat_poll()
+
+    def chat_poll(self):
+        # What the live chat fragment does every few seconds
+        messages = self.manager.get_messages_since(self.last_message_id, limit=50)
+        if messages:
+            self.last_message_id = messages[-1]["id"]
+
+def run_session(index, manager, config, mix):
+    """Play one session's click stream; returns (action, error) for every failed step"""
+    session = Session(index, manager, config)
+    actions, weights = zip(*mix.items())
+    steps = [("login", session.login)] + [
+        (action, getattr(session, action))
+        for action in session.rng.choices(actions, weights=weights, k=config["iterations"])
+    ]
+    errors = []
+    for name, step in steps:
+        try:
+            with span("load_test.action", action=name):
+                step()
+        except Exception as e:
+            errors.append((name, str(e)))
+    return errors
+
+def run_load_test(config, mix):
+    """Drive config['sessions'] concurrent sessions against a throwaway users DB and stub providers"""
+    workdir = tempfile.mkdtemp(prefix="vibro-load-")
+    db_path = os.path.join(workdir, "users.json")
+    with open(db_path, "w") as f:
+        json.dump(generate_users_db(config["users"], seed=config["seed"]), f, indent=4)
+
+    stock_data.set_price_provider(SyntheticPriceProvider(config["price_latency"]))
+    ai_advisor.set_llm_provider(stub_llm_provider(config["llm_latency"]))
+    get_cache().clear()
+    get_registry().reset()
+
+    errors = defaultdict(list)
+    try:
+        # Streamlit runs each session's script on its own thread against one cached AuthManager
+        manager = AuthManager(db_path)
+        with RSSSampler() as rss:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=config["sessions"], thread_name_prefix="session") as executor:
+                futures = [
+                    executor.submit(run_session, i, manager, config, mix)
+                    for i in range(config["sessions"])
+                ]
+                for future in futures:
+                    for name, error in future.result():
+                        errors[name].append(error)
+            elapsed = time.perf_counter() - start
+        snapshot = get_registry().snapshot()
+    finally:
+        stock_data.set_price_provider()
+        ai_advisor.set_llm_provider()
+        auth_module._chat_cache.pop(db_path, None)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    operations = {
+        row["labels"]["action"]: row for row in snapshot["spans"] if row["name"] == "load_test.action"
+    }
+    total = sum(row["count"] for row in operations.values())
+    lock_wait = [row for row in snapshot["spans"] if row["name"] == "AuthManager.lock_wait"]
+    return {
+        "config": config,
+        "mix": mix,
+        "elapsed_s": elapsed,
+        "actions": total,
+        "throughput_per_s": total / elapsed if elapsed else 0.0,
+        "operations": dict(sorted(operations.items())),
+        "errors": {name: {"count": len(messages), "sample": messages[:3]} for name, messages in errors.items()},
+        "lock_contention": {
+            "contended": sum(row["value"] for row in snapshot["counters"] if row["name"] == "auth_lock_contended"),
+            "wait": lock_wait[0] if lock_wait else None
+        },
+        "rss_mb": {"start": rss.start_mb, "end": rss.end_mb, "peak": rss.peak_mb, "growth": rss.end_mb - rss.start_mb},
+        "analysis_cache": get_cache().stats()
+    }
+
+def format_report(report):
+    lines = [
+        f"{report['config']['sessions']} sessions x {report['config']['iterations']} actions, "
+        f"{report['config']['users']} users in the DB",
+        f"{report['actions']} actions in {report['elapsed_s']:.2f}s = {report['throughput_per_s']:.1f} actions/s",
+        "",
+        f"{'operation':<22} {'count':>7} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10} {'errors':>7}"
+    ]
+    for name, row in report["operations"].items():
+        error_count = report["errors"].get(name, {}).get("count", 0)
+        lines.append(
+            f"{name:<22} {row['count']:>7} " +
+            " ".join(f"{row[field] * 1000:8.1f}ms" for field in ("mean", "p50", "p95", "p99", "max")) +
+            f" {error_count:>7}"
+        )
+    contention = report["lock_contention"]
+    wait = contention["wait"]
+    lines += [
+        "",
+        f"DB lock: {contention['contended']} contended acquisitions" +
+        (f", wait p95 {wait['p95'] * 1000:.1f}ms max {wait['max'] * 1000:.1f}ms" if wait else ""),
+        "RSS: {start:.0f}MB -> {end:.0f}MB (peak {peak:.0f}MB, growth {growth:+.0f}MB)".format(**report["rss_mb"]),
+        "Analysis cache: " + ", ".join(f"{k}={v}" for k, v in report["analysis_cache"].items())
+    ]
+    for name, error in report["errors"].items():
+        lines.append(f"{name} error sample: {error['sample'][0]}")
+    return "\n".join(lines)
+
+def parse_mix(text):
+    """'market_analysis=5,chat_post=1' -> weights, validated against DEFAULT_MIX"""
+    mix = {}
+    for part in text.split(","):
+        if not part:
+            continue
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown action {name!r}; choose from {list(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test: concurrent simulated sessions on stub providers")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions (one thread each)")
+    parser.add_argument("--iterations", type=int, default=20, help="Actions per session after login")
+    parser.add_argument("--users", type=int, default=1000, help="Accounts in the synthetic users DB")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="Action weights, e.g. market_analysis=5,portfolio_analysis=1,chat_post=3,chat_poll=10")
+    parser.add_argument("--price-latency", type=float, default=0.2, help="Seconds per stub price download")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds per stub LLM call")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the shared analysis cache")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Also write the full report to this file")
+    args = parser.parse_args()
+
+    config = {
+        "sessions": args.sessions,
+        "iterations": args.iterations,
+        "users": args.users,
+        "price_latency": args.price_latency,
+        "llm_latency": args.llm_latency,
+        "no_cache": args.no_cache,
+        "seed": args.seed
+    }
+    report = run_load_test(config, args.mix)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nReport written to {args.json}")
+
+if __name__ == "__main__":
+    main()
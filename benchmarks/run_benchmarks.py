@@ -0,0 +1,226 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+from utils.synthetic_data import generate_ohlcv, generate_universe, generate_users_db
+from utils.stock_data import calculate_technical_indicators, calculate_rsi
+from utils.ml_predictor import StockPredictor
+from utils.chart_helper import create_stock_chart, create_comparison_chart
+from utils import auth as auth_module
+from utils.auth import AuthManager
+
+# The utils modules log every call at INFO; keep benchmark output readable
+logging.disable(logging.INFO)
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "baseline.json")
+SUITES = ["indicators", "predictor", "charts", "auth"]
+# Changes smaller than this many seconds are treated as noise, whatever the ratio
+NOISE_FLOOR = 0.001
+
+def measure(name, func, repeat=5, setup=None, **params):
+    """Time func over repeat runs; setup (untimed) returns the args for each run"""
+    timings = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return {
+        "name": name,
+        "params": params,
+        "repeat": repeat,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+        "max_s": max(timings)
+    }
+
+def bench_indicators(config):
+    hist = generate_ohlcv(config["days"], seed=config["seed"])
+    params = {"days": config["days"]}
+    return [
+        measure("calculate_technical_indicators", calculate_technical_indicators,
+                config["repeat"], setup=lambda: (hist.copy(),), **params),
+        measure("calculate_rsi", calculate_rsi, config["repeat"], setup=lambda: (hist["Close"],), **params)
+    ]
+
+def bench_predictor(config):
+    hist = generate_ohlcv(config["days"], seed=config["seed"])
+    return [
+        measure("StockPredictor.analyze_stock", lambda data: StockPredictor().analyze_stock(data),
+                max(config["repeat"] // 2, 1), setup=lambda: (hist,), days=config["days"])
+    ]
+
+def bench_charts(config):
+    df = calculate_technical_indicators(generate_ohlcv(config["days"], seed=config["seed"]))
+    universe = generate_universe(config["symbols"], config["days"], seed=config["seed"])
+    return [
+        measure("create_stock_chart+to_json", lambda data: create_stock_chart(data).to_json(),
+                config["repeat"], setup=lambda: (df,), days=config["days"]),
+        measure("create_comparison_chart+to_json", lambda data: create_comparison_chart(data, "1y").to_json(),
+                config["repeat"], setup=lambda: (universe,), days=config["days"], symbols=config["symbols"])
+    ]
+
+def bench_auth(config):
+    results = []
+    for n_users in config["users"]:
+        workdir = tempfile.mkdtemp(prefix="vibro-bench-")
+        try:
+            db_path = os.path.join(workdir, "users.json")
+            with open(db_path, "w") as f:
+                json.dump(generate_users_db(n_users, seed=config["seed"]), f, indent=4)
+            manager = AuthManager(db_path)
+            repeat = config["repeat"] if n_users <= 1000 else max(config["repeat"] // 2, 1)
+            params = {"users": n_users, "db_mb": round(os.path.getsize(db_path) / 1e6, 2)}
+
+            def uncached():
+                auth_module._chat_cache.pop(db_path, None)
+                return ()
+
+            results += [
+                measure("AuthManager.verify_user", manager.verify_user, repeat,
+                        setup=lambda: ("user0", "benchmark"), **params),
+                measure("AuthManager.get_search_history", manager.get_search_history, repeat,
+                        setup=lambda: ("user0",), **params),
+                measure("AuthManager.save_user_activity", manager.save_user_activity, repeat,
+                        setup=lambda: ("user0", "search", {"symbol": "AAPL", "period": "1y"}), **params),
+                measure("AuthManager.save_chat_message", manager.save_chat_message, repeat,
+                        setup=lambda: ("user0", "benchmark message"), **params),
+                measure("AuthManager.get_chat_messages (cold)", manager.get_chat_messages, repeat,
+                        setup=uncached, **params),
+                measure("AuthManager.get_latest_message_id (warm)", manager.get_latest_message_id, repeat, **params)
+            ]
+        finally:
+            auth_module._chat_cache.clear()
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+SUITE_FUNCTIONS = {
+    "indicators": bench_indicators,
+    "predictor": bench_predictor,
+    "charts": bench_charts,
+    "auth": bench_auth
+}
+
+def run_benchmarks(config, suites=None):
+    """Run the selected suites and return a results document"""
+    results = []
+    for suite in suites or SUITES:
+        suite_start = time.perf_counter()
+        for result in SUITE_FUNCTIONS[suite](config):
+            result["suite"] = suite
+            results.append(result)
+        print(f"  {suite:<12} done in {time.perf_counter() - suite_start:.1f}s", file=sys.stderr)
+    return {
+        "created_at": datetime.now().isoformat(),
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__
+        },
+        "results": results
+    }
+
+def _result_key(result):
+    return result["name"], json.dumps({k: v for k, v in result["params"].items() if k != "db_mb"}, sort_keys=True)
+
+def compare_results(current, baseline, threshold=0.25):
+    """Median-time ratio of every benchmark present in both runs; flags slowdowns beyond threshold"""
+    baseline_by_key = {_result_key(result): result for result in baseline["results"]}
+    comparisons = []
+    for result in current["results"]:
+        previous = baseline_by_key.get(_result_key(result))
+        if previous is None:
+            continue
+        ratio = result["median_s"] / previous["median_s"] if previous["median_s"] > 0 else float("inf")
+        delta = result["median_s"] - previous["median_s"]
+        comparisons.append({
+            "name": result["name"],
+            "params": result["params"],
+            "baseline_s": previous["median_s"],
+            "current_s": result["median_s"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold and delta > NOISE_FLOOR,
+            "improvement": ratio < 1 / (1 + threshold) and -delta > NOISE_FLOOR
+        })
+    return comparisons
+
+def format_results(document, comparisons=None):
+    by_key = {(c["name"], json.dumps(c["params"], sort_keys=True)): c for c in comparisons or []}
+    lines = [f"{'benchmark':<44} {'params':<34} {'median':>10} {'min':>10}  vs baseline"]
+    for result in document["results"]:
+        params = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+        comparison = by_key.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        flag = ""
+        if comparison:
+            flag = f"x{comparison['ratio']:.2f}"
+            flag += "  REGRESSION" if comparison["regression"] else "  improved" if comparison["improvement"] else ""
+        lines.append(
+            f"{result['name']:<44} {params:<34} {result['median_s'] * 1000:8.2f}ms {result['min_s'] * 1000:8.2f}ms  {flag}"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the utils package on synthetic data")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated subset of {SUITES}")
+    parser.add_argument("--days", type=int, default=756, help="Trading days per synthetic history")
+    parser.add_argument("--symbols", type=int, default=4, help="Symbols in the comparison chart")
+    parser.add_argument("--users", default="10,1000,100000", help="Comma-separated user counts for AuthManager")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--quick", action="store_true", help="Small sizes for a fast smoke run")
+    parser.add_argument("--output", help="Results file (defaults to benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write these results as the baseline")
+    args = parser.parse_args()
+
+    config = {
+        "days": 252 if args.quick else args.days,
+        "symbols": args.symbols,
+        "users": [10, 1000] if args.quick else [int(n) for n in args.users.split(",") if n],
+        "repeat": 3 if args.quick else args.repeat,
+        "seed": args.seed
+    }
+    document = run_benchmarks(config, [suite for suite in args.suites.split(",") if suite])
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=4)
+
+    comparisons = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            comparisons = compare_results(document, json.load(f), args.threshold)
+    print(format_results(document, comparisons))
+    print(f"\nResults written to {output}")
+
+    if args.save_baseline:
+        shutil.copyfile(output, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+
+    regressions = [c for c in comparisons if c["regression"]]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%} against the baseline")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
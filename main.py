@@ -1,22 +1,64 @@
 import streamlit as st
-import pandas as pd
-from utils.stock_data import get_stock_data, get_multiple_stocks_data, get_key_metrics, format_large_number, calculate_technical_indicators
-from utils.ai_advisor import get_stock_analysis, ask_follow_up_question, suggest_stocks
-from utils.chart_helper import create_stock_chart, create_comparison_chart
-from utils.portfolio_manager import generate_portfolio_recommendation, analyze_portfolio_health
-from utils.goal_planner import FinancialGoal, analyze_goal_feasibility, generate_investment_plan
 from utils.auth import AuthManager
-from utils.ml_predictor import StockPredictor # Added import
+from utils.lazy_loader import lazy_import, lazy_attr
 from datetime import datetime # Added import
 from pages_hidden.auth import init_auth, login_page, logout  # Re-added import
 import logging
+import os
+import time
+from utils.metrics import span, get_registry, start_from_env as start_metrics_exporters
+from utils.profiling import request_profiler, annotate_profile, list_profiles, PROFILE_DIR
 from utils.education_manager import EducationManager  # Add this import
-import pytz
+
+# Heavy dependencies (pandas, plotly, sklearn, Gemini, yfinance) load on first use,
+# so the login page only needs streamlit and the auth module
+pd = lazy_import("pandas")
+pytz = lazy_import("pytz")
+get_key_metrics = lazy_attr("utils.stock_data", "get_key_metrics")
+format_metric = lazy_attr("utils.stock_data", "format_metric")
+metrics_table = lazy_attr("utils.fundamentals", "metrics_table")
+suggest_stocks = lazy_attr("utils.ai_advisor", "suggest_stocks")
+create_stock_chart = lazy_attr("utils.chart_helper", "create_stock_chart")
+create_comparison_chart = lazy_attr("utils.chart_helper", "create_comparison_chart")
+generate_portfolio_recommendation = lazy_attr("utils.portfolio_manager", "generate_portfolio_recommendation")
+analyze_portfolio_health = lazy_attr("utils.portfolio_manager", "analyze_portfolio_health")
+FinancialGoal = lazy_attr("utils.goal_planner", "FinancialGoal")
+GoalBatch = lazy_attr("utils.goal_planner", "GoalBatch")
+analyze_goal_feasibility = lazy_attr("utils.goal_planner", "analyze_goal_feasibility")
+generate_investment_plan = lazy_attr("utils.goal_planner", "generate_investment_plan")
+plan_goals = lazy_attr("utils.goal_simulator", "plan_goals")
+get_latest_prices = lazy_attr("utils.rebalancer", "get_latest_prices")
+plan_trades = lazy_attr("utils.rebalancer", "plan_trades")
+cached_stock_data = lazy_attr("utils.analysis_cache", "cached_stock_data")
+cached_multiple_stocks_data = lazy_attr("utils.analysis_cache", "cached_multiple_stocks_data")
+cached_indicators = lazy_attr("utils.analysis_cache", "cached_indicators")
+cached_prediction = lazy_attr("utils.analysis_cache", "cached_prediction")
+cached_stock_analysis = lazy_attr("utils.analysis_cache", "cached_stock_analysis")
+stream_follow_up_answer = lazy_attr("utils.analysis_cache", "stream_follow_up_answer")
+stock_data_as_of = lazy_attr("utils.analysis_cache", "stock_data_as_of")
+provider_status = lazy_attr("utils.provider_health", "provider_status")
+available_formats = lazy_attr("utils.export", "available_formats")
+export_filename = lazy_attr("utils.export", "export_filename")
+export_frame = lazy_attr("utils.export", "export_frame")
+export_archive = lazy_attr("utils.export", "export_archive")
+export_mime = lazy_attr("utils.export", "export_mime")
+get_symbol_directory = lazy_attr("utils.symbol_directory", "get_symbol_directory")
+normalize_symbol = lazy_attr("utils.symbol_directory", "normalize_symbol")
+screener = lazy_import("utils.screener")
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# How long the header reuses a session's notification list before re-reading the database
+NOTIFICATION_REFRESH_SECONDS = 60
+
+# Investor Chat polling interval and number of messages kept on screen
+CHAT_POLL_SECONDS = 3
+CHAT_HISTORY_LIMIT = 50
+
+NAV_OPTIONS = ["Market Analysis", "Portfolio Management", "Goal Planning", "Education", "Investor Chat"]
+
 
 # Page configuration
 st.set_page_config(
@@ -33,29 +75,124 @@ st.set_page_config(
 with open('styles/custom.css') as f:
     st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
 
-# Initialize authentication state
-init_auth()
 
-# Initialize session states
-if "analyze" not in st.session_state:
-    st.session_state.analyze = False
-if "symbols" not in st.session_state:
-    st.session_state.symbols = []
-if "portfolio_update" not in st.session_state:
-    st.session_state.portfolio_update = None
-if "goal_update" not in st.session_state:
-    st.session_state.goal_update = None
-if "show_notifications" not in st.session_state:
-    st.session_state.show_notifications = False
+@st.cache_resource
+def get_auth_manager():
+    """One AuthManager shared by every session instead of one per rerun"""
+    return AuthManager()
 
-# Check authentication
-if not st.session_state.authenticated:
-    login_page()
-else:
-    # Initialize AuthManager for user activity tracking
-    auth_manager = AuthManager()
-    logger.info(f"User {st.session_state.username} logged in.")
-    # Header with user greeting and logout
+
+@st.cache_resource
+def start_prefetch_scheduler():
+    """Start the background cache warm-up once per process (disable with PREFETCH_ENABLED=0)"""
+    from utils.prefetch import scheduler_from_env
+    scheduler = scheduler_from_env()
+    return scheduler.start() if scheduler else None
+
+
+@st.cache_resource
+def start_fundamentals_refresh():
+    """Refresh stale key metrics on their own schedule, separate from price data (FUNDAMENTALS_REFRESH_INTERVAL)"""
+    from utils.fundamentals import get_fundamentals_store
+    return get_fundamentals_store().start()
+
+
+@st.cache_resource
+def start_metrics():
+    """Start the metrics endpoint / JSON exporter once per process if configured"""
+    return start_metrics_exporters()
+
+
+@st.cache_resource
+def get_education_manager():
+    """One EducationManager shared by every session"""
+    return EducationManager()
+
+
+def get_notifications(auth_manager, refresh=False):
+    """The user's notifications, re-read from the database at most once per refresh window"""
+    cached = st.session_state.get("notifications_cache")
+    if refresh or cached is None or time.time() - cached[0] > NOTIFICATION_REFRESH_SECONDS:
+        cached = (time.time(), auth_manager.get_notifications(st.session_state.username))
+        st.session_state.notifications_cache = cached
+    return cached[1]
+
+
+def mark_notification_read(auth_manager, notification_id):
+    """Mark a notification as read and drop the session's cached list"""
+    if auth_manager.mark_notification_as_read(st.session_state.username, notification_id):
+        st.session_state.pop("notifications_cache", None)
+        return True
+    return False
+
+
+def get_search_history(auth_manager):
+    """The user's search history, read once per session and kept in step with new searches"""
+    if "search_history" not in st.session_state:
+        st.session_state.search_history = auth_manager.get_search_history(st.session_state.username)
+    return st.session_state.search_history
+
+
+def record_search(auth_manager, symbol, period):
+    """Save a search to the database and to the session's copy of the history"""
+    if auth_manager.save_user_activity(st.session_state.username, "search", {"symbol": symbol, "period": period}):
+        get_search_history(auth_manager).append({
+            "timestamp": datetime.now().isoformat(),
+            "symbol": symbol,
+            "period": period
+        })
+
+
+@st.fragment
+def render_notification_bell(auth_manager):
+    """Notification bell and popup; toggling or marking read only reruns this fragment"""
+    notifications = get_notifications(auth_manager)
+    unread_count = len([n for n in notifications if not n['read']])
+
+    if notifications:
+        notification_button = f"🔔 {unread_count}" if unread_count > 0 else "🔔"
+        if st.button(notification_button, key="notification_bell"):
+            st.session_state.show_notifications = not st.session_state.get('show_notifications', False)
+    else:
+        st.button("🔔", key="notification_bell", disabled=True)
+
+    # Show notifications popup when clicked
+    if st.session_state.get('show_notifications', False) and notifications:
+        with st.container():
+            st.markdown("""
+                <style>
+                .notification-popup {
+                    position: fixed;
+                    top: 60px;
+                    right: 20px;
+                    max-width: 300px;
+                    z-index: 1000;
+                    background: var(--secondary-background-color);
+                    border-radius: 8px;
+                    box-shadow: 0 4px 12px rgba(0,0,0,0.15);
+                    padding: 1rem;
+                }
+                </style>
+                <div class="notification-popup">
+            """, unsafe_allow_html=True)
+
+            for notification in notifications:
+                if not notification['read']:
+                    st.markdown(f"""
+                        <div style='background-color: rgba(0, 171, 65, 0.1); padding: 10px; border-radius: 5px; margin: 5px 0;'>
+                            <small style='color: #00AB41'>From ViBro finance:</small><br>
+                            {notification['message']}
+                        </div>
+                    """, unsafe_allow_html=True)
+                    if st.button("Mark as Read", key=f"notify_{notification['id']}"):
+                        if mark_notification_read(auth_manager, notification["id"]):
+                            st.rerun(scope="fragment")
+
+            st.markdown("</div>", unsafe_allow_html=True)
+
+
+def render_header(auth_manager):
+    """Greeting, notification bell and logout button"""
     col1, col2, col3 = st.columns([3, 0.5, 0.5])
     with col1:
         st.title("📈 ViBro Finance")
@@ -63,60 +200,21 @@ else:
 
     # Add notification bell in the middle column
     with col2:
-        notifications = auth_manager.get_notifications(st.session_state.username)
-        unread_count = len([n for n in notifications if not n['read']])
-
-        if notifications:
-            notification_button = f"🔔 {unread_count}" if unread_count > 0 else "🔔"
-            if st.button(notification_button, key="notification_bell"):
-                st.session_state.show_notifications = not st.session_state.get('show_notifications', False)
-        else:
-            st.button("🔔", key="notification_bell", disabled=True)
-
-        # Show notifications popup when clicked
-        if st.session_state.get('show_notifications', False) and notifications:
-            with st.container():
-                st.markdown("""
-                    <style>
-                    .notification-popup {
-                        position: fixed;
-                        top: 60px;
-                        right: 20px;
-                        max-width: 300px;
-                        z-index: 1000;
-                        background: var(--secondary-background-color);
-                        border-radius: 8px;
-                        box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-                        padding: 1rem;
-                    }
-                    </style>
-                    <div class="notification-popup">
-                """, unsafe_allow_html=True)
-
-                for notification in notifications:
-                    if not notification['read']:
-                        st.markdown(f"""
-                            <div style='background-color: rgba(0, 171, 65, 0.1); padding: 10px; border-radius: 5px; margin: 5px 0;'>
-                                <small style='color: #00AB41'>From ViBro finance:</small><br>
-                                {notification['message']}
-                            </div>
-                        """, unsafe_allow_html=True)
-                        if st.button("Mark as Read", key=f"notify_{notification['id']}"):
-                            if auth_manager.mark_notification_as_read(st.session_state.username, notification["id"]):
-                                st.rerun()
-
-                st.markdown("</div>", unsafe_allow_html=True)
+        render_notification_bell(auth_manager)
 
     # Logout button in the last column
     with col3:
         if st.button("Logout", key="logout"):
+            for key in ("notifications_cache", "search_history", "chat_view"):
+                st.session_state.pop(key, None)
             logout()
 
-    # Navigation
-    nav_options = ["Market Analysis", "Portfolio Management", "Goal Planning", "Education", "Investor Chat"]
+
+def render_nav():
+    """Section buttons; returns the active section"""
     st.markdown("<div class='nav-container'>", unsafe_allow_html=True)
-    cols = st.columns(5)  # Updated to 5 columns
-    for i, option in enumerate(nav_options):
+    cols = st.columns(len(NAV_OPTIONS))
+    for i, option in enumerate(NAV_OPTIONS):
         with cols[i]:
             if st.button(
                 option,
@@ -128,760 +226,1232 @@ else:
     st.markdown("</div>", unsafe_allow_html=True)
 
     # Get current section from URL parameters
-    section = st.query_params.get("section", "Market Analysis")
+    return st.query_params.get("section", "Market Analysis")
+
+
+def render_market_analysis(auth_manager):
+    analysis_type = st.radio(
+        "Select Analysis Type",
+        ["Single Stock", "Compare Stocks", "Screener"],
+        horizontal=True
+    )
+
+    if analysis_type == "Screener":
+        render_screener()
+        return
+
+    if analysis_type == "Single Stock":
+        symbol = st.text_input("Enter Stock Symbol", value="AAPL").upper() # Changed default value
+        render_symbol_hint(symbol)
+        symbols = [symbol]
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        symbols = []
+        with col1:
+            symbol1 = st.text_input("Stock Symbol 1")
+            render_symbol_hint(symbol1)
+            if symbol1: symbols.append(symbol1.upper())
+        with col2:
+            symbol2 = st.text_input("Stock Symbol 2")
+            render_symbol_hint(symbol2)
+            if symbol2: symbols.append(symbol2.upper())
+        with col3:
+            symbol3 = st.text_input("Stock Symbol 3")
+            render_symbol_hint(symbol3)
+            if symbol3: symbols.append(symbol3.upper())
+        with col4:
+            symbol4 = st.text_input("Stock Symbol 4")
+            render_symbol_hint(symbol4)
+            if symbol4: symbols.append(symbol4.upper())
+
+    time_period = st.select_slider(
+        "Select Time Period",
+        ["1mo", "3mo", "6mo", "1y", "2y", "5y"],
+        value="1y"
+    )
+
+    if st.button("Analyze", type="primary"):
+        st.session_state.analyze = True
+        st.session_state.symbols = symbols
+        # Add activity tracking for searches
+        for symbol in st.session_state.symbols:
+            record_search(auth_manager, symbol, time_period)
+
+    # Show recent searches
+    with st.expander("Recent Searches"):
+        history = get_search_history(auth_manager)
+        if history:
+            for search in reversed(history[-5:]):  # Show last 5 searches
+                st.write(f"🔍 {search['symbol']} ({search['period']}) - {search['timestamp']}")
+        else:
+            st.write("No recent searches")
+
+    if st.session_state.analyze and len(st.session_state.symbols) > 0:
+        if analysis_type == "Single Stock":
+            render_single_stock(symbols[0], time_period)
+        else:
+            render_comparison(time_period)
 
-    # Main content
-    try:
-        if section == "Market Analysis":
-            analysis_type = st.radio(
-                "Select Analysis Type",
-                ["Single Stock", "Compare Stocks"],
-                horizontal=True
-            )
 
-            if analysis_type == "Single Stock":
-                symbol = st.text_input("Enter Stock Symbol", value="AAPL").upper() # Changed default value
-                symbols = [symbol]
+def render_screener():
+    snapshot = screener.get_snapshot()
+    refresh_cols = st.columns([3, 1])
+    with refresh_cols[0]:
+        if snapshot is None:
+            st.info("The screener has no data yet. Load the symbol universe to start screening.")
+        else:
+            st.caption(f"{len(snapshot)} symbols · data as of {format_timestamp(datetime.fromtimestamp(snapshot.built_at, tz=pytz.UTC))}")
+    with refresh_cols[1]:
+        if st.button("Refresh screener data" if snapshot else "Load screener data",
+                     disabled=screener.refresh_in_progress()):
+            # Shared background build: repeated clicks from any session join the one in progress
+            screener.refresh_snapshot(wait=False)
+    if screener.refresh_in_progress():
+        render_screener_refresh_status()
+    if snapshot is None or len(snapshot) == 0:
+        return
+
+    labels = screener.NUMERIC_COLUMNS
+    filters = []
+    sectors = st.multiselect("Sectors", snapshot.category_values("sector"))
+    if sectors:
+        filters.append(("sector", "in", sectors))
+    columns = st.multiselect("Filter on", list(labels), default=["rsi", "pe_ratio"], format_func=labels.get)
+    for column in columns:
+        filter_cols = st.columns([2, 1, 2])
+        filter_cols[0].markdown(f"**{labels[column]}**")
+        op = filter_cols[1].selectbox("Operator", screener.OPERATORS, key=f"screen_op_{column}",
+                                      label_visibility="collapsed")
+        if op == "between":
+            low, high = filter_cols[2].columns(2)
+            value = (low.number_input("From", value=0.0, key=f"screen_low_{column}"),
+                     high.number_input("To", value=100.0, key=f"screen_high_{column}"))
+        else:
+            value = filter_cols[2].number_input("Value", value=30.0, key=f"screen_value_{column}",
+                                                label_visibility="collapsed")
+        filters.append((column, op, value))
+
+    rank_cols = st.columns(3)
+    sort_by = rank_cols[0].selectbox("Rank by", list(labels), index=list(labels).index("market_cap"),
+                                     format_func=labels.get)
+    descending = rank_cols[1].radio("Order", ["Highest first", "Lowest first"], horizontal=True) == "Highest first"
+    limit = rank_cols[2].number_input("Show", min_value=5, max_value=500, value=50, step=5)
+
+    results = snapshot.query(filters, sort_by=sort_by, descending=descending, limit=int(limit))
+    st.markdown(f"### {results.attrs['matches']} matching stocks")
+    st.dataframe(results.rename(columns={**labels, **screener.CATEGORY_COLUMNS}).round(2),
+                 use_container_width=True)
+
+
+@st.fragment(run_every=2)
+def render_screener_refresh_status():
+    """Polls the background screener build and reruns the page once the new snapshot is in"""
+    if screener.refresh_in_progress():
+        st.info("Loading prices and metrics for the symbol universe in the background...")
+    else:
+        st.rerun()
+
+
+def render_symbol_hint(symbol):
+    """Company name under a known ticker, close matches under an unknown one (local lookup, no download)"""
+    if not symbol:
+        return
+    directory = get_symbol_directory()
+    record = directory.lookup(symbol)
+    if record:
+        st.caption(f"{record['name']} · {record['exchange']} · {record['sector']}")
+        return
+    matches = directory.search(symbol, limit=5)
+    if matches:
+        st.caption("Not in the symbol directory. Did you mean: " + ", ".join(
+            f"{match['symbol']} ({match['name']})" for match in matches
+        ))
+    else:
+        st.caption("Not in the symbol directory")
+
+
+def render_single_stock(symbol, time_period):
+    annotate_profile(symbol=symbol, period=time_period)
+    with st.spinner(f'Fetching data for {symbol}...'):
+        # Get stock data (shared with other sessions and the prefetch scheduler)
+        _, stock_info = cached_stock_data(symbol, time_period)
+        render_data_as_of([symbol], time_period)
+        metrics = get_key_metrics(stock_info)
+
+        # Calculate technical indicators
+        df = cached_indicators(symbol, time_period)
+
+        # Generate price predictions
+        with st.spinner('Generating price predictions...'):
+            try:
+                predictions, confidence = cached_prediction(symbol, time_period)
+
+                # Show prediction confidence
+                st.info(f"""
+                    **ML Prediction Confidence:**
+                    - Model Accuracy: {confidence['test_score']:.2%}
+                    - Prediction Quality: {confidence['prediction_quality']}
+                    - Model: {confidence['model'].replace('_', ' ').title()}
+                    - Predicting next {len(predictions)} trading days
+                """)
+            except Exception as e:
+                st.warning(f"Could not generate predictions: {str(e)}")
+                predictions = None
+
+        # Two-column layout
+        col_data, col_ai = st.columns([1, 1])
+
+        with col_data:
+            # Company header
+            st.markdown(f"## {stock_info.get('longName', symbol)}")
+            st.markdown(f"*{stock_info.get('sector', '')} | {stock_info.get('industry', '')}*")
+
+            current_price = stock_info.get('currentPrice', 0)
+            price_change = stock_info.get('regularMarketChangePercent', 0)
+            price_color = "stock-up" if price_change >= 0 else "stock-down"
+
+            # Show current price and predicted price if available
+            if predictions is not None:
+                predicted_price = predictions['Predicted_Close'].iloc[-1]
+                predicted_change = ((predicted_price - current_price) / current_price) * 100
+                predicted_color = "stock-up" if predicted_change >= 0 else "stock-down"
+
+                st.markdown(f"""
+                    <div class='price-display'>
+                        <h2>${current_price:.2f}</h2>
+                        <p class='{price_color}'>{price_change:+.2f}%</p>
+                        <p>Predicted (30d): <span class='{predicted_color}'>${predicted_price:.2f} ({predicted_change:+.2f}%)</span></p>
+                    </div>
+                """, unsafe_allow_html=True)
             else:
-                col1, col2, col3, col4 = st.columns(4)
-                symbols = []
-                with col1:
-                    symbol1 = st.text_input("Stock Symbol 1")
-                    if symbol1: symbols.append(symbol1.upper())
-                with col2:
-                    symbol2 = st.text_input("Stock Symbol 2")
-                    if symbol2: symbols.append(symbol2.upper())
-                with col3:
-                    symbol3 = st.text_input("Stock Symbol 3")
-                    if symbol3: symbols.append(symbol3.upper())
-                with col4:
-                    symbol4 = st.text_input("Stock Symbol 4")
-                    if symbol4: symbols.append(symbol4.upper())
-
-            time_period = st.select_slider(
-                "Select Time Period",
-                ["1mo", "3mo", "6mo", "1y", "2y", "5y"],
-                value="1y"
+                st.markdown(f"""
+                    <div class='price-display'>
+                        <h2>${current_price:.2f}</h2>
+                        <p class='{price_color}'>{price_change:+.2f}%</p>
+                    </div>
+                """, unsafe_allow_html=True)
+
+            # Key metrics
+            st.markdown("### Key Metrics")
+            metric_cols = st.columns(2)
+            for i, (metric, value) in enumerate(metrics.items()):
+                with metric_cols[i % 2]:
+                    st.markdown(f"""
+                        <div class='metric-card'>
+                            <h4>{metric}</h4>
+                            <p>{format_metric(metric, value)}</p>
+                        </div>
+                    """, unsafe_allow_html=True)
+
+            # Stock chart
+            st.markdown("### Technical Analysis")
+            fig = create_stock_chart(df)
+            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True})
+
+        with col_ai:
+            st.markdown("### ViBro Insights")
+            with st.spinner('Generating ViBro analysis...'):
+                analysis = cached_stock_analysis(symbol, time_period)
+
+                if 'error' in analysis:
+                    st.error(analysis['error'])
+                else:
+                    st.markdown(f"""
+                        <div class='ai-insight'>
+                            <h4>Summary</h4>
+                            <p>{analysis['summary']}</p>
+                        </div>
+                    """, unsafe_allow_html=True)
+
+                    with st.expander("Strengths & Risks", expanded=True):
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.markdown("#### Strengths")
+                            for strength in analysis['strengths']:
+                                st.markdown(f"✅ {strength}")
+
+                        with col2:
+                            st.markdown("#### Risks")
+                            for risk in analysis['risks']:
+                                st.markdown(f"⚠️ {risk}")
+
+                    st.markdown("#### Recommendation")
+                    st.info(analysis['recommendation'])
+
+                    render_stock_questions(symbol, time_period, analysis['suggested_questions'])
+
+        # Export data moved to data column
+        with col_data:
+            with st.expander("Export Data"):
+                render_export({f"{symbol}_stock_data": df}, key=f"single_{symbol}_{time_period}")
+
+
+@st.fragment
+def render_stock_questions(symbol, time_period, suggested_questions):
+    """Follow-up questions; asking one reruns only this fragment, not the data fetch and model fit"""
+    # Interactive AI Chat
+    st.markdown("### Ask ViBro Finance")
+
+    # Suggested questions
+    st.markdown("#### Suggested Questions")
+    for question in suggested_questions:
+        if st.button(question, key=f"q_{question}"):
+            render_answer_stream(stream_follow_up_answer(symbol, time_period, question))
+
+    # Custom questions
+    custom_question = st.text_input("Ask your own question:")
+    if st.button("Ask") and custom_question:
+        render_answer_stream(stream_follow_up_answer(symbol, time_period, custom_question))
+
+
+def render_answer_stream(chunks):
+    """Show an answer as its pieces arrive; a rerun (e.g. navigating away) stops the stream mid-answer"""
+    from utils.ai_advisor import FollowUpUnavailable
+    placeholder = st.empty()
+    placeholder.markdown("<div class='ai-insight'><p><em>Analyzing...</em></p></div>", unsafe_allow_html=True)
+    answer = ""
+    try:
+        for chunk in chunks:
+            answer += chunk
+            placeholder.markdown(f"""
+                <div class='ai-insight'>
+                    <p>{answer}▌</p>
+                </div>
+            """, unsafe_allow_html=True)
+    except FollowUpUnavailable as e:
+        # Replace the partial answer rather than appending the apology to it
+        placeholder.error(str(e))
+        return None
+    placeholder.markdown(f"""
+        <div class='ai-insight'>
+            <p>{answer}</p>
+        </div>
+    """, unsafe_allow_html=True)
+    return answer
+
+
+def render_data_as_of(symbols, time_period):
+    """When the prices shown were fetched, with a warning for any served from cache past their refresh time"""
+    freshness = {symbol: stock_data_as_of(symbol, time_period) for symbol in symbols}
+    fetched = [as_of["fetched_at"] for as_of in freshness.values() if as_of]
+    if not fetched:
+        return
+    stale = [symbol for symbol, as_of in freshness.items() if as_of and as_of["stale"]]
+    oldest = format_timestamp(datetime.fromtimestamp(min(fetched), tz=pytz.UTC))
+    if stale:
+        st.warning(f"Market data is refreshing; showing {', '.join(stale)} as of {oldest}.")
+    else:
+        st.caption(f"Data as of {oldest}")
+
+
+def render_comparison(time_period):
+    with st.spinner('Fetching data for comparison...'):
+        stock_data = cached_multiple_stocks_data(st.session_state.symbols, time_period)
+        render_data_as_of(list(stock_data), time_period)
+
+        # Create comparison chart
+        st.markdown("### Stock Price Comparison")
+        comparison_fig = create_comparison_chart(stock_data, time_period)
+        st.plotly_chart(comparison_fig, use_container_width=True)
+
+        # Display key metrics comparison
+        with st.expander("Key Metrics Comparison", expanded=True):
+            # Typed columns from the fundamentals store; formatting happens only in the Styler
+            metrics_df = metrics_table(list(stock_data), infos={symbol: data['info'] for symbol, data in stock_data.items()})
+            metric_names = [column for column in metrics_df.columns if column not in ('Company', 'updated_at')]
+            st.dataframe(
+                metrics_df[['Company'] + metric_names].style.format(
+                    {metric: (lambda value, metric=metric: format_metric(metric, value)) for metric in metric_names}
+                ),
+                use_container_width=True
             )
 
-            if st.button("Analyze", type="primary"):
-                st.session_state.analyze = True
-                st.session_state.symbols = symbols
-                # Add activity tracking for searches
-                if 'analyze' in st.session_state and st.session_state.analyze:
-                    for symbol in st.session_state.symbols:
-                        auth_manager.save_user_activity(
-                            st.session_state.username,
-                            "search",
-                            {"symbol": symbol, "period": time_period}
-                        )
+        # Export data
+        with st.expander("Export Data"):
+            render_export(
+                {f"{symbol}_stock_data": data['history'] for symbol, data in stock_data.items()},
+                key=f"compare_{'_'.join(stock_data)}_{time_period}",
+                archive_name=f"comparison_{time_period}"
+            )
 
-        # Show recent searches
-        with st.expander("Recent Searches"):
-            history = auth_manager.get_search_history(st.session_state.username)
-            if history:
-                for search in reversed(history[-5:]):  # Show last 5 searches
-                    st.write(f"🔍 {search['symbol']} ({search['period']}) - {search['timestamp']}")
-            else:
-                st.write("No recent searches")
-
-        if section == "Market Analysis":
-            if st.session_state.analyze and len(st.session_state.symbols) > 0:
-                if analysis_type == "Single Stock":
-                    with st.spinner(f'Fetching data for {symbols[0]}...'):
-                        # Get stock data
-                        hist_data, stock_info = get_stock_data(symbols[0], time_period)
-                        metrics = get_key_metrics(stock_info)
-
-                        # Calculate technical indicators
-                        df = calculate_technical_indicators(hist_data)
-
-                        # Generate price predictions
-                        predictor = StockPredictor()
-                        with st.spinner('Generating price predictions...'):
-                            try:
-                                predictions, confidence = predictor.analyze_stock(hist_data)
-
-                                # Show prediction confidence
-                                st.info(f"""
-                                    **ML Prediction Confidence:**
-                                    - Model Accuracy: {confidence['test_score']:.2%}
-                                    - Prediction Quality: {confidence['prediction_quality']}
-                                    - Predicting next {len(predictions)} trading days
-                                """)
-                            except Exception as e:
-                                st.warning(f"Could not generate predictions: {str(e)}")
-                                predictions = None
-
-                        # Two-column layout
-                        col_data, col_ai = st.columns([1, 1])
-
-                        with col_data:
-                            # Company header
-                            st.markdown(f"## {stock_info.get('longName', symbols[0])}")
-                            st.markdown(f"*{stock_info.get('sector', '')} | {stock_info.get('industry', '')}*")
-
-                            current_price = stock_info.get('currentPrice', 0)
-                            price_change = stock_info.get('regularMarketChangePercent', 0)
-                            price_color = "stock-up" if price_change >= 0 else "stock-down"
-
-                            # Show current price and predicted price if available
-                            if predictions is not None:
-                                predicted_price = predictions['Predicted_Close'].iloc[-1]
-                                predicted_change = ((predicted_price - current_price) / current_price) * 100
-                                predicted_color = "stock-up" if predicted_change >= 0 else "stock-down"
-
-                                st.markdown(f"""
-                                    <div class='price-display'>
-                                        <h2>${current_price:.2f}</h2>
-                                        <p class='{price_color}'>{price_change:+.2f}%</p>
-                                        <p>Predicted (30d): <span class='{predicted_color}'>${predicted_price:.2f} ({predicted_change:+.2f}%)</span></p>
-                                    </div>
-                                """, unsafe_allow_html=True)
-                            else:
-                                st.markdown(f"""
-                                    <div class='price-display'>
-                                        <h2>${current_price:.2f}</h2>
-                                        <p class='{price_color}'>{price_change:+.2f}%</p>
-                                    </div>
-                                """, unsafe_allow_html=True)
-
-                            # Key metrics
-                            st.markdown("### Key Metrics")
-                            metric_cols = st.columns(2)
-                            for i, (metric, value) in enumerate(metrics.items()):
-                                with metric_cols[i % 2]:
-                                    st.markdown(f"""
-                                        <div class='metric-card'>
-                                            <h4>{metric}</h4>
-                                            <p>{format_large_number(value) if metric == 'Market Cap' else value}</p>
-                                        </div>
-                                    """, unsafe_allow_html=True)
-
-                            # Stock chart
-                            st.markdown("### Technical Analysis")
-                            fig = create_stock_chart(df)
-                            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True})
-
-                        with col_ai:
-                            st.markdown("### ViBro Insights")
-                            with st.spinner('Generating ViBro analysis...'):
-                                analysis = get_stock_analysis(stock_info, metrics)
-
-                                if 'error' in analysis:
-                                    st.error(analysis['error'])
-                                else:
-                                    st.markdown(f"""
-                                        <div class='ai-insight'>
-                                            <h4>Summary</h4>
-                                            <p>{analysis['summary']}</p>
-                                        </div>
-                                    """, unsafe_allow_html=True)
-
-                                    with st.expander("Strengths & Risks", expanded=True):
-                                        col1, col2 = st.columns(2)
-                                        with col1:
-                                            st.markdown("#### Strengths")
-                                            for strength in analysis['strengths']:
-                                                st.markdown(f"✅ {strength}")
-
-                                        with col2:
-                                            st.markdown("#### Risks")
-                                            for risk in analysis['risks']:
-                                                st.markdown(f"⚠️ {risk}")
-
-                                    st.markdown("#### Recommendation")
-                                    st.info(analysis['recommendation'])
-
-                                    # Interactive AI Chat
-                                    st.markdown("### Ask ViBro Finance")
-
-                                    # Suggested questions
-                                    st.markdown("#### Suggested Questions")
-                                    for question in analysis['suggested_questions']:
-                                        if st.button(question, key=f"q_{question}"):
-                                            with st.spinner('Analyzing...'):
-                                                answer = ask_follow_up_question(stock_info, metrics, question)
-                                                st.markdown(f"""
-                                                    <div class='ai-insight'>
-                                                        <p>{answer}</p>
-                                                    </div>
-                                                """, unsafe_allow_html=True)
-
-                                    # Custom questions
-                                    custom_question = st.text_input("Ask your own question:")
-                                    if st.button("Ask") and custom_question:
-                                        with st.spinner('Analyzing...'):
-                                            answer = ask_follow_up_question(stock_info, metrics, custom_question)
-                                            st.markdown(f"""
-                                                <div class='ai-insight'>
-                                                    <p>{answer}</p>
-                                                </div>
-                                            """, unsafe_allow_html=True)
-
-                        # Export data moved to data column
-                        with col_data:
-                            with st.expander("Export Data"):
-                                csv = df.to_csv().encode('utf-8')
-                                st.download_button(
-                                    label="Download CSV",
-                                    data=csv,
-                                    file_name=f"{symbols[0]}_stock_data.csv",
-                                    mime="text/csv"
-                                )
 
+def export_fingerprint(frames):
+    """Cheap identity of the frames behind an export, so a prepared file is never served for changed data"""
+    return tuple(
+        (stem, df.shape, str(df.index[0]) if len(df) else None, str(df.index[-1]) if len(df) else None)
+        for stem, df in frames.items()
+    )
+
+
+def render_export(frames, key, archive_name=None):
+    """Format picker plus a Prepare step: files are only serialized when asked for, not on every rerun
+
+    The session holds at most one prepared file; it is dropped as soon as another export, another
+    format or changed data would make it stale.
+    """
+    fmt = st.radio("Format", available_formats(), horizontal=True, key=f"export_format_{key}")
+    identity = (key, fmt, export_fingerprint(frames))
+    prepared = st.session_state.get("prepared_export")
+    if prepared and prepared["identity"] != identity:
+        st.session_state.pop("prepared_export", None)
+        prepared = None
+
+    if st.button("Prepare download", key=f"prepare_{key}"):
+        st.session_state.pop("prepared_export", None)
+        prepared = None
+        with st.spinner("Preparing file..."):
+            try:
+                if len(frames) == 1:
+                    stem, df = next(iter(frames.items()))
+                    file_name, file, mime = export_filename(stem, fmt), export_frame(df, fmt), export_mime(fmt)
                 else:
-                    # Comparison View
-                    with st.spinner('Fetching data for comparison...'):
-                        stock_data = get_multiple_stocks_data(st.session_state.symbols, time_period)
-
-                        # Create comparison chart
-                        st.markdown("### Stock Price Comparison")
-                        comparison_fig = create_comparison_chart(stock_data, time_period)
-                        st.plotly_chart(comparison_fig, use_container_width=True)
-
-                        # Display key metrics comparison
-                        with st.expander("Key Metrics Comparison", expanded=True):
-                            metrics_data = []
-                            for symbol, data in stock_data.items():
-                                metrics = get_key_metrics(data['info'])
-                                metrics['Symbol'] = symbol
-                                metrics['Company'] = data['info'].get('longName', symbol)
-                                metrics_data.append(metrics)
-
-                            metrics_df = pd.DataFrame(metrics_data)
-                            metrics_df.set_index('Symbol', inplace=True)
-                            st.dataframe(metrics_df, use_container_width=True)
-
-                        # Export data
-                        with st.expander("Export Data"):
-                            for symbol, data in stock_data.items():
-                                csv = data['history'].to_csv().encode('utf-8')
-                                st.download_button(
-                                    label=f"Download {symbol} CSV",
-                                    data=csv,
-                                    file_name=f"{symbol}_stock_data.csv",
-                                    mime="text/csv",
-                                    key=f"download_{symbol}"
-                                )
-
-        elif section == "Portfolio Management":
-            st.title("📊 Portfolio Management")
-
-            tab1, tab2 = st.tabs(["Create Portfolio", "Analyze Portfolio"])
-
-            with tab1:
-                risk_tolerance = st.select_slider(
-                    "Risk Tolerance",
-                    options=["Conservative", "Moderate", "Aggressive"],
-                    value="Moderate"
+                    file_name, file, mime = f"{archive_name}.zip", export_archive(frames, fmt), "application/zip"
+                with file:
+                    prepared = st.session_state.prepared_export = {
+                        "identity": identity, "file_name": file_name, "mime": mime, "data": file.read()
+                    }
+            except Exception as e:
+                st.error(str(e))
+
+    if prepared:
+        st.download_button(
+            label=f"Download {prepared['file_name']}",
+            data=prepared["data"],
+            file_name=prepared["file_name"],
+            mime=prepared["mime"],
+            key=f"download_{key}"
+        )
+
+
+def render_portfolio_management(auth_manager):
+    st.title("📊 Portfolio Management")
+
+    tab1, tab2 = st.tabs(["Create Portfolio", "Analyze Portfolio"])
+
+    with tab1:
+        render_create_portfolio()
+
+    with tab2:
+        render_analyze_portfolio(auth_manager)
+
+
+def render_create_portfolio():
+    risk_tolerance = st.select_slider(
+        "Risk Tolerance",
+        options=["Conservative", "Moderate", "Aggressive"],
+        value="Moderate"
+    )
+
+    investment_amount = st.number_input(
+        "Investment Amount ($)",
+        min_value=100,
+        max_value=10000000,
+        value=10000,
+        step=1000
+    )
+
+    # Add sector preferences
+    sectors = st.multiselect(
+        "Preferred Sectors (Optional)",
+        ["Technology", "Healthcare", "Financial Services", "Consumer Cyclical",
+         "Industrial", "Energy", "Materials", "Real Estate", "Utilities"]
+    )
+
+    if st.button("Generate Portfolio Recommendation", type="primary"):
+        with st.spinner("Analyzing and generating recommendations..."):
+            try:
+                # Get portfolio allocation
+                portfolio = generate_portfolio_recommendation(
+                    risk_tolerance.lower(),
+                    investment_amount,
+                    sectors if sectors else None
                 )
 
-                investment_amount = st.number_input(
-                    "Investment Amount ($)",
-                    min_value=100,
-                    max_value=10000000,
-                    value=10000,
-                    step=1000
-                )
+                # Display allocation
+                st.subheader("Recommended Asset Allocation")
+                cols = st.columns(len(portfolio["allocation"]))
+                for i, (asset, percentage) in enumerate(portfolio["allocation"].items()):
+                    cols[i].metric(
+                        f"{asset.title()}",
+                        f"{percentage*100:.0f}%",
+                        f"${investment_amount * percentage:,.2f}"
+                    )
 
-                # Add sector preferences
-                sectors = st.multiselect(
-                    "Preferred Sectors (Optional)",
-                    ["Technology", "Healthcare", "Financial Services", "Consumer Cyclical",
-                     "Industrial", "Energy", "Materials", "Real Estate", "Utilities"]
-                )
+                st.subheader("Recommended Stocks")
+                if portfolio["holdings"]:
+                    # Optimized holdings from the local optimizer
+                    optimizer = portfolio["optimizer"]
+                    st.caption(
+                        f"{optimizer['mode'].replace('_', ' ').title()} portfolio | "
+                        f"Expected stock return {optimizer['expected_return']:.1%} | "
+                        f"Stock volatility {optimizer['volatility']:.1%}"
+                    )
+                    holdings_df = pd.DataFrame(portfolio["holdings"])
+                    holdings_df["weight"] = holdings_df["weight"].map(lambda w: f"{w:.1%}")
+                    holdings_df["amount"] = holdings_df["amount"].map(lambda a: f"${a:,.2f}")
+                    st.dataframe(holdings_df.set_index("ticker"), use_container_width=True)
+                    suggestions = portfolio["holdings"]
+                    st.session_state.target_allocation = {
+                        holding["ticker"]: holding["weight"] for holding in portfolio["holdings"]
+                    }
+                else:
+                    # Fall back to AI suggestions when the optimizer universe is unavailable
+                    suggestions = suggest_stocks(
+                        risk_tolerance.lower(),
+                        investment_amount,
+                        sectors if sectors else None
+                    )
 
-                if st.button("Generate Portfolio Recommendation", type="primary"):
-                    with st.spinner("Analyzing and generating recommendations..."):
-                        try:
-                            # Get portfolio allocation
-                            portfolio = generate_portfolio_recommendation(
-                                risk_tolerance.lower(),
-                                investment_amount
-                            )
-
-                            # Display allocation
-                            st.subheader("Recommended Asset Allocation")
-                            cols = st.columns(len(portfolio["allocation"]))
-                            for i, (asset, percentage) in enumerate(portfolio["allocation"].items()):
-                                cols[i].metric(
-                                    f"{asset.title()}",
-                                    f"{percentage*100:.0f}%",
-                                    f"${investment_amount * percentage:,.2f}"
-                                )
-
-                            # Get and display stock suggestions
-                            st.subheader("Recommended Stocks")
-                            suggestions = suggest_stocks(
-                                risk_tolerance.lower(),
-                                investment_amount,
-                                sectors if sectors else None
-                            )
-
-                            for suggestion in suggestions:
-                                st.info(f"**{suggestion['ticker']} - {suggestion['company']}**\n\n{suggestion['reason']}")
-
-                            # Add activity tracking for portfolio updates
-                            st.session_state.portfolio_update = {
-                                "risk_tolerance": risk_tolerance.lower(),
-                                "investment_amount": investment_amount,
-                                "sectors": sectors,
-                                "recommendations": suggestions
-                            }
-
-                        except Exception as e:
-                            st.error(f"Error generating portfolio recommendation: {str(e)}")
-
-            with tab2:
-                # Initialize portfolio stocks in session state if not exists
-                if 'portfolio_stocks' not in st.session_state:
-                    st.session_state.portfolio_stocks = []
-
-                # Add new stock input
-                new_stock = st.text_input("Enter stock symbol to add to portfolio", key="new_stock").upper()
-                if st.button("Add Stock"):
-                    if new_stock and new_stock not in st.session_state.portfolio_stocks:
-                        try:
-                            # Verify if stock exists by attempting to fetch its data
-                            _, info = get_stock_data(new_stock)
-                            if info:
-                                st.session_state.portfolio_stocks.append(new_stock)
-                                st.success(f"Added {new_stock} to portfolio")
-                            else:
-                                st.error(f"Could not find stock with symbol {new_stock}")
-                        except Exception as e:
-                            st.error(f"Error adding stock: {str(e)}")
-
-                # Display current portfolio
-                st.subheader("Current Portfolio")
-                cols = st.columns([3, 1])
-                with cols[0]:
-                    for stock in st.session_state.portfolio_stocks:
-                        st.markdown(f"• {stock}")
-                with cols[1]:
-                    if st.button("Clear Portfolio"):
-                        st.session_state.portfolio_stocks = []
-                        st.rerun()
-
-                if st.session_state.portfolio_stocks:
-                    if st.button("Analyze Portfolio", type="primary"):
-                        with st.spinner("Analyzing portfolio..."):
-                            try:
-                                analysis = analyze_portfolio_health(st.session_state.portfolio_stocks)
-
-                                # Display portfolio metrics
-                                st.subheader("Portfolio Overview")
-
-                                # Sector allocation
-                                st.markdown("#### Sector Allocation")
-                                sector_cols = st.columns(len(analysis["sector_allocation"]))
-                                for i, (sector, count) in enumerate(analysis["sector_allocation"].items()):
-                                    sector_cols[i].metric(sector, f"{count} stocks")
-
-                                # Stock recommendations
-                                st.markdown("#### Stock Analysis")
-                                for rec in analysis["recommendations"]:
-                                    st.markdown(f"### {rec['symbol']}")
-                                    col1, col2 = st.columns(2)
-
-                                    with col1:
-                                        st.markdown("**Analysis Summary**")
-                                        st.write(rec["analysis"]["summary"])
-
-                                    with col2:
-                                        st.markdown("**Key Points**")
-                                        st.markdown("✅ **Strengths:**")
-                                        for strength in rec["analysis"]["strengths"]:
-                                            st.markdown(f"- {strength}")
-                                        st.markdown("⚠️ **Risks:**")
-                                        for risk in rec["analysis"]["risks"]:
-                                            st.markdown(f"- {risk}")
-
-                                # Add activity tracking for portfolio updates
-                                st.session_state.portfolio_update = {
-                                    "portfolio_stocks": st.session_state.portfolio_stocks,
-                                    "analysis": analysis
-                                }
-
-                            except Exception as e:
-                                st.error(f"Error analyzing portfolio: {str(e)}")
+                    for suggestion in suggestions:
+                        st.info(f"**{suggestion['ticker']} - {suggestion['company']}**\n\n{suggestion['reason']}")
+
+                # Add activity tracking for portfolio updates
+                st.session_state.portfolio_update = {
+                    "risk_tolerance": risk_tolerance.lower(),
+                    "investment_amount": investment_amount,
+                    "sectors": sectors,
+                    "recommendations": suggestions
+                }
+
+            except Exception as e:
+                st.error(f"Error generating portfolio recommendation: {str(e)}")
+
+
+def render_analyze_portfolio(auth_manager):
+    # Initialize portfolio stocks in session state if not exists
+    if 'portfolio_stocks' not in st.session_state:
+        st.session_state.portfolio_stocks = []
+
+    # Add new stock input
+    new_stock = st.text_input("Enter stock symbol to add to portfolio", key="new_stock").upper()
+    render_symbol_hint(new_stock)
+    if st.button("Add Stock"):
+        # Stored in Yahoo's spelling (BRK.B -> BRK-B) so later downloads accept it
+        symbol = normalize_symbol(new_stock)
+        if symbol and symbol not in st.session_state.portfolio_stocks:
+            try:
+                # Listed symbols are validated locally; only unlisted ones need a download to prove they exist
+                if get_symbol_directory().contains(symbol):
+                    info = True
+                else:
+                    _, info = cached_stock_data(symbol)
+                if info:
+                    st.session_state.portfolio_stocks.append(symbol)
+                    st.success(f"Added {symbol} to portfolio")
                 else:
-                    st.info("Add stocks to your portfolio to analyze them")
+                    st.error(f"Could not find stock with symbol {symbol}")
+            except Exception as e:
+                st.error(f"Error adding stock: {str(e)}")
+
+    # Display current portfolio
+    st.subheader("Current Portfolio")
+    cols = st.columns([3, 1])
+    with cols[0]:
+        for stock in st.session_state.portfolio_stocks:
+            st.markdown(f"• {stock}")
+    with cols[1]:
+        if st.button("Clear Portfolio"):
+            st.session_state.portfolio_stocks = []
+            st.rerun()
+
+    if st.session_state.portfolio_stocks:
+        if st.button("Analyze Portfolio", type="primary"):
+            with st.spinner("Analyzing portfolio..."):
+                try:
+                    analysis = analyze_portfolio_health(st.session_state.portfolio_stocks)
+
+                    # Display portfolio metrics
+                    st.subheader("Portfolio Overview")
+
+                    # Sector allocation
+                    st.markdown("#### Sector Allocation")
+                    sector_cols = st.columns(len(analysis["sector_allocation"]))
+                    for i, (sector, count) in enumerate(analysis["sector_allocation"].items()):
+                        sector_cols[i].metric(sector, f"{count} stocks")
+
+                    # Risk metrics
+                    risk = analysis["risk_metrics"]
+                    if risk:
+                        st.markdown("#### Risk Metrics")
+                        st.caption(
+                            f"Value of one share each: ${analysis['total_value']:,.2f} | "
+                            f"{risk['start_date']} to {risk['end_date']}"
+                            f"{' | Beta vs SPY' if risk['benchmark'] else ''}"
+                        )
+                        portfolio_risk = risk["portfolio"]
+                        risk_cols = st.columns(6)
+                        risk_cols[0].metric("Volatility", f"{portfolio_risk['annual_volatility']:.1%}")
+                        risk_cols[1].metric("Beta", f"{portfolio_risk['beta']:.2f}")
+                        risk_cols[2].metric("Sharpe", f"{portfolio_risk['sharpe_ratio']:.2f}")
+                        risk_cols[3].metric(f"VaR ({risk['confidence']:.0%})", f"{portfolio_risk['var']:.2%}")
+                        risk_cols[4].metric("CVaR", f"{portfolio_risk['cvar']:.2%}")
+                        risk_cols[5].metric("Max Drawdown", f"{portfolio_risk['max_drawdown']:.1%}")
+
+                        with st.expander("Holding Risk Details"):
+                            st.dataframe(risk["holdings"], use_container_width=True)
+                            st.markdown("**Correlation Matrix**")
+                            st.dataframe(risk["correlation"].round(2), use_container_width=True)
+
+                    # Stock recommendations
+                    st.markdown("#### Stock Analysis")
+                    for rec in analysis["recommendations"]:
+                        st.markdown(f"### {rec['symbol']}")
+                        col1, col2 = st.columns(2)
+
+                        with col1:
+                            st.markdown("**Analysis Summary**")
+                            st.write(rec["analysis"]["summary"])
+
+                        with col2:
+                            st.markdown("**Key Points**")
+                            st.markdown("✅ **Strengths:**")
+                            for strength in rec["analysis"]["strengths"]:
+                                st.markdown(f"- {strength}")
+                            st.markdown("⚠️ **Risks:**")
+                            for risk in rec["analysis"]["risks"]:
+                                st.markdown(f"- {risk}")
+
+                    # Add activity tracking for portfolio updates
+                    st.session_state.portfolio_update = {
+                        "portfolio_stocks": st.session_state.portfolio_stocks,
+                        "analysis": analysis
+                    }
 
-        elif section == "Goal Planning":
-            st.title("🎯 Financial Goal Planning")
+                except Exception as e:
+                    st.error(f"Error analyzing portfolio: {str(e)}")
+    else:
+        st.info("Add stocks to your portfolio to analyze them")
 
-            with st.expander("Create New Goal", expanded=True):
-                goal_type = st.selectbox(
-                    "Goal Type",
-                    ["Retirement", "House Down Payment", "Education", "Emergency Fund", "Travel"]
-                )
+    # Share-level rebalancing towards the recommended (or equal-weight) allocation
+    if st.session_state.portfolio_stocks:
+        with st.expander("Rebalance Portfolio"):
+            render_rebalance(auth_manager)
 
-                target_amount = st.number_input(
-                    "Target Amount ($)",
-                    min_value=1000,
-                    max_value=10000000,
-                    value=50000,
-                    step=1000
-                )
 
-                target_date = st.date_input(
-                    "Target Date",
-                    value=pd.to_datetime("2025-12-31")
+def render_rebalance(auth_manager):
+    target_allocation = st.session_state.get("target_allocation") or {
+        stock: 1 / len(st.session_state.portfolio_stocks)
+        for stock in st.session_state.portfolio_stocks
+    }
+    st.caption(
+        "Target: latest portfolio recommendation"
+        if st.session_state.get("target_allocation") else "Target: equal weight"
+    )
+    share_cols = st.columns(min(len(st.session_state.portfolio_stocks), 4))
+    holdings = {}
+    for i, stock in enumerate(st.session_state.portfolio_stocks):
+        with share_cols[i % len(share_cols)]:
+            holdings[stock] = st.number_input(
+                f"{stock} shares", min_value=0, value=0, step=1, key=f"shares_{stock}"
+            )
+    rebalance_cash = st.number_input("Cash Available ($)", min_value=0.0, value=0.0, step=100.0)
+    min_trade = st.number_input("Minimum Trade ($)", min_value=0.0, value=50.0, step=10.0)
+
+    if st.button("Plan Rebalance"):
+        with st.spinner("Planning trades..."):
+            try:
+                prices = get_latest_prices(list(dict.fromkeys(list(holdings) + list(target_allocation))))
+                trades, ending_cash = plan_trades(
+                    holdings, target_allocation, prices,
+                    cash=rebalance_cash, min_trade_value=min_trade
                 )
-
-                current_amount = st.number_input(
-                    "Current Amount Saved ($)",
-                    min_value=0,
-                    max_value=10000000,
-                    value=0,
-                    step=1000
+                if trades:
+                    st.dataframe(pd.DataFrame(trades).set_index("symbol"), use_container_width=True)
+                else:
+                    st.success("Portfolio is already within rebalancing thresholds")
+                st.write(f"Cash after trades: ${ending_cash:,.2f}")
+
+                auth_manager.save_user_activity(st.session_state.username, "portfolio", {
+                    "holdings": holdings,
+                    "target_allocation": target_allocation,
+                    "cash": rebalance_cash
+                })
+            except Exception as e:
+                st.error(f"Error planning rebalance: {str(e)}")
+
+
+def render_goal_planning(auth_manager):
+    st.title("🎯 Financial Goal Planning")
+
+    with st.expander("Create New Goal", expanded=True):
+        goal_type = st.selectbox(
+            "Goal Type",
+            ["Retirement", "House Down Payment", "Education", "Emergency Fund", "Travel"]
+        )
+
+        target_amount = st.number_input(
+            "Target Amount ($)",
+            min_value=1000,
+            max_value=10000000,
+            value=50000,
+            step=1000
+        )
+
+        target_date = st.date_input(
+            "Target Date",
+            value=pd.to_datetime("2025-12-31")
+        )
+
+        current_amount = st.number_input(
+            "Current Amount Saved ($)",
+            min_value=0,
+            max_value=10000000,
+            value=0,
+            step=1000
+        )
+
+        if st.button("Create Goal"):
+            try:
+                goal = FinancialGoal(
+                    goal_type,
+                    target_amount,
+                    target_date.strftime("%Y-%m-%d"),
+                    current_amount
                 )
 
-                if st.button("Create Goal"):
-                    try:
-                        goal = FinancialGoal(
-                            goal_type,
-                            target_amount,
-                            target_date.strftime("%Y-%m-%d"),
-                            current_amount
-                        )
+                # Analyze goal feasibility
+                monthly_income = st.number_input("Monthly Income ($)", min_value=0, value=5000)
+                monthly_expenses = st.number_input("Monthly Expenses ($)", min_value=0, value=3000)
 
-                        # Analyze goal feasibility
-                        monthly_income = st.number_input("Monthly Income ($)", min_value=0, value=5000)
-                        monthly_expenses = st.number_input("Monthly Expenses ($)", min_value=0, value=3000)
+                feasibility = analyze_goal_feasibility(goal, monthly_income, monthly_expenses)
 
-                        feasibility = analyze_goal_feasibility(goal, monthly_income, monthly_expenses)
+                # Display feasibility analysis
+                st.subheader("Goal Analysis")
+                st.metric("Progress", f"{goal.progress:.1f}%")
+                st.metric("Monthly Savings Required",
+                          f"${feasibility['monthly_required']:,.2f}")
 
-                        # Display feasibility analysis
-                        st.subheader("Goal Analysis")
-                        st.metric("Progress", f"{goal.progress:.1f}%")
-                        st.metric("Monthly Savings Required",
-                                  f"${feasibility['monthly_required']:,.2f}")
+                st.info(feasibility["recommendation"])
 
-                        st.info(feasibility["recommendation"])
+                # Generate investment plan
+                risk_preference = st.select_slider(
+                    "Risk Tolerance",
+                    options=["Conservative", "Moderate", "Aggressive"],
+                    value="Moderate"
+                )
 
-                        # Generate investment plan
-                        risk_preference = st.select_slider(
-                            "Risk Tolerance",
-                            options=["Conservative", "Moderate", "Aggressive"],
-                            value="Moderate"
-                        )
+                investment_plan = generate_investment_plan(goal, risk_preference.lower())
 
-                        investment_plan = generate_investment_plan(goal, risk_preference.lower())
-
-                        # Display investment plan
-                        st.subheader("Investment Plan")
-                        st.write(f"Time Horizon: {investment_plan['time_horizon']:.1f} years")
-                        st.write(f"Recommended Strategy: {investment_plan['strategy'].title()}")
-
-                        # Show allocation
-                        cols = st.columns(len(investment_plan["allocation"]))
-                        for i, (asset, percentage) in enumerate(investment_plan["allocation"].items()):
-                            cols[i].metric(
-                                f"{asset.title()}",
-                                f"{percentage}%",
-                                f"${target_amount * (percentage/100):,.2f}"
-                            )
-
-                        # Add activity tracking for goal updates
-                        st.session_state.goal_update = {
-                            "goal_type": goal_type,
-                            "target_amount": target_amount,
-                            "target_date": target_date.strftime("%Y-%m-%d"),
-                            "current_amount": current_amount,
-                            "monthly_income": monthly_income,
-                            "monthly_expenses": monthly_expenses,
-                            "risk_preference": risk_preference.lower(),
-                            "investment_plan": investment_plan
-                        }
+                # Display investment plan
+                st.subheader("Investment Plan")
+                st.write(f"Time Horizon: {investment_plan['time_horizon']:.1f} years")
+                st.write(f"Recommended Strategy: {investment_plan['strategy'].title()}")
 
+                # Show allocation
+                cols = st.columns(len(investment_plan["allocation"]))
+                for i, (asset, percentage) in enumerate(investment_plan["allocation"].items()):
+                    cols[i].metric(
+                        f"{asset.title()}",
+                        f"{percentage}%",
+                        f"${target_amount * (percentage/100):,.2f}"
+                    )
+
+                # Add activity tracking for goal updates
+                st.session_state.goal_update = {
+                    "goal_type": goal_type,
+                    "target_amount": target_amount,
+                    "target_date": target_date.strftime("%Y-%m-%d"),
+                    "current_amount": current_amount,
+                    "monthly_income": monthly_income,
+                    "monthly_expenses": monthly_expenses,
+                    "risk_preference": risk_preference.lower(),
+                    "investment_plan": investment_plan
+                }
+
+                # Save the goal alongside the user's existing goals
+                user_data = auth_manager.get_user_data(st.session_state.username) or {}
+                saved_goals = user_data.get("goals", []) + [st.session_state.goal_update]
+                auth_manager.save_user_activity(st.session_state.username, "goals", saved_goals)
+
+            except Exception as e:
+                st.error(f"Error creating goal plan: {str(e)}")
+
+    with st.expander("Plan All Goals Together"):
+        user_data = auth_manager.get_user_data(st.session_state.username) or {}
+        saved_goals = user_data.get("goals", [])
+        if saved_goals:
+            st.write(f"You have {len(saved_goals)} saved goals. Nearer target dates are funded first.")
+            plan_income = st.number_input("Monthly Income ($)", min_value=0, value=5000, key="plan_income")
+            plan_expenses = st.number_input("Monthly Expenses ($)", min_value=0, value=3000, key="plan_expenses")
+
+            if st.button("Simulate All Goals", type="primary"):
+                with st.spinner("Simulating market scenarios..."):
+                    try:
+                        outcomes = plan_goals(saved_goals, max(plan_income - plan_expenses, 0))
+                        outcomes_df = pd.DataFrame(outcomes)[[
+                            "priority", "goal_type", "target_amount", "target_date",
+                            "success_probability", "median_final_balance", "expected_shortfall"
+                        ]]
+                        outcomes_df.set_index("priority", inplace=True)
+                        st.dataframe(outcomes_df, use_container_width=True)
                     except Exception as e:
-                        st.error(f"Error creating goal plan: {str(e)}")
+                        st.error(f"Error simulating goals: {str(e)}")
+        else:
+            st.info("Create a goal to start planning")
 
-        elif section == "Education":
-            st.title("📚 Financial Education")
 
-            # Initialize education manager
-            education_manager = EducationManager()
+def render_education(auth_manager):
+    st.title("📚 Financial Education")
 
-            # Get all courses
-            courses = education_manager.get_all_courses()
+    # Initialize education manager
+    education_manager = get_education_manager()
 
-            # Get user's progress
-            user_progress = education_manager.get_user_progress(st.session_state.username)
+    # Get all courses
+    courses = education_manager.get_all_courses()
 
-            # Display available courses
-            st.markdown("### Available Courses")
+    # Display available courses
+    st.markdown("### Available Courses")
 
-            for course in courses:
-                # Create an expandable section for each course
-                with st.expander(f"📘 {course['title']}", expanded=True):
-                    col1, col2 = st.columns([3, 1])
+    for course in courses:
+        # Create an expandable section for each course
+        with st.expander(f"📘 {course['title']}", expanded=True):
+            col1, col2 = st.columns([3, 1])
 
-                    with col1:
-                        st.markdown(f"**Duration:** {course['duration']}")
-                        st.markdown(course['description'])
+            with col1:
+                st.markdown(f"**Duration:** {course['duration']}")
+                st.markdown(course['description'])
 
-                        # Calculate progress
-                        modules_completed = sum(
-                            1 for module in course['modules']
-                            if education_manager.get_module_completion(
-                                st.session_state.username,
-                                course['id'],
-                                module['id']
-                            )
-                        )
-                        progress = (modules_completed / len(course['modules'])) if len(course['modules']) > 0 else 0
+                # Calculate progress
+                modules_completed = sum(
+                    1 for module in course['modules']
+                    if education_manager.get_module_completion(
+                        st.session_state.username,
+                        course['id'],
+                        module['id']
+                    )
+                )
+                progress = (modules_completed / len(course['modules'])) if len(course['modules']) > 0 else 0
 
-                        # Display progress bar
-                        st.write(f"Progress: {progress*100}%")
-                        st.progress(float(progress))
+                # Display progress bar
+                st.write(f"Progress: {progress*100}%")
+                st.progress(float(progress))
 
-                    with col2:
-                        if st.button("Start Course", key=f"start_{course['id']}"):
-                            st.session_state.current_course = course['id']
-                            st.rerun()
+            with col2:
+                if st.button("Start Course", key=f"start_{course['id']}"):
+                    st.session_state.current_course = course['id']
+                    st.rerun()
 
-            # Display course content if a course is selected
-            if hasattr(st.session_state, 'current_course'):
-                current_course = education_manager.get_course(st.session_state.current_course)
+    # Display course content if a course is selected
+    if hasattr(st.session_state, 'current_course'):
+        current_course = education_manager.get_course(st.session_state.current_course)
 
-                if current_course:
-                    st.markdown(f"## {current_course['title']}")
+        if current_course:
+            st.markdown(f"## {current_course['title']}")
 
-                    for i, module in enumerate(current_course['modules'], 1):
-                        module_completed = education_manager.get_module_completion(
-                            st.session_state.username,
-                            current_course['id'],
-                            module['id']
-                        )
+            for i, module in enumerate(current_course['modules'], 1):
+                module_completed = education_manager.get_module_completion(
+                    st.session_state.username,
+                    current_course['id'],
+                    module['id']
+                )
 
-                        with st.expander(
-                            f"Module {i}: {module['title']} {'✅' if module_completed else ''}",
-                            expanded=not module_completed
-                        ):
-                            st.markdown(module['content'])
-
-                            # Display quiz
-                            if 'quiz' in module:
-                                st.markdown("### Quick Quiz")
-                                for j, question in enumerate(module['quiz'], 1):
-                                    st.markdown(f"**Q{j}: {question['question']}**")
-                                    answer = st.radio(
-                                        "Select your answer:",
-                                        question['options'],
-                                        key=f"quiz_{module['id']}_{j}"
-                                    )
-
-                                    if st.button("Check Answer", key=f"check_{module['id']}_{j}"):
-                                        if question['options'].index(answer) == question['correct']:
-                                            st.success("Correct!")
-                                            education_manager.update_user_progress(
-                                                st.session_state.username,
-                                                current_course['id'],
-                                                module['id']
-                                            )
-                                            st.rerun()
-                                        else:
-                                            st.error("Try again!")
-
-        elif section == "Investor Chat":
-            st.title("💬 Investor Chat")
-
-            # Initialize chat container
-            if "chat_messages" not in st.session_state:
-                st.session_state.chat_messages = []
-
-            # Show superuser controls if applicable
-            is_superuser = auth_manager.is_superuser(st.session_state.username)
-            if is_superuser:
-                with st.expander("🛡️ Superuser Controls"):
-                    st.markdown("### User Management")
-                    users = auth_manager.get_all_users(st.session_state.username)
-                    if users:
-                        user_df = pd.DataFrame(users)
-                        st.dataframe(user_df)
-                    else:
-                        st.warning("Unable to fetch users list")
-
-                    # Add notification controls
-                    st.markdown("### Send Notification")
-
-                    # Option to select between single user or all users
-                    notification_type = st.radio(
-                        "Notification Type",
-                        ["Single User", "All Users"],
-                        horizontal=True
+                with st.expander(
+                    f"Module {i}: {module['title']} {'✅' if module_completed else ''}",
+                    expanded=not module_completed
+                ):
+                    st.markdown(module['content'])
+
+                    # Display quiz
+                    if 'quiz' in module:
+                        render_quiz(education_manager, current_course['id'], module, module_completed)
+
+
+@st.fragment
+def render_quiz(education_manager, course_id, module, module_completed):
+    """Module quiz; checking an answer reruns only this fragment unless it completes the module"""
+    st.markdown("### Quick Quiz")
+    for j, question in enumerate(module['quiz'], 1):
+        st.markdown(f"**Q{j}: {question['question']}**")
+        answer = st.radio(
+            "Select your answer:",
+            question['options'],
+            key=f"quiz_{module['id']}_{j}"
+        )
+
+        if st.button("Check Answer", key=f"check_{module['id']}_{j}"):
+            if question['options'].index(answer) == question['correct']:
+                st.success("Correct!")
+                if not module_completed:
+                    education_manager.update_user_progress(
+                        st.session_state.username,
+                        course_id,
+                        module['id']
                     )
+                    # Progress bars and module checkmarks live outside the fragment
+                    st.rerun()
+            else:
+                st.error("Try again!")
+
+
+def render_investor_chat(auth_manager):
+    st.title("💬 Investor Chat")
+
+    # Show superuser controls if applicable
+    is_superuser = auth_manager.is_superuser(st.session_state.username)
+    if is_superuser:
+        with st.expander("🛡️ Superuser Controls"):
+            render_superuser_controls(auth_manager)
+
+    # Add notification display for all users
+    notifications = get_notifications(auth_manager)
+    if notifications:
+        with st.expander(f"📬 Notifications ({len([n for n in notifications if not n['read']])} unread)", expanded=True):
+            for notification in notifications:
+                if not notification["read"]:
+                    st.markdown(f"""
+                        <div style='background-color: rgba(0, 171, 65, 0.1); padding: 10px; border-radius: 5px; margin: 5px 0;'>
+                            <small style='color: #00AB41'>From ViBro Finance</small><br>
+                            {notification['message']}
+                        </div>
+                    """, unsafe_allow_html=True)
+                    if st.button("Mark as Read", key=f"notify_{notification['id']}"):
+                        if mark_notification_read(auth_manager, notification["id"]):
+                            st.rerun()
 
-                    if notification_type == "Single User":
-                        notify_user = st.selectbox(
-                            "Select User",
-                            [user["username"] for user in users if user["username"] != st.session_state.username]
-                        )
+    # Live mode polls the chat revision and appends new messages without user interaction
+    live = st.toggle("Live updates", value=True, key="chat_live")
+    chat_box = st.fragment(render_chat_box, run_every=CHAT_POLL_SECONDS if live else None)
+    chat_box(auth_manager, is_superuser)
+
+
+def render_superuser_controls(auth_manager):
+    st.markdown("### User Management")
+    users = auth_manager.get_all_users(st.session_state.username)
+    if users:
+        user_df = pd.DataFrame(users)
+        st.dataframe(user_df)
+    else:
+        st.warning("Unable to fetch users list")
+
+    st.markdown("### Goal Report")
+    goal_records = [
+        dict(goal, username=username)
+        for username, goals in auth_manager.iter_user_goals()
+        for goal in goals
+    ]
+    if goal_records:
+        batch = GoalBatch.from_records(goal_records)
+        feasibility = batch.analyze_feasibility(
+            [goal.get("monthly_income", 0) for goal in goal_records],
+            [goal.get("monthly_expenses", 0) for goal in goal_records]
+        )
+        report_cols = st.columns(3)
+        report_cols[0].metric("Saved Goals", len(batch))
+        report_cols[1].metric("Achievable", f"{feasibility['is_achievable'].mean():.0%}")
+        report_cols[2].metric("Total Targets", f"${batch.target_amounts.sum():,.0f}")
+        st.dataframe(pd.DataFrame({
+            "username": [goal["username"] for goal in goal_records],
+            "goal_type": batch.goal_types,
+            "target_amount": batch.target_amounts,
+            "progress": batch.progress,
+            "monthly_required": feasibility["monthly_required"],
+            "is_achievable": feasibility["is_achievable"]
+        }), use_container_width=True)
+    else:
+        st.write("No saved goals yet")
+
+    st.markdown("### Performance Metrics")
+    spans = get_registry().snapshot()["spans"]
+    if spans:
+        st.dataframe(pd.DataFrame([
+            {"span": row["name"], **row["labels"], "count": row["count"], "total_s": row["sum"],
+             "p50_ms": row["p50"] * 1000, "p95_ms": row["p95"] * 1000, "p99_ms": row["p99"] * 1000}
+            for row in spans
+        ]).round(2), use_container_width=True)
+    else:
+        st.write("No spans recorded yet")
+
+    st.markdown("### Provider Health")
+    providers = provider_status()
+    if providers:
+        st.dataframe(pd.DataFrame([
+            dict(status, opened_at=datetime.fromtimestamp(status["opened_at"], tz=pytz.UTC) if status["opened_at"] else None)
+            for status in providers
+        ]), use_container_width=True)
+    else:
+        st.write("No provider calls yet")
+
+    render_profiling_controls()
+
+    # Add notification controls
+    st.markdown("### Send Notification")
+
+    # Option to select between single user or all users
+    notification_type = st.radio(
+        "Notification Type",
+        ["Single User", "All Users"],
+        horizontal=True
+    )
+
+    if notification_type == "Single User":
+        notify_user = st.selectbox(
+            "Select User",
+            [user["username"] for user in users if user["username"] != st.session_state.username]
+        )
+
+    notification_message = st.text_area("Notification Message")
+
+    if st.button("Send Notification", type="primary"):
+        if notification_type == "Single User":
+            if auth_manager.send_notification(st.session_state.username, notify_user, notification_message):
+                st.success(f"Notification sent to {notify_user}")
+            else:
+                st.error("Failed to send notification")
+        else:  # All Users
+            if auth_manager.send_notification_to_all(st.session_state.username, notification_message):
+                st.success("Notification sent to all users")
+            else:
+                st.error("Failed to send notification to all users")
+
+
+def render_profiling_controls():
+    st.markdown("### Profiling")
+    profile_cols = st.columns([2, 1])
+    with profile_cols[0]:
+        mode = st.radio("Profiler", ["sampling", "cprofile"], horizontal=True,
+                        help="Sampling adds little overhead; cProfile counts every call but slows the run down")
+    with profile_cols[1]:
+        if st.button("Profile next run"):
+            # Picked up by the next rerun of this session, e.g. the next Analyze click
+            st.session_state.profile_next_run = mode
+            st.success("The next rerun of this session will be profiled")
+
+    profiles = list_profiles()
+    if not profiles:
+        st.write(f"No profiles saved in {PROFILE_DIR}/ yet")
+        return
+    st.dataframe(pd.DataFrame([
+        {"started_at": profile["started_at"], "mode": profile["mode"], "duration_s": round(profile["duration_s"], 3),
+         **profile["tags"]}
+        for profile in profiles
+    ]), use_container_width=True)
+    selected = st.selectbox("Hotspots", [profile["path"] for profile in profiles], format_func=os.path.basename)
+    try:
+        with open(f"{selected}.hotspots.txt") as f:
+            st.code(f.read())
+        with open(f"{selected}.collapsed") as f:
+            st.download_button("Download collapsed stacks", f.read(), file_name=f"{os.path.basename(selected)}.collapsed")
+    except OSError as e:
+        st.warning(f"Profile files missing: {str(e)}")
+
+
+def format_timestamp(dt):
+    """Convert timestamp to US Pacific time"""
+    pacific = pytz.timezone('US/Pacific')
+    if isinstance(dt, str):
+        dt = datetime.fromisoformat(dt)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=pytz.UTC)
+    return dt.astimezone(pacific).strftime("%I:%M %p %Z")
+
+
+def chat_message_html(msg):
+    """Render one chat message bubble as HTML"""
+    formatted_time = format_timestamp(datetime.fromisoformat(msg['timestamp']))
+
+    is_current_user = msg['username'] == st.session_state.username
+    if is_current_user:
+        html = f"""
+            <div style='text-align: right; margin: 10px 0;'>
+                <div style='display: inline-block; background-color: #00AB41; color: white;
+                      padding: 10px; border-radius: 15px; max-width: 70%;'>
+                    {msg['message']}
+                </div>
+                <small style='opacity: 0.7;'>{formatted_time}</small>
+            </div>
+        """
+    else:
+        html = f"""
+            <div style='text-align: left; margin: 10px 0;'>
+                <div style='display: inline-block; background-color: #262730;
+                      padding: 10px; border-radius: 15px; max-width: 70%;'>
+                    <small style='color: #00AB41;'>{msg['username']}</small><br>
+                    {msg['message']}
+                </div>
+                <small style='opacity: 0.7;'>{formatted_time}</small>
+            </div>
+        """
+    # One line per message so bubbles can be joined into a single markdown block
+    return " ".join(line.strip() for line in html.splitlines() if line.strip())
+
+
+def update_chat_view(auth_manager):
+    """Bring the session's rendered messages up to date, formatting only messages it has not seen"""
+    revision = auth_manager.get_chat_revision()
+    view = st.session_state.get("chat_view")
+    # Rendered HTML marks the viewer's own messages, so it only belongs to the user it was built for
+    if view is not None and view["username"] != st.session_state.username:
+        view = None
+    if view is not None and view["revision"] == revision:
+        return view
+
+    if view is not None and view["revision"][1] == revision[1]:
+        # Only new messages: append them to what is already rendered
+        new_messages = auth_manager.get_messages_since(view["last_id"], CHAT_HISTORY_LIMIT)
+        items = view["items"] + [(msg["id"], chat_message_html(msg)) for msg in new_messages]
+    else:
+        # First load or a message was deleted: render the recent history once
+        items = [(msg["id"], chat_message_html(msg)) for msg in auth_manager.get_chat_messages(CHAT_HISTORY_LIMIT)]
+
+    items = items[-CHAT_HISTORY_LIMIT:]
+    view = {
+        "username": st.session_state.username,
+        "revision": revision,
+        "last_id": items[-1][0] if items else -1,
+        "items": items,
+        "html": "".join(html for _, html in reversed(items))
+    }
+    st.session_state.chat_view = view
+    return view
+
+
+def render_chat_box(auth_manager, is_superuser):
+    """Message input and history; sending, deleting or polling reruns only this fragment"""
+    # Message input
+    chat_input = st.text_input("Type your message (Markdown supported):", key="chat_input")
+    if st.button("Send", type="primary"):
+        if chat_input.strip():
+            # Save message to database
+            if auth_manager.save_chat_message(st.session_state.username, chat_input):
+                st.success("Message sent!")
+
+    # Display chat messages (read after sending, so a new message shows without another rerun)
+    with st.container():
+        st.markdown("### Recent Messages")
+        view = update_chat_view(auth_manager)
+
+        if is_superuser:
+            # Superusers get a delete button under each message
+            for message_id, html in reversed(view["items"]):
+                st.markdown(html, unsafe_allow_html=True)
+                if st.button("🗑️ Delete", key=f"delete_{message_id}"):
+                    if auth_manager.delete_message(message_id, st.session_state.username):
+                        st.success("Message deleted!")
+                        st.rerun(scope="fragment")
+        elif view["html"]:
+            st.markdown(view["html"], unsafe_allow_html=True)
+
+        # Auto-scroll to bottom (placeholder for future enhancement)
+        st.markdown("""
+            <div id='chat-bottom'></div>
+            <script>document.getElementById('chat-bottom').scrollIntoView();
+            </script>
+        """, unsafe_allow_html=True)
 
-                    notification_message = st.text_area("Notification Message")
-
-                    if st.button("Send Notification", type="primary"):
-                        if notification_type == "Single User":
-                            if auth_manager.send_notification(st.session_state.username, notify_user, notification_message):
-                                st.success(f"Notification sent to {notify_user}")
-                            else:
-                                st.error("Failed to send notification")
-                        else:  # All Users
-                            if auth_manager.send_notification_to_all(st.session_state.username, notification_message):
-                                st.success("Notification sent to all users")
-                            else:
-                                st.error("Failed to send notification to all users")
-
-            # Add notification display for all users
-            notifications = auth_manager.get_notifications(st.session_state.username)
-            if notifications:
-                with st.expander(f"📬 Notifications ({len([n for n in notifications if not n['read']])} unread)", expanded=True):
-                    for notification in notifications:
-                        if not notification["read"]:
-                            st.markdown(f"""
-                                <div style='background-color: rgba(0, 171, 65, 0.1); padding: 10px; border-radius: 5px; margin: 5px 0;'>
-                                    <small style='color: #00AB41'>From ViBro Finance</small><br>
-                                    {notification['message']}
-                                </div>
-                            """, unsafe_allow_html=True)
-                            if st.button("Mark as Read", key=f"notify_{notification['id']}"):
-                                if auth_manager.mark_notification_as_read(st.session_state.username, notification["id"]):
-                                    st.rerun()
-
-            # Message input
-            chat_input = st.text_input("Type your message (Markdown supported):", key="chat_input")
-            if st.button("Send", type="primary"):
-                if chat_input.strip():
-                    # Save message to database
-                    if auth_manager.save_chat_message(st.session_state.username, chat_input):
-                        st.success("Message sent!")
-                        st.session_state.chat_messages = auth_manager.get_chat_messages()
-                        st.rerun()
-
-            # Display chat messages
-            with st.container():
-                st.markdown("### Recent Messages")
-                messages = auth_manager.get_chat_messages()
-
-                def format_timestamp(dt):
-                    """Convert timestamp to US Pacific time"""
-                    pacific = pytz.timezone('US/Pacific')
-                    if isinstance(dt, str):
-                        dt = datetime.fromisoformat(dt)
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=pytz.UTC)
-                    return dt.astimezone(pacific).strftime("%I:%M %p %Z")
-
-
-                def format_chat_message(msg):
-                    timestamp = datetime.fromisoformat(msg['timestamp'])
-                    formatted_time = format_timestamp(timestamp)
-
-                    is_current_user = msg['username'] == st.session_state.username
-                    if is_current_user:
-                        st.markdown(f"""
-                            <div style='text-align: right; margin: 10px 0;'>
-                                <div style='display: inline-block; background-color: #00AB41; color: white; 
-                                      padding: 10px; border-radius: 15px; max-width: 70%;'>
-                                    {msg['message']}
-                                </div>
-                                <small style='opacity: 0.7;'>{formatted_time}</small>
-                            </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.markdown(f"""
-                            <div style='text-align: left; margin: 10px 0;'>
-                                <div style='display: inline-block; background-color: #262730; 
-                                      padding: 10px; border-radius: 15px; max-width: 70%;'>
-                                    <small style='color: #00AB41;'>{msg['username']}</small><br>
-                                    {msg['message']}
-                                </div>
-                                <small style='opacity: 0.7;'>{formatted_time}</small>
-                            </div>
-                        """, unsafe_allow_html=True)
-
-                    # Show delete button for superuser
-                    if is_superuser:
-                        if st.button("🗑️ Delete", key=f"delete_{msg['id']}"):
-                            if auth_manager.delete_message(msg['id'], st.session_state.username):
-                                st.success("Message deleted!")
-                                st.rerun()
-
-                for msg in reversed(messages):
-                    format_chat_message(msg)
-
-                # Auto-scroll to bottom (placeholder for future enhancement)
-                st.markdown("""
-                    <div id='chat-bottom'></div>
-                    <script>document.getElementById('chat-bottom').scrollIntoView();
-                    </script>
-                """, unsafe_allow_html=True)
 
-        # Add Technical Indicators Explanation section at the bottom
-        st.markdown("---")
-        with st.expander("📚 Understanding Technical Indicators", expanded=False):
-            st.markdown("""
-            ### Stock Chart Components - A ViBro Guide
-
-            #### OHLC (Candlestick Chart)
-            - **O**pen: The stock's price at market open
-            - **H**igh: The highest price during the trading day
-            - **L**ow: The lowest price during the trading day
-            - **C**lose: The final price when the market closes
-            - 🎯 *Green candles* indicate price increase, *red candles* indicate price decrease
-
-            #### Moving Averages
-            - **20 SMA** (Simple Moving Average): Average price over the last 20 days
-            - **50 SMA**: Average price over the last 50 days
-            - 🎯 These help identify trends and potential support/resistance levels
-
-            #### RSI (Relative Strength Index)
-            - A momentum indicator that measures the speedand magnitude of recent price changes
-            - Scale: 0 to 100
-            - Above 70: Potentially overbought
-            -Below 30: Potentially oversold
-            - 🎯 Helps identify potential reversal points
-
-            ### Key Metrics Explained
-
-            #### Market Fundamentals
-            - **Market Cap**: Total value of all shares (Price × Outstanding Shares)
-            - **P/E Ratio**: Price per share divided by earnings per share
-            - **EPS**: Earnings Per Share - Company's profit divided by outstanding shares
-
-            #### Price Indicators
-            - **52 Week High**: Highest stock price in the past year
-            - **52 Week Low**: Lowest stock price in the past year
-            - **Volume**: Number of shares traded
-
-            #### Income Metrics
-            - **Dividend Yield**: Annual dividend payments relative to stock price
-            - 🎯 Higher yield might indicate better income potential, but verify company's stability
-
-            ### Using This Information
-
-            - Compare current price to 52-week range for context
-            - Use P/E ratio to assess if stock is potentially over/undervalued
-            - Watch volume for confirmation of price movements
-            - Monitor RSI for potential entry/exit points
-            """)
-
-        # Add disclaimer at the bottom of the page
-        st.markdown("---")
+def render_footer():
+    # Add Technical Indicators Explanation section at the bottom
+    st.markdown("---")
+    with st.expander("📚 Understanding Technical Indicators", expanded=False):
         st.markdown("""
-        ### Disclaimer
-        Quotes are not sourced from all markets and may be delayed by up to 20 minutes. All information provided on this platform is offered "as is" and is intended solely for informational purposes. It should not be considered as investment advice, financial planning guidance, or a recommendation to buy or sell any securities. Please consult a qualified financial advisor before making any trading or investment decisions.
+        ### Stock Chart Components - A ViBro Guide
+
+        #### OHLC (Candlestick Chart)
+        - **O**pen: The stock's price at market open
+        - **H**igh: The highest price during the trading day
+        - **L**ow: The lowest price during the trading day
+        - **C**lose: The final price when the market closes
+        - 🎯 *Green candles* indicate price increase, *red candles* indicate price decrease
+
+        #### Moving Averages
+        - **20 SMA** (Simple Moving Average): Average price over the last 20 days
+        - **50 SMA**: Average price over the last 50 days
+        - 🎯 These help identify trends and potential support/resistance levels
+
+        #### RSI (Relative Strength Index)
+        - A momentum indicator that measures the speedand magnitude of recent price changes
+        - Scale: 0 to 100
+        - Above 70: Potentially overbought
+        -Below 30: Potentially oversold
+        - 🎯 Helps identify potential reversal points
+
+        ### Key Metrics Explained
+
+        #### Market Fundamentals
+        - **Market Cap**: Total value of all shares (Price × Outstanding Shares)
+        - **P/E Ratio**: Price per share divided by earnings per share
+        - **EPS**: Earnings Per Share - Company's profit divided by outstanding shares
+
+        #### Price Indicators
+        - **52 Week High**: Highest stock price in the past year
+        - **52 Week Low**: Lowest stock price in the past year
+        - **Volume**: Number of shares traded
+
+        #### Income Metrics
+        - **Dividend Yield**: Annual dividend payments relative to stock price
+        - 🎯 Higher yield might indicate better income potential, but verify company's stability
+
+        ### Using This Information
+
+        - Compare current price to 52-week range for context
+        - Use P/E ratio to assess if stock is potentially over/undervalued
+        - Watch volume for confirmation of price movements
+        - Monitor RSI for potential entry/exit points
+        """)
 
-        ### ViBro Finance
-        Thank you for choosing ViBro Finance as your trading partner. We are committed to providing you with the best information. If you have any questions or concerns, please contact our support team at [hi@veerbajaj.com](mailto:hi@veerbajaj.com).
+    # Add disclaimer at the bottom of the page
+    st.markdown("---")
+    st.markdown("""
+    ### Disclaimer
+    Quotes are not sourced from all markets and may be delayed by up to 20 minutes. All information provided on this platform is offered "as is" and is intended solely for informational purposes. It should not be considered as investment advice, financial planning guidance, or a recommendation to buy or sell any securities. Please consult a qualified financial advisor before making any trading or investment decisions.
 
-        [Veer Bajaj ↗](https://veerbajaj.com)
-        """)
+    ### ViBro Finance
+    Thank you for choosing ViBro Finance as your trading partner. We are committed to providing you with the best information. If you have any questions or concerns, please contact our support team at [hi@veerbajaj.com](mailto:hi@veerbajaj.com).
+
+    [Veer Bajaj ↗](https://veerbajaj.com)
+    """)
+
+
+SECTION_RENDERERS = {
+    "Market Analysis": render_market_analysis,
+    "Portfolio Management": render_portfolio_management,
+    "Goal Planning": render_goal_planning,
+    "Education": render_education,
+    "Investor Chat": render_investor_chat
+}
+
+
+# Initialize authentication state
+init_auth()
+
+# Initialize session states
+if "analyze" not in st.session_state:
+    st.session_state.analyze = False
+if "symbols" not in st.session_state:
+    st.session_state.symbols = []
+if "portfolio_update" not in st.session_state:
+    st.session_state.portfolio_update = None
+if "goal_update" not in st.session_state:
+    st.session_state.goal_update = None
+if "show_notifications" not in st.session_state:
+    st.session_state.show_notifications = False
+
+# Check authentication
+if not st.session_state.authenticated:
+    login_page()
+else:
+    # Shared AuthManager for user activity tracking
+    auth_manager = get_auth_manager()
+    start_prefetch_scheduler()
+    start_fundamentals_refresh()
+    start_metrics()
+    logger.info(f"User {st.session_state.username} logged in.")
+
+    # Profile this rerun if a superuser asked for it or PROFILE_REQUESTS is set; otherwise a no-op
+    with request_profiler(st.session_state.pop("profile_next_run", None)):
+        render_header(auth_manager)
+        section = render_nav()
+        annotate_profile(section=section)
+
+        # Main content: only the active section does any work
+        try:
+            render_section = SECTION_RENDERERS.get(section)
+            if render_section:
+                with span("render_section", section=section):
+                    render_section(auth_manager)
+
+            render_footer()
 
-    except Exception as e:
-        st.error(f"An error occurred: {str(e)}")
-        st.markdown("Please try again with valid stock symbols.")
\ No newline at end of file
+        except Exception as e:
+            st.error(f"An error occurred: {str(e)}")
+            st.markdown("Please try again with valid stock symbols.")
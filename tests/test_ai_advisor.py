@@ -0,0 +1,92 @@
+import json
+import re
+import pytest
+from utils import ai_advisor
+from utils.synthetic_data import StubModel
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA"]
+
+class ScriptedModel(StubModel):
+    """StubModel whose batched replies come from a script; single-stock analyses name their company"""
+
+    def __init__(self, batch_reply):
+        super().__init__()
+        self.batch_reply = batch_reply
+        self.batches = []
+        self.singles = []
+
+    def _text(self, prompt):
+        if "JSON array" in prompt:
+            symbols = re.findall(r"Symbol: ([^\s|]+)", prompt)
+            self.batches.append(symbols)
+            return self.batch_reply(symbols)
+        company = re.search(r"Company: ([^\s|]+)", prompt).group(1)
+        self.singles.append(company)
+        return json.dumps(analysis(f"single {company}"))
+
+def analysis(summary, **fields):
+    return dict(StubModel._analysis(), summary=summary, **fields)
+
+def batched(symbols):
+    return [analysis(f"batch {symbol}", symbol=symbol) for symbol in symbols]
+
+@pytest.fixture
+def model():
+    models = []
+
+    def use(batch_reply):
+        models.append(ScriptedModel(batch_reply))
+        ai_advisor.set_llm_provider(lambda model_name: models[0])
+        return models[0]
+
+    yield use
+    ai_advisor.set_llm_provider(None)
+
+def stocks(symbols=SYMBOLS):
+    return [({"symbol": symbol, "longName": symbol}, {}) for symbol in symbols]
+
+def summaries(analyses):
+    return [a["summary"] for a in analyses]
+
+def test_reordered_items_are_matched_by_symbol(model):
+    stub = model(lambda symbols: json.dumps(batched(symbols)[::-1]))
+    analyses = ai_advisor.get_batch_stock_analysis(stocks())
+    assert summaries(analyses) == [f"batch {symbol}" for symbol in SYMBOLS]
+    assert "symbol" not in analyses[0]
+    assert stub.singles == []
+
+def test_missing_item_is_retried_alone(model):
+    stub = model(lambda symbols: json.dumps([item for item in batched(symbols) if item["symbol"] != "MSFT"]))
+    analyses = ai_advisor.get_batch_stock_analysis(stocks())
+    assert summaries(analyses) == ["batch AAPL", "single MSFT", "batch NVDA"]
+    assert stub.singles == ["MSFT"]
+
+def test_items_without_symbols_are_matched_by_position(model):
+    stub = model(lambda symbols: json.dumps([analysis(f"batch {symbol}") for symbol in symbols]))
+    analyses = ai_advisor.get_batch_stock_analysis(stocks())
+    assert summaries(analyses) == [f"batch {symbol}" for symbol in SYMBOLS]
+    assert stub.singles == []
+
+def test_item_naming_the_wrong_symbol_is_not_used_by_position(model):
+    def reply(symbols):
+        items = batched(symbols)
+        if "MSFT" in symbols:
+            items[symbols.index("MSFT")]["symbol"] = "MSFT.O"
+        return json.dumps(items)
+    stub = model(reply)
+    analyses = ai_advisor.get_batch_stock_analysis(stocks())
+    assert summaries(analyses) == ["batch AAPL", "single MSFT", "batch NVDA"]
+    assert stub.singles == ["MSFT"]
+
+def test_non_array_response_is_split_and_retried(model):
+    stub = model(lambda symbols: json.dumps(batched(symbols)) if len(symbols) < 3 else "Sorry, no JSON today")
+    analyses = ai_advisor.get_batch_stock_analysis(stocks())
+    assert stub.batches == [SYMBOLS, ["MSFT", "NVDA"]]
+    assert stub.singles == ["AAPL"]
+    assert summaries(analyses) == ["single AAPL", "batch MSFT", "batch NVDA"]
+
+def test_json_object_instead_of_array_is_split(model):
+    stub = model(lambda symbols: json.dumps(analysis("one object")))
+    analyses = ai_advisor.get_batch_stock_analysis(stocks(SYMBOLS[:2]))
+    assert stub.singles == SYMBOLS[:2]
+    assert summaries(analyses) == ["single AAPL", "single MSFT"]
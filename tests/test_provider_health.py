@@ -0,0 +1,29 @@
+import time
+import pytest
+from utils.provider_health import CircuitBreaker, OPEN, CLOSED
+
+def test_complete_stream_leaves_breaker_closed():
+    breaker = CircuitBreaker("test", chunk_timeout=1, failure_threshold=1)
+    assert list(breaker.stream(iter(["a", "b"]))) == ["a", "b"]
+    assert breaker.state == CLOSED
+
+def test_stalled_stream_times_out_and_fails_breaker():
+    def stalled():
+        yield "a"
+        time.sleep(1)
+        yield "b"
+    breaker = CircuitBreaker("test", chunk_timeout=0.1, failure_threshold=1)
+    chunks = breaker.stream(stalled())
+    assert next(chunks) == "a"
+    with pytest.raises(TimeoutError):
+        next(chunks)
+    assert breaker.state == OPEN
+
+def test_stream_error_fails_breaker():
+    def broken():
+        yield "a"
+        raise ConnectionError("reset")
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    with pytest.raises(ConnectionError):
+        list(breaker.stream(broken()))
+    assert breaker.state == OPEN
@@ -0,0 +1,30 @@
+import pytest
+from utils.question_index import QuestionIndex
+
+@pytest.mark.parametrize("asked, asked_again", [
+    ("What sector is it in?", "Who are its peers?"),
+    ("Should I buy?", "Should I not buy?"),
+    ("Should I buy?", "Shouldn't I buy?"),
+    ("Should I buy now?", "Should I sell now?"),
+])
+def test_different_questions_are_not_reused(asked, asked_again):
+    index = QuestionIndex()
+    index.add("AAPL", asked, "earlier answer")
+    assert index.lookup("AAPL", asked_again) is None
+
+@pytest.mark.parametrize("asked, asked_again", [
+    ("What are the main risks?", "What are the biggest risks?"),
+    ("What are the main competitors?", "Who are its main rivals?"),
+    ("Should I buy now?", "should I buy now"),
+])
+def test_rewordings_are_reused(asked, asked_again):
+    index = QuestionIndex()
+    index.add("AAPL", asked, "earlier answer")
+    assert index.lookup("AAPL", asked_again)[0] == "earlier answer"
+
+def test_answers_are_kept_per_symbol_and_expire():
+    index = QuestionIndex(max_age=60)
+    index.add("AAPL", "What are the main risks?", "earlier answer", answered_at=1000)
+    assert index.lookup("MSFT", "What are the main risks?", now=1010) is None
+    assert index.lookup("AAPL", "What are the main risks?", now=1010) is not None
+    assert index.lookup("AAPL", "What are the main risks?", now=1100) is None
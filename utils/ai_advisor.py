@@ -1,15 +1,62 @@
 import os
-import google.generativeai as genai
 import json
 import logging
+import threading
+import time
+from .lazy_loader import lazy_import
+from .metrics import span, increment, get_registry
+from .provider_health import get_breaker
+from .prompts import (analysis_prompt, batch_analysis_prompt, follow_up_prompt, suggestion_prompt,
+                      stock_facts, estimate_tokens, record_call)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configure Gemini AI
+# Gemini SDK is imported and configured on first use, not at app start
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+genai = lazy_import("google.generativeai")
+_genai_configured = False
+_genai_lock = threading.Lock()
+
+# Optional stand-in for Gemini: a callable model_name -> object with generate_content(prompt)
+_llm_provider = None
+
+def set_llm_provider(provider=None):
+    """Route all model calls to provider (e.g. a stub for offline load tests); None restores Gemini"""
+    global _llm_provider
+    _llm_provider = provider
+
+def llm_available():
+    return _llm_provider is not None or bool(GEMINI_API_KEY)
+
+def get_model(model_name='gemini-pro'):
+    """Configure the Gemini SDK once and return a model"""
+    global _genai_configured
+    if _llm_provider is not None:
+        return _llm_provider(model_name)
+    if not _genai_configured:
+        with _genai_lock:
+            if not _genai_configured:
+                genai.configure(api_key=GEMINI_API_KEY)
+                _genai_configured = True
+    return genai.GenerativeModel(model_name)
+
+def generate(prompt, kind, model_name='gemini-pro', **kwargs):
+    """generate_content through the Gemini circuit breaker, with tokens and latency recorded under kind
+
+    The breaker bounds the wait and skips the call entirely while open. Streamed responses are
+    read through the breaker too, so a stream that stalls or fails partway counts as a failure;
+    they are recorded by the caller once they have been read to the end.
+    """
+    started = time.perf_counter()
+    breaker = get_breaker("gemini")
+    response = breaker.call(lambda: get_model(model_name).generate_content(prompt, **kwargs))
+    if kwargs.get('stream'):
+        return breaker.stream(response)
+    record_call(kind, prompt, response.text, time.perf_counter() - started,
+                getattr(response, 'usage_metadata', None))
+    return response
 
 def clean_json_string(text):
     """Clean the response text to extract valid JSON"""
@@ -33,46 +80,52 @@ def validate_analysis(analysis):
         if field in ['strengths', 'risks', 'suggested_questions'] and not isinstance(analysis[field], list):
             analysis[field] = [analysis[field]]
 
+# Batched analysis: stocks per prompt are bounded by the prompt budget and by the response
+# budget (each analysis is roughly ANALYSIS_OUTPUT_TOKENS long)
+BATCH_MAX_PROMPT_TOKENS = int(os.environ.get("AI_BATCH_MAX_PROMPT_TOKENS", 6000))
+BATCH_MAX_OUTPUT_TOKENS = int(os.environ.get("AI_BATCH_MAX_OUTPUT_TOKENS", 2048))
+ANALYSIS_OUTPUT_TOKENS = 300
+
+def fallback_analysis(reason="error"):
+    """Placeholder analysis shown when the model can't be used ('config', 'parse' or 'error')"""
+    if reason == "config":
+        return {
+            "summary": "Unable to generate AI analysis: API key is missing.",
+            "strengths": ["Please set up the Gemini API key to enable AI insights."],
+            "risks": ["Contact administrator to configure the API key."],
+            "recommendation": "API configuration required.",
+            "suggested_questions": []
+        }
+    if reason == "parse":
+        return {
+            "summary": "Unable to process AI analysis response.",
+            "strengths": ["Data is available but couldn't be processed."],
+            "risks": ["Try refreshing or analyzing a different stock."],
+            "recommendation": "Please try again with a different stock or time period.",
+            "suggested_questions": []
+        }
+    return {
+        "summary": "Unable to generate AI analysis at this time.",
+        "strengths": ["Technical issue encountered while generating analysis."],
+        "risks": ["Temporary API or processing error."],
+        "recommendation": "Please try again in a few moments.",
+        "suggested_questions": []
+    }
+
+@span("get_stock_analysis")
 def get_stock_analysis(stock_info, metrics):
     """Get AI-powered analysis of the stock"""
     try:
         logger.info(f"Generating AI analysis for {stock_info.get('symbol', 'Unknown Stock')}")
 
-        prompt = f"""
-        You are a professional financial analyst. Analyze this stock and provide investment insights.
-
-        Stock Information:
-        - Company: {stock_info.get('longName', 'Unknown')}
-        - Sector: {stock_info.get('sector', 'Unknown')}
-        - Current Price: ${stock_info.get('currentPrice', 'N/A')}
-        - P/E Ratio: {metrics.get('PE Ratio', 'N/A')}
-        - Market Cap: {metrics.get('Market Cap', 'N/A')}
-        - EPS: {metrics.get('EPS', 'N/A')}
-        - Dividend Yield: {metrics.get('Dividend Yield', 'N/A')}
-
-        Provide your analysis in the following JSON format EXACTLY (no markdown, no additional text):
-        {{
-            "summary": "A concise summary of the stock's current position and outlook",
-            "strengths": ["strength1", "strength2", "strength3"],
-            "risks": ["risk1", "risk2", "risk3"],
-            "recommendation": "A clear buy/hold/sell recommendation with brief explanation",
-            "suggested_questions": [
-                "What are the main competitors?",
-                "How does the P/E ratio compare to industry average?",
-                "What are the growth prospects for next year?"
-            ]
-        }}
-        """
-
-        if not GEMINI_API_KEY:
+        prompt = analysis_prompt(stock_info, metrics)
+
+        if not llm_available():
             logger.error("Gemini API key is not set")
             raise ValueError("Gemini API key is missing. Please set the GEMINI_API_KEY environment variable.")
 
-        # Initialize the model
-        model = genai.GenerativeModel('gemini-pro')
-
         # Generate the response
-        response = model.generate_content(prompt)
+        response = generate(prompt, "analysis")
 
         # Clean and parse the response
         cleaned_response = clean_json_string(response.text)
@@ -86,95 +139,170 @@ def get_stock_analysis(stock_info, metrics):
 
     except ValueError as ve:
         logger.error(f"Configuration error: {str(ve)}")
-        return {
-            "summary": "Unable to generate AI analysis: API key is missing.",
-            "strengths": ["Please set up the Gemini API key to enable AI insights."],
-            "risks": ["Contact administrator to configure the API key."],
-            "recommendation": "API configuration required.",
-            "suggested_questions": []
-        }
+        return fallback_analysis("config")
     except json.JSONDecodeError as je:
         logger.error(f"JSON parsing error: {str(je)}")
-        return {
-            "summary": "Unable to process AI analysis response.",
-            "strengths": ["Data is available but couldn't be processed."],
-            "risks": ["Try refreshing or analyzing a different stock."],
-            "recommendation": "Please try again with a different stock or time period.",
-            "suggested_questions": []
-        }
+        return fallback_analysis("parse")
     except Exception as e:
         logger.error(f"Error generating AI analysis: {str(e)}")
-        return {
-            "summary": "Unable to generate AI analysis at this time.",
-            "strengths": ["Technical issue encountered while generating analysis."],
-            "risks": ["Temporary API or processing error."],
-            "recommendation": "Please try again in a few moments.",
-            "suggested_questions": []
-        }
+        return fallback_analysis("error")
+
+def plan_batches(stocks, max_prompt_tokens=None, max_output_tokens=None):
+    """Split stocks into consecutive batches that fit the prompt and response token budgets"""
+    max_prompt_tokens = max_prompt_tokens or BATCH_MAX_PROMPT_TOKENS
+    max_per_batch = max(1, (max_output_tokens or BATCH_MAX_OUTPUT_TOKENS) // ANALYSIS_OUTPUT_TOKENS)
+    overhead = estimate_tokens(batch_analysis_prompt([]))
+    batches, current, size = [], [], overhead
+    for stock in stocks:
+        stock_tokens = estimate_tokens(stock_facts(*stock, symbol=True)) + 1
+        if current and (size + stock_tokens > max_prompt_tokens or len(current) >= max_per_batch):
+            batches.append(current)
+            current, size = [], overhead
+        current.append(stock)
+        size += stock_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def clean_json_array(text):
+    """Extract the outermost JSON array from a model response"""
+    start = text.find('[')
+    end = text.rfind(']') + 1
+    return text[start:end] if start != -1 and end != 0 else text
+
+def _analyze_batch(stocks):
+    """Analyses for one batch; a malformed response is split in half and retried, single stocks go unbatched"""
+    if len(stocks) == 1:
+        return [get_stock_analysis(*stocks[0])]
+    try:
+        response = generate(batch_analysis_prompt(stocks), "batch_analysis")
+    except Exception as e:
+        # The service itself failed; more calls for the same batch would fail the same way
+        logger.error(f"Error generating batched AI analysis: {str(e)}")
+        return [fallback_analysis("error") for _ in stocks]
+
+    try:
+        items = json.loads(clean_json_array(response.text))
+        if not isinstance(items, list):
+            raise ValueError("Batched response is not a JSON array")
+    except ValueError as e:
+        logger.warning(f"Unusable batched response for {len(stocks)} stocks, splitting: {str(e)}")
+        middle = len(stocks) // 2
+        return _analyze_batch(stocks[:middle]) + _analyze_batch(stocks[middle:])
+
+    by_symbol = {str(item.get('symbol', '')).upper(): item for item in items if isinstance(item, dict)}
+    analyses = []
+    for i, (stock_info, metrics) in enumerate(stocks):
+        symbol = str(stock_info.get('symbol', f'STOCK{i + 1}')).upper()
+        # Match by symbol; position is only trusted for an item without any symbol, since an item
+        # naming another stock (or a misspelt one) may have been reordered
+        item = by_symbol.get(symbol)
+        if item is None and i < len(items) and isinstance(items[i], dict) and 'symbol' not in items[i]:
+            item = items[i]
+        try:
+            if item is None:
+                raise ValueError(f"No analysis returned for {symbol}")
+            item = dict(item)
+            item.pop('symbol', None)
+            validate_analysis(item)
+            analyses.append(item)
+        except ValueError as e:
+            logger.warning(f"Batched analysis invalid for {symbol}, retrying alone: {str(e)}")
+            analyses.append(get_stock_analysis(stock_info, metrics))
+    return analyses
+
+@span("get_batch_stock_analysis")
+def get_batch_stock_analysis(stocks, max_prompt_tokens=None, max_output_tokens=None):
+    """AI analyses for many (stock_info, metrics) pairs using as few model calls as the token budgets allow
+
+    Results come back in input order and match get_stock_analysis's shape, fallbacks included.
+    """
+    if not stocks:
+        return []
+    if not llm_available():
+        logger.error("Gemini API key is not set")
+        return [fallback_analysis("config") for _ in stocks]
+    batches = plan_batches(stocks, max_prompt_tokens, max_output_tokens)
+    logger.info(f"Generating AI analysis for {len(stocks)} stocks in {len(batches)} batches")
+    analyses = []
+    for batch in batches:
+        analyses.extend(_analyze_batch(batch))
+    return analyses
+
+FOLLOW_UP_ERROR = "I apologize, but I'm unable to process your question at this time. Please try again later."
+
+class FollowUpUnavailable(Exception):
+    """Raised by a follow-up stream that fails, possibly after some pieces have been yielded"""
 
 def ask_follow_up_question(stock_info, metrics, question):
     """Handle follow-up questions about the stock"""
     try:
         logger.info(f"Processing follow-up question for {stock_info.get('symbol', 'Unknown Stock')}")
 
-        prompt = f"""
-        You are a professional financial analyst. Answer this specific question about the stock:
-
-        Stock Information:
-        - Company: {stock_info.get('longName', 'Unknown')}
-        - Sector: {stock_info.get('sector', 'Unknown')}
-        - Current Price: ${stock_info.get('currentPrice', 'N/A')}
-        - P/E Ratio: {metrics.get('PE Ratio', 'N/A')}
-        - Market Cap: {metrics.get('Market Cap', 'N/A')}
-        - EPS: {metrics.get('EPS', 'N/A')}
-        - Dividend Yield: {metrics.get('Dividend Yield', 'N/A')}
-
-        Question: {question}
+        prompt = follow_up_prompt(stock_info, metrics, question)
 
-        Provide a detailed but concise answer focusing specifically on the question asked.
-        """
-
-        if not GEMINI_API_KEY:
+        if not llm_available():
             raise ValueError("Gemini API key is missing")
 
-        model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(prompt)
+        response = generate(prompt, "follow_up")
 
         return response.text
 
     except Exception as e:
         logger.error(f"Error processing follow-up question: {str(e)}")
-        return "I apologize, but I'm unable to process your question at this time. Please try again later."
+        return FOLLOW_UP_ERROR
+
+def stream_follow_up_question(stock_info, metrics, question):
+    """Yield the answer to a follow-up question piece by piece as the model produces it
+
+    Closing the generator (e.g. on a Streamlit rerun) stops the stream; on failure it raises
+    FollowUpUnavailable, so the pieces already yielded are never mistaken for a whole answer.
+    """
+    started = time.perf_counter()
+    try:
+        logger.info(f"Streaming follow-up answer for {stock_info.get('symbol', 'Unknown Stock')}")
+
+        if not llm_available():
+            raise ValueError("Gemini API key is missing")
+
+        prompt = follow_up_prompt(stock_info, metrics, question)
+        response = generate(prompt, "follow_up_stream", stream=True)
+        first = True
+        pieces, usage = [], None
+        for chunk in response:
+            text = chunk.text
+            if first:
+                # Time to first token is the wait users actually notice
+                get_registry().observe("follow_up.first_chunk", time.perf_counter() - started)
+                first = False
+            # Gemini reports usage on the final chunk
+            usage = getattr(chunk, 'usage_metadata', None) or usage
+            pieces.append(text)
+            yield text
+        get_registry().observe("follow_up.complete", time.perf_counter() - started)
+        record_call("follow_up_stream", prompt, "".join(pieces), time.perf_counter() - started, usage)
+        increment("follow_up_streams", result="complete")
+
+    except GeneratorExit:
+        logger.info("Follow-up answer cancelled")
+        increment("follow_up_streams", result="cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming follow-up answer: {str(e)}")
+        increment("follow_up_streams", result="error")
+        raise FollowUpUnavailable(FOLLOW_UP_ERROR) from e
 
 def suggest_stocks(risk_profile, investment_amount, sectors=None):
     """Get AI-powered stock suggestions based on risk profile and criteria"""
     try:
         logger.info(f"Generating stock suggestions for {risk_profile} risk profile")
 
-        prompt = f"""
-        As a financial advisor, suggest 5 stock ticker symbols based on the following criteria:
-
-        Risk Profile: {risk_profile}
-        Investment Amount: ${investment_amount}
-        {f'Preferred Sectors: {", ".join(sectors)}' if sectors else ''}
-
-        Provide your suggestions in the following JSON format:
-        {{
-            "suggestions": [
-                {{
-                    "ticker": "Symbol",
-                    "company": "Company Name",
-                    "reason": "Brief explanation for recommendation"
-                }}
-            ]
-        }}
-        """
-
-        if not GEMINI_API_KEY:
+        prompt = suggestion_prompt(risk_profile, investment_amount, sectors)
+
+        if not llm_available():
             raise ValueError("Gemini API key is missing")
 
-        model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(prompt)
+        response = generate(prompt, "suggestions")
 
         suggestions = json.loads(clean_json_string(response.text))
         return suggestions.get('suggestions', [])
@@ -0,0 +1,316 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from .stock_data import get_stock_data, get_key_metrics, calculate_technical_indicators
+from .ai_advisor import get_stock_analysis, stream_follow_up_question
+from .question_index import get_question_index
+from .metrics import increment
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds each stage of the analysis pipeline stays fresh
+STAGE_TTLS = {
+    "stock_data": 15 * 60,
+    "indicators": 15 * 60,
+    "prediction": 6 * 60 * 60,
+    "ai_analysis": 6 * 60 * 60,
+    "follow_up": 6 * 60 * 60
+}
+
+# Upper bound on cached results (price frames, models' outputs, AI analyses) per process
+MAX_ENTRIES = int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", 512))
+
+# Seconds past its TTL a stage's value may still be served while a background refresh runs,
+# so an upstream outage shows slightly old prices instead of errors and timeouts
+STALE_FOR = {
+    "stock_data": float(os.environ.get("STALE_DATA_MAX_AGE", 24 * 60 * 60))
+}
+
+class AnalysisCache:
+    """Process-wide single-flight cache: one computation per key, with LRU eviction and per-key TTLs"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        # key -> [expires_at, future, stored_at, refreshing]; expires_at is None while the computation is in flight
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute, ttl, cacheable=None, stale_for=0):
+        """Cached value for key; on a miss the first caller computes it and concurrent callers wait
+
+        Up to stale_for seconds after expiry the old value is returned at once and a single
+        background refresh replaces it; while refreshes fail the old value keeps being served.
+        """
+        refresh = False
+        with self._lock:
+            now = time.time()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] < now:
+                if entry[0] + stale_for >= now:
+                    refresh = not entry[3]
+                    entry[3] = True
+                else:
+                    del self._entries[key]
+                    entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry[0] is None:
+                    self.coalesced += 1
+                    result = "coalesced"
+                elif entry[0] < now:
+                    self.stale += 1
+                    result = "stale"
+                else:
+                    self.hits += 1
+                    result = "hit"
+                future, owner = entry[1], False
+            else:
+                future, owner = Future(), True
+                self._entries[key] = [None, future, None, False]
+                self.misses += 1
+                result = "miss"
+                self._evict()
+        increment("analysis_cache_requests", result=result, stage=_stage(key))
+
+        if refresh:
+            self._refresher.submit(self._refresh, key, entry, compute, ttl, cacheable)
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            # Waiters see the same failure; the next caller retries
+            self._discard(key, future)
+            future.set_exception(e)
+            raise
+
+        if cacheable is None or cacheable(value):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] is future:
+                    entry[0] = time.time() + ttl
+                    entry[2] = time.time()
+        else:
+            self._discard(key, future)
+        future.set_result(value)
+        return value
+
+    def _refresh(self, key, stale_entry, compute, ttl, cacheable):
+        try:
+            value = compute()
+        except Exception as e:
+            logger.warning(f"Background refresh of {key} failed, still serving cached value: {str(e)}")
+            increment("analysis_cache_refreshes", result="failure", stage=_stage(key))
+            with self._lock:
+                stale_entry[3] = False
+            return
+        with self._lock:
+            stale_entry[3] = False
+            if (cacheable is None or cacheable(value)) and self._entries.get(key) is stale_entry:
+                future = Future()
+                future.set_result(value)
+                self._entries[key] = [time.time() + ttl, future, time.time(), False]
+        increment("analysis_cache_refreshes", result="success", stage=_stage(key))
+
+    def get(self, key):
+        """Finished, unexpired value for key, or None; never computes or waits"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is None or entry[0] < time.time():
+                self.misses += 1
+                result, value = "miss", None
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                result, value = "hit", entry[1].result()
+        increment("analysis_cache_requests", result=result, stage=_stage(key))
+        return value
+
+    def put(self, key, value, ttl):
+        """Store a value produced outside get_or_compute, e.g. a fully streamed answer"""
+        future = Future()
+        future.set_result(value)
+        with self._lock:
+            self._entries[key] = [time.time() + ttl, future, time.time(), False]
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def as_of(self, key):
+        """(stored_at, stale) for a finished entry, or None; stale means past its TTL and awaiting refresh"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is None:
+                return None
+            return entry[2], entry[0] < time.time()
+
+    def _evict(self):
+        """Drop least recently used finished entries beyond max_entries (caller holds the lock)"""
+        if len(self._entries) <= self.max_entries:
+            return
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if self._entries[key][0] is not None:
+                del self._entries[key]
+                self.evictions += 1
+                increment("analysis_cache_evictions", stage=_stage(key))
+
+    def _discard(self, key, future):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is future:
+                del self._entries[key]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_flight": sum(1 for entry in self._entries.values() if entry[0] is None),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "stale": self.stale,
+                "evictions": self.evictions
+            }
+
+def _stage(key):
+    return key[0] if isinstance(key, tuple) and key else "other"
+
+_cache = AnalysisCache()
+
+def get_cache():
+    """The process-wide analysis cache"""
+    return _cache
+
+def data_version(hist):
+    """Fingerprint of a price history, so derived results are keyed to the data they came from"""
+    if hist is None or len(hist) == 0:
+        return None
+    return str(hist.index[-1]), float(hist['Close'].iloc[-1]), len(hist)
+
+def is_fallback_analysis(analysis):
+    """AI analyses that only describe a failure are not worth caching"""
+    return 'error' in analysis or analysis.get('summary', '').startswith('Unable to')
+
+def _stock_data_key(symbol, period, interval):
+    return ("stock_data", symbol, period) if interval == '1d' else ("stock_data", symbol, period, interval)
+
+def cached_stock_data(symbol, period='1y', interval='1d'):
+    """(history, info) for symbol; callers must not modify the shared frames
+
+    Expired data is served while it refreshes in the background, see stock_data_as_of.
+    """
+    return _cache.get_or_compute(
+        _stock_data_key(symbol, period, interval),
+        lambda: get_stock_data(symbol, period, interval),
+        STAGE_TTLS["stock_data"],
+        stale_for=STALE_FOR["stock_data"]
+    )
+
+def stock_data_as_of(symbol, period='1y', interval='1d'):
+    """{'fetched_at': epoch seconds, 'stale': bool} for the cached data of symbol, or None if not cached"""
+    as_of = _cache.as_of(_stock_data_key(symbol, period, interval))
+    if as_of is None:
+        return None
+    return {"fetched_at": as_of[0], "stale": as_of[1]}
+
+def cached_multiple_stocks_data(symbols, period='5y'):
+    """{symbol: {'history', 'info'}} like get_multiple_stocks_data, sharing each fetch through the cache"""
+    data = {}
+    for symbol in symbols:
+        try:
+            hist, info = cached_stock_data(symbol, period)
+            data[symbol] = {'history': hist, 'info': info}
+        except Exception as e:
+            logger.error(f"Error fetching data for {symbol}: {str(e)}")
+    if not data:
+        raise Exception("Failed to fetch data for all requested symbols")
+    return data
+
+def cached_indicators(symbol, period='1y'):
+    """Price history with SMA/RSI columns, computed on a copy of the cached history"""
+    hist, _ = cached_stock_data(symbol, period)
+    return _cache.get_or_compute(
+        ("indicators", symbol, period, data_version(hist)),
+        lambda: calculate_technical_indicators(hist.copy()),
+        STAGE_TTLS["indicators"]
+    )
+
+def cached_prediction(symbol, period='1y'):
+    """(predictions, confidence) from the StockPredictor trained on the cached history"""
+    from .ml_predictor import StockPredictor
+    hist, _ = cached_stock_data(symbol, period)
+    return _cache.get_or_compute(
+        ("prediction", symbol, period, data_version(hist)),
+        lambda: StockPredictor().analyze_stock(hist),
+        STAGE_TTLS["prediction"]
+    )
+
+def cached_stock_analysis(symbol, period='1y'):
+    """AI analysis for symbol; failures are returned but not cached"""
+    hist, info = cached_stock_data(symbol, period)
+    return _cache.get_or_compute(
+        ("ai_analysis", symbol, period, data_version(hist)),
+        lambda: get_stock_analysis(info, get_key_metrics(info)),
+        STAGE_TTLS["ai_analysis"],
+        cacheable=lambda analysis: not is_fallback_analysis(analysis)
+    )
+
+def _follow_up_key(symbol, period, question):
+    hist, info = cached_stock_data(symbol, period)
+    return ("follow_up", symbol, period, data_version(hist), " ".join(question.lower().split())), info
+
+def stream_follow_up_answer(symbol, period, question):
+    """Answer pieces for a follow-up question: a cached answer (same or similar question) in one piece,
+    otherwise streamed from the model
+
+    Only answers streamed to the end are cached; a failed (FollowUpUnavailable) or closed stream
+    leaves nothing behind.
+    """
+    key, info = _follow_up_key(symbol, period, question)
+    answer = _cache.get(key)
+    if answer is not None:
+        yield answer
+        return
+    # A differently worded question already answered for this symbol
+    match = get_question_index().lookup(symbol, question)
+    increment("follow_up_similar", result="hit" if match else "miss")
+    if match is not None:
+        logger.info(f"Reusing answer to {match[2]!r} for {question!r} ({symbol}, similarity {match[1]:.2f})")
+        yield match[0]
+        return
+    chunks = []
+    for chunk in stream_follow_up_question(info, get_key_metrics(info), question):
+        chunks.append(chunk)
+        yield chunk
+    if chunks:
+        answer = "".join(chunks)
+        _cache.put(key, answer, STAGE_TTLS["follow_up"])
+        get_question_index().add(symbol, question, answer)
+
+def warm_symbol(symbol, period='1y', include_ai=True):
+    """Run every cached stage for symbol so the next request is served from the cache"""
+    cached_indicators(symbol, period)
+    cached_prediction(symbol, period)
+    if include_ai:
+        cached_stock_analysis(symbol, period)
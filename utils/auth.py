@@ -1,14 +1,43 @@
 import json
+import functools
 import hashlib
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 import logging
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterator, Tuple
+from .metrics import span, increment
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Chat messages per database file, shared by every AuthManager in the process and
+# reloaded only when the file's modification time or size changes
+_chat_cache = {}
+_chat_cache_lock = threading.Lock()
+
+# One lock per database file so read-modify-write cycles from concurrent sessions don't lose updates
+_db_locks = {}
+_db_locks_guard = threading.Lock()
+
+def _db_lock(db_path):
+    with _db_locks_guard:
+        lock = _db_locks.get(db_path)
+        if lock is None:
+            lock = _db_locks[db_path] = threading.RLock()
+        return lock
+
+def _serialized(method):
+    """Run an AuthManager method that loads, modifies and saves the database under its lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._locked():
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class AuthManager:
     def __init__(self, db_path: str = "data/users.json"):
         self.db_path = db_path
@@ -30,6 +59,7 @@ class AuthManager:
         """Hash a password using SHA-256"""
         return hashlib.sha256(password.encode()).hexdigest()
 
+    @span("AuthManager.load_db")
     def _load_db(self) -> Dict:
         """Load the JSON database"""
         try:
@@ -39,19 +69,41 @@ class AuthManager:
             logger.error(f"Error loading database: {str(e)}")
             raise
 
+    @span("AuthManager.save_db")
     def _save_db(self, data: Dict):
         """Save data to the JSON database"""
         try:
-            with open(self.db_path, 'w') as f:
-                json.dump(data, f, indent=4)
+            # Write a temporary file and swap it in so readers never see a half-written file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.db_path) or ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, indent=4)
+                os.replace(tmp_path, self.db_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
         except Exception as e:
             logger.error(f"Error saving database: {str(e)}")
             raise
 
+    @contextmanager
+    def _locked(self):
+        """Hold the database lock, recording how often and how long callers wait for it"""
+        lock = _db_lock(self.db_path)
+        if not lock.acquire(blocking=False):
+            increment("auth_lock_contended")
+            with span("AuthManager.lock_wait"):
+                lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+
     def is_superuser(self, username: str) -> bool:
         """Check if user is a superuser"""
         return username == self.SUPERUSER
 
+    @_serialized
     def register_user(self, username: str, password: str) -> bool:
         """Register a new user"""
         try:
@@ -73,6 +125,7 @@ class AuthManager:
             logger.error(f"Error registering user: {str(e)}")
             return False
 
+    @_serialized
     def verify_user(self, username: str, password: str) -> bool:
         """Verify user credentials"""
         try:
@@ -88,6 +141,7 @@ class AuthManager:
             logger.error(f"Error verifying user: {str(e)}")
             return False
 
+    @_serialized
     def save_chat_message(self, username: str, message: str) -> bool:
         """Save a chat message"""
         try:
@@ -95,7 +149,9 @@ class AuthManager:
             if "chat_messages" not in db:
                 db["chat_messages"] = []
 
-            message_id = len(db["chat_messages"])  # Simple incrementing ID
+            # Monotonic ID that survives deletions and trimming
+            message_id = db.get("chat_next_id", max((msg.get("id", -1) for msg in db["chat_messages"]), default=-1) + 1)
+            db["chat_next_id"] = message_id + 1
             db["chat_messages"].append({
                 "id": message_id,
                 "username": username,
@@ -113,6 +169,7 @@ class AuthManager:
             logger.error(f"Error saving chat message: {str(e)}")
             return False
 
+    @_serialized
     def delete_message(self, message_id: int, username: str) -> bool:
         """Delete a chat message (superuser only)"""
         try:
@@ -120,23 +177,69 @@ class AuthManager:
                 return False
 
             db = self._load_db()
-            db["chat_messages"] = [msg for msg in db["chat_messages"] if msg.get("id") != message_id]
+            remaining = [msg for msg in db["chat_messages"] if msg.get("id") != message_id]
+            if len(remaining) < len(db["chat_messages"]):
+                db["chat_deletions"] = db.get("chat_deletions", 0) + 1
+            db["chat_messages"] = remaining
             self._save_db(db)
             return True
         except Exception as e:
             logger.error(f"Error deleting message: {str(e)}")
             return False
 
+    def _chat_snapshot(self) -> Dict:
+        """Cached chat state for this database, re-read only after the file changes"""
+        stat = os.stat(self.db_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with _chat_cache_lock:
+            snapshot = _chat_cache.get(self.db_path)
+            if snapshot is None or snapshot["stamp"] != stamp:
+                db = self._load_db()
+                messages = db.get("chat_messages", [])
+                snapshot = {
+                    "stamp": stamp,
+                    "messages": messages,
+                    "latest_id": max((msg.get("id", -1) for msg in messages), default=-1),
+                    "deletions": db.get("chat_deletions", 0)
+                }
+                _chat_cache[self.db_path] = snapshot
+            return snapshot
+
     def get_chat_messages(self, limit: int = 50) -> List[Dict]:
         """Get recent chat messages"""
         try:
-            db = self._load_db()
-            messages = db.get("chat_messages", [])
+            messages = self._chat_snapshot()["messages"]
             return messages[-limit:] if messages else []
         except Exception as e:
             logger.error(f"Error getting chat messages: {str(e)}")
             return []
 
+    def get_latest_message_id(self) -> int:
+        """ID of the newest chat message (-1 if none); a stat call when nothing has changed"""
+        try:
+            return self._chat_snapshot()["latest_id"]
+        except Exception as e:
+            logger.error(f"Error getting latest message id: {str(e)}")
+            return -1
+
+    def get_chat_revision(self) -> Tuple[int, int]:
+        """(latest message id, deletion count); changes whenever the visible chat changes"""
+        try:
+            snapshot = self._chat_snapshot()
+            return snapshot["latest_id"], snapshot["deletions"]
+        except Exception as e:
+            logger.error(f"Error getting chat revision: {str(e)}")
+            return -1, 0
+
+    def get_messages_since(self, message_id: int, limit: int = 50) -> List[Dict]:
+        """Chat messages newer than message_id, oldest first"""
+        try:
+            messages = [msg for msg in self._chat_snapshot()["messages"] if msg.get("id", -1) > message_id]
+            return messages[-limit:]
+        except Exception as e:
+            logger.error(f"Error getting new chat messages: {str(e)}")
+            return []
+
     def get_all_users(self, username: str) -> Optional[List[Dict]]:
         """Get list of all users (superuser only)"""
         try:
@@ -157,6 +260,7 @@ class AuthManager:
             logger.error(f"Error getting users list: {str(e)}")
             return None
 
+    @_serialized
     def save_user_activity(self, username: str, activity_type: str, data: Dict):
         """Save user activity (searches, analyses, etc.)"""
         try:
@@ -189,6 +293,36 @@ class AuthManager:
             logger.error(f"Error getting user data: {str(e)}")
             return None
 
+    def iter_user_goals(self) -> Iterator[Tuple[str, List[Dict]]]:
+        """Iterate over (username, goals) for every user from a single database read"""
+        try:
+            db = self._load_db()
+        except Exception as e:
+            logger.error(f"Error loading user goals: {str(e)}")
+            return
+        for username, data in db["users"].items():
+            yield username, data.get("goals", [])
+
+    def iter_user_portfolios(self) -> Iterator[Tuple[str, Dict]]:
+        """Iterate over (username, portfolio) for every user from a single database read"""
+        try:
+            db = self._load_db()
+        except Exception as e:
+            logger.error(f"Error loading user portfolios: {str(e)}")
+            return
+        for username, data in db["users"].items():
+            yield username, data.get("portfolio", [])
+
+    def iter_search_history(self) -> Iterator[Tuple[str, List[Dict]]]:
+        """Iterate over (username, search_history) for every user from a single database read"""
+        try:
+            db = self._load_db()
+        except Exception as e:
+            logger.error(f"Error loading search history: {str(e)}")
+            return
+        for username, data in db["users"].items():
+            yield username, data.get("search_history", [])
+
     def get_search_history(self, username: str) -> List[Dict]:
         """Get user's search history"""
         try:
@@ -199,6 +333,7 @@ class AuthManager:
             logger.error(f"Error getting search history: {str(e)}")
             return []
 
+    @_serialized
     def send_notification(self, from_username: str, to_username: str, message: str) -> bool:
         """Send a notification to a user (superuser only)"""
         try:
@@ -236,6 +371,7 @@ class AuthManager:
             logger.error(f"Error getting notifications: {str(e)}")
             return []
 
+    @_serialized
     def mark_notification_as_read(self, username: str, notification_id: int) -> bool:
         """Mark a notification as read"""
         try:
@@ -253,6 +389,7 @@ class AuthManager:
             logger.error(f"Error marking notification as read: {str(e)}")
             return False
 
+    @_serialized
     def send_notification_to_all(self, from_username: str, message: str) -> bool:
         """Send a notification to all users (superuser only)"""
         try:
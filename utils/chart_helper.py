@@ -1,11 +1,13 @@
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import logging
+from .metrics import span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@span("create_stock_chart")
 def create_stock_chart(df, predictions=None):
     """Create an interactive stock chart with technical indicators and predictions"""
     try:
@@ -101,6 +103,7 @@ def create_stock_chart(df, predictions=None):
         logger.error(f"Error creating stock chart: {str(e)}")
         raise Exception(f"Error creating stock visualization: {str(e)}")
 
+@span("create_comparison_chart")
 def create_comparison_chart(stock_data_dict, period):
     """Create a comparison chart for multiple stocks"""
     try:
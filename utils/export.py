@@ -0,0 +1,107 @@
+import gzip
+import logging
+import shutil
+import tempfile
+import zipfile
+from .metrics import span
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows serialized at a time, so an export never holds a second full copy of the history as text
+CHUNK_ROWS = 50_000
+# Exports stay in memory up to this size and spill to a temporary file beyond it
+SPOOL_BYTES = 8 * 1024 * 1024
+
+# Display name -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet")
+}
+
+def parquet_available():
+    """Parquet export needs pyarrow, which is optional"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def available_formats():
+    return [name for name in EXPORT_FORMATS if name != "Parquet" or parquet_available()]
+
+def export_filename(stem, fmt):
+    return f"{stem}.{EXPORT_FORMATS[fmt][0]}"
+
+def export_mime(fmt):
+    return EXPORT_FORMATS[fmt][1]
+
+def iter_csv_chunks(df, chunk_rows=CHUNK_ROWS):
+    """CSV bytes for df, header first, CHUNK_ROWS rows at a time"""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(header=start == 0).encode("utf-8")
+
+def _write_parquet(df, fileobj, chunk_rows=CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            table = pa.Table.from_pandas(df.iloc[start:start + chunk_rows])
+            if writer is None:
+                writer = pq.ParquetWriter(fileobj, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_export(df, fmt, fileobj):
+    """Serialize df into an open binary file in the given EXPORT_FORMATS format, chunk by chunk"""
+    if fmt == "CSV":
+        for chunk in iter_csv_chunks(df):
+            fileobj.write(chunk)
+    elif fmt == "CSV (gzip)":
+        with gzip.GzipFile(fileobj=fileobj, mode="wb") as compressed:
+            for chunk in iter_csv_chunks(df):
+                compressed.write(chunk)
+    elif fmt == "Parquet":
+        _write_parquet(df, fileobj)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+@span("export_frame")
+def export_frame(df, fmt):
+    """Spooled temporary file holding df in fmt, rewound for reading"""
+    try:
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        write_export(df, fmt, output)
+        output.seek(0)
+        return output
+    except Exception as e:
+        logger.error(f"Error exporting data as {fmt}: {str(e)}")
+        raise Exception(f"Error exporting data as {fmt}: {str(e)}")
+
+@span("export_archive")
+def export_archive(frames, fmt):
+    """Zip archive with one fmt file per {stem: df} entry, as a rewound spooled temporary file"""
+    try:
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        # gzip and Parquet are already compressed
+        compression = zipfile.ZIP_DEFLATED if fmt == "CSV" else zipfile.ZIP_STORED
+        with zipfile.ZipFile(output, "w", compression=compression) as archive:
+            for stem, df in frames.items():
+                with archive.open(export_filename(stem, fmt), "w", force_zip64=True) as entry:
+                    if fmt == "Parquet":
+                        # Parquet writers need a seekable file; stage each member in its own spool
+                        staged = export_frame(df, fmt)
+                        shutil.copyfileobj(staged, entry)
+                        staged.close()
+                    else:
+                        write_export(df, fmt, entry)
+        output.seek(0)
+        return output
+    except Exception as e:
+        logger.error(f"Error building {fmt} archive: {str(e)}")
+        raise Exception(f"Error building {fmt} archive: {str(e)}")
@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+import time
+import pandas as pd
+from .stock_data import get_stock_info, get_key_metrics, KEY_METRIC_FIELDS
+from .history_store import read_frame, write_frame, CHUNK_FORMAT
+from .metrics import span, increment
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fundamentals change quarterly; refresh them far less often than prices
+FUNDAMENTALS_TTL = float(os.environ.get("FUNDAMENTALS_TTL", 24 * 60 * 60))
+FUNDAMENTALS_REFRESH_INTERVAL = float(os.environ.get("FUNDAMENTALS_REFRESH_INTERVAL", 6 * 60 * 60))
+FUNDAMENTALS_PATH = os.environ.get("FUNDAMENTALS_PATH", f"data/fundamentals.{CHUNK_FORMAT}")
+METRICS = list(KEY_METRIC_FIELDS)
+
+class FundamentalsStore:
+    """Key metrics as float64 columns (NaN when missing), one row per (date, symbol), latest row served per symbol"""
+
+    def __init__(self, path=FUNDAMENTALS_PATH, ttl=FUNDAMENTALS_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._history = self._empty()
+        self._latest = self._empty().droplevel("date")
+        if path and os.path.exists(path):
+            try:
+                self._history = read_frame(path)
+                self._rebuild_latest()
+            except Exception as e:
+                logger.error(f"Error loading fundamentals from {path}: {str(e)}")
+
+    @staticmethod
+    def _empty():
+        index = pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), pd.Index([], dtype=object)], names=["date", "symbol"])
+        df = pd.DataFrame({metric: pd.Series(dtype="float64") for metric in METRICS}, index=index)
+        df["Company"] = pd.Series(dtype=object)
+        df["updated_at"] = pd.Series(dtype="float64")
+        return df
+
+    def _rebuild_latest(self):
+        latest = self._history.sort_index(level="date").groupby(level="symbol").tail(1)
+        # One consolidated float64 block, so full-table reads are views rather than copies
+        self._latest = latest.droplevel("date").sort_index().copy()
+        self._latest.index.name = "symbol"
+
+    @staticmethod
+    def _row(symbol, info, updated_at):
+        metrics = get_key_metrics(info, numeric=True)
+        return {"date": pd.Timestamp(updated_at, unit="s").normalize(), "symbol": symbol, **metrics,
+                "Company": info.get("longName", symbol), "updated_at": updated_at}
+
+    def _append(self, rows):
+        new = pd.DataFrame(rows).set_index(["date", "symbol"]).astype({metric: "float64" for metric in METRICS})
+        with self._lock:
+            # Same-day rows are replaced, earlier dates kept as history
+            history = self._history.drop(new.index, errors="ignore") if len(self._history) else self._history
+            self._history = pd.concat([history, new]) if len(history) else new
+            self._rebuild_latest()
+
+    def record(self, symbol, info, updated_at=None):
+        """Store today's metrics for symbol from a Ticker.info dict"""
+        self._append([self._row(symbol, info, updated_at or time.time())])
+
+    def symbols(self):
+        return list(self._latest.index)
+
+    def stale(self, symbols=None, now=None):
+        """Symbols with no metrics or metrics older than the TTL"""
+        now = now or time.time()
+        latest = self._latest
+        symbols = self.symbols() if symbols is None else symbols
+        return [
+            symbol for symbol in symbols
+            if symbol not in latest.index or now - latest.at[symbol, "updated_at"] > self.ttl
+        ]
+
+    @span("FundamentalsStore.refresh")
+    def refresh(self, symbols, infos=None):
+        """Update stale symbols, from infos already downloaded where given, else from the info provider"""
+        infos = infos or {}
+        rows = []
+        for symbol in self.stale(symbols):
+            try:
+                info = infos.get(symbol) or get_stock_info(symbol)
+                rows.append(self._row(symbol, info, time.time()))
+                increment("fundamentals_refreshes", source="price_download" if symbol in infos else "info_provider")
+            except Exception as e:
+                logger.warning(f"Could not refresh fundamentals for {symbol}: {str(e)}")
+        if rows:
+            self._append(rows)
+            self.save()
+
+    def table(self, symbols=None):
+        """Latest typed metrics per symbol: the whole table is shared as is, a subset gathers only its rows"""
+        latest = self._latest
+        if symbols is None:
+            return latest
+        return latest.reindex(list(symbols))
+
+    def history(self, symbol):
+        """Every stored date of metrics for one symbol"""
+        with self._lock:
+            return self._history.xs(symbol, level="symbol").sort_index()
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._lock:
+                write_frame(self._history, self.path)
+        except Exception as e:
+            logger.error(f"Error saving fundamentals to {self.path}: {str(e)}")
+
+    def _loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh(self.symbols())
+            except Exception as e:
+                logger.error(f"Error in fundamentals refresh: {str(e)}")
+
+    def start(self, interval=FUNDAMENTALS_REFRESH_INTERVAL):
+        """Re-fetch stale metrics for every known symbol on a background thread, independent of price data"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, args=(interval,), name="fundamentals-refresh",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+
+_store = None
+_store_guard = threading.Lock()
+
+def get_fundamentals_store():
+    """The process-wide store persisted at FUNDAMENTALS_PATH"""
+    global _store
+    with _store_guard:
+        if _store is None:
+            _store = FundamentalsStore()
+        return _store
+
+def metrics_table(symbols, infos=None):
+    """Key metrics for symbols as typed columns, refreshing any that are missing or stale first"""
+    store = get_fundamentals_store()
+    store.refresh(symbols, infos)
+    return store.table(symbols)
@@ -1,23 +1,160 @@
 import logging
-from datetime import datetime
+from datetime import datetime, date
+import numpy as np
 from .ai_advisor import get_stock_analysis
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Asset allocation (percent) for each investment strategy
+INVESTMENT_STRATEGIES = {
+    "conservative": {
+        "stocks": 30,
+        "bonds": 60,
+        "cash": 10
+    },
+    "moderate": {
+        "stocks": 60,
+        "bonds": 35,
+        "cash": 5
+    },
+    "aggressive": {
+        "stocks": 80,
+        "bonds": 15,
+        "cash": 5
+    }
+}
+
+STRATEGY_NAMES = np.array(list(INVESTMENT_STRATEGIES))
+ALLOCATION_ASSETS = ["stocks", "bonds", "cash"]
+STRATEGY_ALLOCATIONS = np.array(
+    [[INVESTMENT_STRATEGIES[name][asset] for asset in ALLOCATION_ASSETS] for name in STRATEGY_NAMES],
+    dtype=np.float64
+)
+
+def _parse_target_date(target_date):
+    """Accept a YYYY-MM-DD string, date or datetime"""
+    if isinstance(target_date, datetime):
+        return target_date
+    if isinstance(target_date, date):
+        return datetime(target_date.year, target_date.month, target_date.day)
+    return datetime.strptime(target_date, "%Y-%m-%d")
+
 class FinancialGoal:
+    __slots__ = ("goal_type", "target_amount", "target_date", "current_amount", "progress")
+
     def __init__(self, goal_type, target_amount, target_date, current_amount=0):
         self.goal_type = goal_type
         self.target_amount = float(target_amount)
-        self.target_date = datetime.strptime(target_date, "%Y-%m-%d")
+        self.target_date = _parse_target_date(target_date)
         self.current_amount = float(current_amount)
         self.progress = (self.current_amount / self.target_amount) * 100 if target_amount > 0 else 0
 
-def analyze_goal_feasibility(goal, income, expenses):
+class GoalBatch:
+    """Columnar set of goals for vectorized feasibility and plan calculations"""
+    __slots__ = ("goal_types", "target_amounts", "current_amounts", "target_dates")
+
+    def __init__(self, goal_types, target_amounts, target_dates, current_amounts=None):
+        self.goal_types = np.asarray(goal_types, dtype=object)
+        self.target_amounts = np.asarray(target_amounts, dtype=np.float64)
+        self.target_dates = np.asarray(target_dates, dtype="datetime64[D]")
+        if current_amounts is None:
+            current_amounts = np.zeros(len(self.target_amounts))
+        self.current_amounts = np.asarray(current_amounts, dtype=np.float64)
+
+    @classmethod
+    def from_goals(cls, goals):
+        """Build a batch from FinancialGoal objects"""
+        return cls(
+            [goal.goal_type for goal in goals],
+            [goal.target_amount for goal in goals],
+            [goal.target_date.date() for goal in goals],
+            [goal.current_amount for goal in goals]
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a batch from saved goal dicts"""
+        return cls(
+            [record["goal_type"] for record in records],
+            [record["target_amount"] for record in records],
+            [record["target_date"] for record in records],
+            [record.get("current_amount", 0) for record in records]
+        )
+
+    def __len__(self):
+        return len(self.target_amounts)
+
+    @property
+    def progress(self):
+        """Progress towards each target in percent"""
+        safe_targets = np.where(self.target_amounts > 0, self.target_amounts, 1)
+        return np.where(self.target_amounts > 0, self.current_amounts / safe_targets * 100, 0)
+
+    def days_remaining(self, as_of=None):
+        """Whole days until each target date, matching timedelta.days"""
+        as_of = np.datetime64(as_of or datetime.now(), "us")
+        return (self.target_dates.astype("datetime64[us]") - as_of) // np.timedelta64(1, "D")
+
+    def analyze_feasibility(self, income, expenses, as_of=None):
+        """Vectorized analyze_goal_feasibility; income/expenses may be scalars or per-goal arrays"""
+        try:
+            months_remaining = self.days_remaining(as_of) / 30
+            amount_needed = self.target_amounts - self.current_amounts
+            monthly_savings = np.asarray(income, dtype=np.float64) - np.asarray(expenses, dtype=np.float64)
+            projected_savings = monthly_savings * months_remaining
+
+            has_time = months_remaining > 0
+            safe_months = np.where(has_time, months_remaining, 1)
+            is_achievable = projected_savings >= amount_needed
+
+            return {
+                "goal_type": self.goal_types,
+                "target_amount": self.target_amounts,
+                "current_progress": self.progress,
+                "monthly_required": np.where(has_time, amount_needed / safe_months, 0),
+                "projected_savings": projected_savings,
+                "is_achievable": is_achievable,
+                "additional_monthly_needed": np.where(
+                    is_achievable, 0, (amount_needed - projected_savings) / safe_months
+                )
+            }
+        except Exception as e:
+            logger.error(f"Error analyzing goal batch feasibility: {str(e)}")
+            raise Exception(f"Failed to analyze goal batch feasibility: {str(e)}")
+
+    def investment_plans(self, risk_tolerance, as_of=None):
+        """Vectorized generate_investment_plan; risk_tolerance may be a scalar or per-goal array"""
+        try:
+            years_to_goal = self.days_remaining(as_of) / 365
+
+            # Strategy index into STRATEGY_NAMES: conservative, moderate, aggressive
+            strategy = np.select([years_to_goal < 2, years_to_goal < 5], [0, 1], default=2)
+            conservative = np.asarray(risk_tolerance) == "conservative"
+            strategy = np.where(conservative & (strategy != 0), 1, strategy)
+
+            allocation = STRATEGY_ALLOCATIONS[strategy]
+            has_time = years_to_goal > 0
+            safe_months = np.where(has_time, years_to_goal * 12, 1)
+
+            return {
+                "goal_type": self.goal_types,
+                "time_horizon": years_to_goal,
+                "strategy": STRATEGY_NAMES[strategy],
+                "allocation": {asset: allocation[:, i] for i, asset in enumerate(ALLOCATION_ASSETS)},
+                "monthly_investment_needed": np.where(
+                    has_time, (self.target_amounts - self.current_amounts) / safe_months, 0
+                )
+            }
+        except Exception as e:
+            logger.error(f"Error generating goal batch investment plans: {str(e)}")
+            raise Exception(f"Failed to generate goal batch investment plans: {str(e)}")
+
+def analyze_goal_feasibility(goal, income, expenses, as_of=None):
     """Analyze the feasibility of a financial goal"""
     try:
-        months_remaining = (goal.target_date - datetime.now()).days / 30
+        months_remaining = (goal.target_date - (as_of or datetime.now())).days / 30
         amount_needed = goal.target_amount - goal.current_amount
         
         monthly_savings = income - expenses
@@ -51,11 +188,11 @@ def analyze_goal_feasibility(goal, income, expenses):
         logger.error(f"Error analyzing goal feasibility: {str(e)}")
         raise Exception(f"Failed to analyze goal feasibility: {str(e)}")
 
-def generate_investment_plan(goal, risk_tolerance):
+def generate_investment_plan(goal, risk_tolerance, as_of=None):
     """Generate an investment plan to meet financial goals"""
     try:
         # Calculate time horizon in years
-        years_to_goal = (goal.target_date - datetime.now()).days / 365
+        years_to_goal = (goal.target_date - (as_of or datetime.now())).days / 365
         
         # Adjust investment strategy based on time horizon and risk tolerance
         if years_to_goal < 2:
@@ -69,25 +206,7 @@ def generate_investment_plan(goal, risk_tolerance):
         if risk_tolerance == "conservative" and strategy != "conservative":
             strategy = "moderate"
             
-        investment_strategies = {
-            "conservative": {
-                "stocks": 30,
-                "bonds": 60,
-                "cash": 10
-            },
-            "moderate": {
-                "stocks": 60,
-                "bonds": 35,
-                "cash": 5
-            },
-            "aggressive": {
-                "stocks": 80,
-                "bonds": 15,
-                "cash": 5
-            }
-        }
-        
-        selected_strategy = investment_strategies[strategy]
+        selected_strategy = dict(INVESTMENT_STRATEGIES[strategy])
         
         return {
             "goal_type": goal.goal_type,
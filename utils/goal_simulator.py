@@ -0,0 +1,245 @@
+import json
+import logging
+import math
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .auth import AuthManager
+from .goal_planner import FinancialGoal, ALLOCATION_ASSETS, generate_investment_plan
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Annual return / volatility assumptions per asset class
+ANNUAL_RETURNS = np.array([0.07, 0.03, 0.02])
+ANNUAL_VOLATILITY = np.array([0.16, 0.06, 0.005])
+ASSET_CORRELATION = np.array([
+    [1.0, 0.2, 0.0],
+    [0.2, 1.0, 0.1],
+    [0.0, 0.1, 1.0]
+])
+
+DAYS_PER_MONTH = 30
+
+
+def goal_from_record(record: Dict) -> FinancialGoal:
+    """Build a FinancialGoal from a saved goal record"""
+    return FinancialGoal(
+        record["goal_type"],
+        record["target_amount"],
+        record["target_date"],
+        record.get("current_amount", 0)
+    )
+
+
+def generate_market_paths(n_paths: int, n_months: int, seed: Optional[int] = None) -> np.ndarray:
+    """Simulate correlated monthly asset-class returns, shape (n_paths, n_months, n_assets)"""
+    try:
+        rng = np.random.default_rng(seed)
+        monthly_mu = ANNUAL_RETURNS / 12
+        monthly_sigma = ANNUAL_VOLATILITY / np.sqrt(12)
+        chol = np.linalg.cholesky(ASSET_CORRELATION)
+
+        shocks = rng.standard_normal((n_paths, n_months, len(ALLOCATION_ASSETS)), dtype=np.float32)
+        correlated = shocks @ chol.T.astype(np.float32)
+        log_returns = (monthly_mu - 0.5 * monthly_sigma ** 2) + monthly_sigma * correlated
+        return np.expm1(log_returns).astype(np.float32)
+    except Exception as e:
+        logger.error(f"Error generating market paths: {str(e)}")
+        raise Exception(f"Failed to generate market paths: {str(e)}")
+
+
+def _prepare_goals(goal_records: List[Dict], risk_tolerance: str, as_of: datetime):
+    """Order goals by priority and derive horizons and allocation weights"""
+    goals = [goal_from_record(record) for record in goal_records]
+
+    # Explicit priority wins, otherwise the nearest target date is funded first
+    order = sorted(
+        range(len(goals)),
+        key=lambda i: (goal_records[i].get("priority", math.inf), goals[i].target_date)
+    )
+
+    horizons = np.empty(len(goals), dtype=np.int64)
+    weights = np.empty((len(goals), len(ALLOCATION_ASSETS)), dtype=np.float32)
+    for row, i in enumerate(order):
+        goal = goals[i]
+        days = (goal.target_date - as_of).days
+        horizons[row] = max(int(math.ceil(days / DAYS_PER_MONTH)), 1)
+
+        tolerance = goal_records[i].get("risk_preference", risk_tolerance)
+        allocation = generate_investment_plan(goal, tolerance, as_of)["allocation"]
+        weights[row] = [allocation[asset] / 100 for asset in ALLOCATION_ASSETS]
+
+    return [goals[i] for i in order], order, horizons, weights
+
+
+def _simulate_chunk(asset_returns, targets, starting, horizons, weights, monthly_savings):
+    """Run the shared-path cash-flow simulation for one chunk of paths"""
+    n_paths = asset_returns.shape[0]
+    n_goals = len(targets)
+    n_months = int(horizons.max())
+
+    # Per-goal portfolio returns on the shared asset paths: (paths, months, goals)
+    goal_returns = asset_returns[:, :n_months, :] @ weights.T
+
+    balances = np.tile(starting.astype(np.float32), (n_paths, 1))
+    contributed = np.zeros((n_paths, n_goals), dtype=np.float32)
+    finals = np.zeros((n_paths, n_goals), dtype=np.float32)
+
+    for month in range(n_months):
+        available = np.full(n_paths, monthly_savings, dtype=np.float32)
+        active = month < horizons
+
+        # Fund each active goal's required contribution in priority order
+        for g in np.flatnonzero(active):
+            months_left = horizons[g] - month
+            required = np.maximum(targets[g] - balances[:, g], 0) / months_left
+            payment = np.minimum(required, available)
+            balances[:, g] += payment
+            contributed[:, g] += payment
+            available -= payment
+
+        # Surplus accelerates the highest-priority goal still running
+        if active.any():
+            first = np.flatnonzero(active)[0]
+            balances[:, first] += available
+            contributed[:, first] += available
+
+        balances[:, active] *= 1 + goal_returns[:, month, active]
+
+        # Goals reaching their target date are withdrawn at that balance
+        finishing = horizons == month + 1
+        finals[:, finishing] = balances[:, finishing]
+        balances[:, finishing] = 0
+
+    return finals, contributed
+
+
+def _summarize(goals, order, horizons, targets, finals, contributed):
+    """Summarize simulated final balances into per-goal outcomes"""
+    shortfall = np.maximum(targets - finals, 0)
+    percentiles = np.percentile(finals, [10, 50, 90], axis=0)
+
+    outcomes = []
+    for row, goal in enumerate(goals):
+        outcomes.append({
+            "goal_type": goal.goal_type,
+            "target_amount": goal.target_amount,
+            "target_date": goal.target_date.strftime("%Y-%m-%d"),
+            "priority": row + 1,
+            "record_index": order[row],
+            "months_remaining": int(horizons[row]),
+            "success_probability": float((finals[:, row] >= targets[row]).mean()),
+            "median_final_balance": float(percentiles[1, row]),
+            "p10_final_balance": float(percentiles[0, row]),
+            "p90_final_balance": float(percentiles[2, row]),
+            "expected_shortfall": float(shortfall[:, row].mean()),
+            "median_contributions": float(np.median(contributed[:, row]))
+        })
+    return outcomes
+
+
+def plan_goals(goal_records, monthly_savings, risk_tolerance="moderate",
+               n_paths=2000, chunk_paths=500, seed=None, as_of=None):
+    """Simulate all of a user's goals against one shared set of market paths"""
+    try:
+        if not goal_records:
+            return []
+
+        as_of = as_of or datetime.now()
+        goals, order, horizons, weights = _prepare_goals(goal_records, risk_tolerance, as_of)
+        targets = np.array([goal.target_amount for goal in goals], dtype=np.float32)
+        starting = np.array([goal.current_amount for goal in goals], dtype=np.float32)
+
+        finals = np.empty((n_paths, len(goals)), dtype=np.float32)
+        contributed = np.empty((n_paths, len(goals)), dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        n_months = int(horizons.max())
+
+        for start in range(0, n_paths, chunk_paths):
+            stop = min(start + chunk_paths, n_paths)
+            paths = generate_market_paths(stop - start, n_months, rng.integers(2 ** 32))
+            finals[start:stop], contributed[start:stop] = _simulate_chunk(
+                paths, targets, starting, horizons, weights, monthly_savings
+            )
+
+        return _summarize(goals, order, horizons, targets, finals, contributed)
+    except Exception as e:
+        logger.error(f"Error planning goals: {str(e)}")
+        raise Exception(f"Failed to plan goals: {str(e)}")
+
+
+def _monthly_savings(goal_records):
+    """Derive a user's monthly savings from the most recent goal record"""
+    latest = goal_records[-1]
+    return max(float(latest.get("monthly_income", 0)) - float(latest.get("monthly_expenses", 0)), 0.0)
+
+
+def run_nightly_goal_job(db_path="data/users.json", output_path="data/goal_outcomes.json",
+                         n_paths=2000, chunk_paths=500, user_chunk_size=100, seed=42):
+    """Plan every user's goals against shared market paths in memory-bounded chunks"""
+    try:
+        logger.info("Starting nightly goal simulation job")
+        as_of = datetime.now()
+        user_goals = [
+            (username, goals) for username, goals in AuthManager(db_path).iter_user_goals()
+            if goals
+        ]
+        if not user_goals:
+            logger.info("No saved goals to simulate")
+            return {}
+
+        # The longest horizon across all users bounds the shared path length
+        horizon_months = max(
+            max(int(math.ceil((goal_from_record(g).target_date - as_of).days / DAYS_PER_MONTH)), 1)
+            for _, goals in user_goals for g in goals
+        )
+        chunk_seeds = np.random.default_rng(seed).integers(
+            2 ** 32, size=int(math.ceil(n_paths / chunk_paths))
+        )
+
+        results = {}
+        for block_start in range(0, len(user_goals), user_chunk_size):
+            block = user_goals[block_start:block_start + user_chunk_size]
+            prepared = [
+                _prepare_goals(goals, goals[-1].get("risk_preference", "moderate"), as_of)
+                for _, goals in block
+            ]
+            finals = [np.empty((n_paths, len(p[0])), dtype=np.float32) for p in prepared]
+            contributed = [np.empty((n_paths, len(p[0])), dtype=np.float32) for p in prepared]
+
+            # Each path chunk is regenerated from its seed, so every user sees the same scenarios
+            for chunk_index, start in enumerate(range(0, n_paths, chunk_paths)):
+                stop = min(start + chunk_paths, n_paths)
+                paths = generate_market_paths(stop - start, horizon_months, chunk_seeds[chunk_index])
+                for i, (goals, order, horizons, weights) in enumerate(prepared):
+                    targets = np.array([goal.target_amount for goal in goals], dtype=np.float32)
+                    starting = np.array([goal.current_amount for goal in goals], dtype=np.float32)
+                    finals[i][start:stop], contributed[i][start:stop] = _simulate_chunk(
+                        paths, targets, starting, horizons, weights, _monthly_savings(block[i][1])
+                    )
+                del paths
+
+            for i, (username, _) in enumerate(block):
+                goals, order, horizons, _ = prepared[i]
+                targets = np.array([goal.target_amount for goal in goals], dtype=np.float32)
+                results[username] = _summarize(
+                    goals, order, horizons, targets, finals[i], contributed[i]
+                )
+            logger.info(f"Simulated goals for {len(results)}/{len(user_goals)} users")
+
+        if output_path:
+            with open(output_path, 'w') as f:
+                json.dump({"generated_at": as_of.isoformat(), "results": results}, f, indent=4)
+
+        return results
+    except Exception as e:
+        logger.error(f"Error running nightly goal job: {str(e)}")
+        raise Exception(f"Failed to run nightly goal job: {str(e)}")
+
+
+if __name__ == "__main__":
+    run_nightly_goal_job()
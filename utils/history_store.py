@@ -0,0 +1,150 @@
+import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = os.environ.get("HISTORY_STORE_DIR", "data/history")
+
+# Parquet when pyarrow is available (it ships with streamlit), pickle otherwise
+try:
+    import pyarrow  # noqa: F401
+    CHUNK_FORMAT = "parquet"
+except ImportError:
+    CHUNK_FORMAT = "pkl"
+
+def read_frame(path, columns=None):
+    if CHUNK_FORMAT == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    df = pd.read_pickle(path)
+    return df[columns] if columns else df
+
+def write_frame(df, path):
+    """Write atomically so concurrent readers never see a partial chunk"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        if CHUNK_FORMAT == "parquet":
+            df.to_parquet(tmp_path)
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+class HistoryStore:
+    """Bars for one (symbol, interval) on disk, one file per calendar month, so long histories load piecewise"""
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        self._locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+    def _dir(self, symbol, interval):
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    def _lock(self, symbol, interval):
+        with self._locks_guard:
+            return self._locks[(symbol.upper(), interval)]
+
+    def months(self, symbol, interval):
+        """Stored month keys ('YYYY-MM'), oldest first"""
+        directory = self._dir(symbol, interval)
+        if not os.path.isdir(directory):
+            return []
+        suffix = f".{CHUNK_FORMAT}"
+        return sorted(name[:-len(suffix)] for name in os.listdir(directory) if name.endswith(suffix))
+
+    def append(self, symbol, interval, bars):
+        """Merge bars into their month files; newer downloads win for duplicate timestamps"""
+        if bars is None or bars.empty:
+            return 0
+        directory = self._dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        month_keys = bars.index.strftime("%Y-%m")
+        with self._lock(symbol, interval):
+            for month, chunk in bars.groupby(month_keys):
+                path = os.path.join(directory, f"{month}.{CHUNK_FORMAT}")
+                if os.path.exists(path):
+                    chunk = pd.concat([read_frame(path), chunk])
+                    chunk = chunk[~chunk.index.duplicated(keep="last")]
+                write_frame(chunk.sort_index(), path)
+        return len(bars)
+
+    def iter_chunks(self, symbol, interval, start=None, end=None, columns=None):
+        """One month of bars at a time, trimmed to [start, end)"""
+        # A day of slack either side, so timezone differences never skip a month file
+        start_month = (pd.Timestamp(start) - pd.Timedelta(days=1)).strftime("%Y-%m") if start is not None else None
+        end_month = (pd.Timestamp(end) + pd.Timedelta(days=1)).strftime("%Y-%m") if end is not None else None
+        directory = self._dir(symbol, interval)
+        for month in self.months(symbol, interval):
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            chunk = read_frame(os.path.join(directory, f"{month}.{CHUNK_FORMAT}"), columns)
+            if start is not None:
+                chunk = chunk[chunk.index >= _align(start, chunk.index)]
+            if end is not None:
+                chunk = chunk[chunk.index < _align(end, chunk.index)]
+            if not chunk.empty:
+                yield chunk
+
+    def load(self, symbol, interval, start=None, end=None, columns=None):
+        chunks = list(self.iter_chunks(symbol, interval, start, end, columns))
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(chunks)
+
+    def iter_windows(self, symbol, interval, window, start=None, end=None, columns=None, overlap=0):
+        """Fixed-size windows of `window` bars; each repeats the previous window's last `overlap` bars
+
+        Memory stays around one month file plus one window, however long the stored history is.
+        Use overlap to carry state for rolling calculations, e.g. overlap=49 for a 50-bar SMA.
+        """
+        if window <= overlap:
+            raise ValueError("window must be larger than overlap")
+        pending = []
+        pending_rows = 0
+        yielded = False
+        for chunk in self.iter_chunks(symbol, interval, start, end, columns):
+            pending.append(chunk)
+            pending_rows += len(chunk)
+            if pending_rows < window:
+                continue
+            buffer = pd.concat(pending)
+            position = 0
+            while len(buffer) - position >= window:
+                yield buffer.iloc[position:position + window]
+                yielded = True
+                position += window - overlap
+            pending = [buffer.iloc[position:]]
+            pending_rows = len(pending[0])
+        # The short final window, unless it would only repeat the previous window's overlap
+        if pending_rows > (overlap if yielded else 0):
+            yield pd.concat(pending)
+
+def _align(timestamp, index):
+    """Compare timestamps with the stored index, whichever side carries a timezone"""
+    timestamp = pd.Timestamp(timestamp)
+    tz = getattr(index, "tz", None)
+    if tz is not None and timestamp.tzinfo is None:
+        return timestamp.tz_localize(tz)
+    if tz is None and timestamp.tzinfo is not None:
+        return timestamp.tz_convert(None)
+    return timestamp
+
+_store = None
+_store_guard = threading.Lock()
+
+def get_history_store():
+    """The process-wide store under HISTORY_STORE_DIR"""
+    global _store
+    with _store_guard:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
@@ -0,0 +1,153 @@
+import argparse
+import ast
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points worth watching for cold-start cost
+DEFAULT_TARGETS = [
+    "streamlit",
+    "pages_hidden.auth",
+    "utils.auth",
+    "utils.stock_data",
+    "utils.ai_advisor",
+    "utils.ml_predictor",
+    "utils.chart_helper"
+]
+
+# Modules the login page must not pull in
+HEAVY_MODULES = [
+    "pandas", "numpy", "sklearn", "plotly", "yfinance", "google.generativeai", "pytz",
+    "utils.stock_data", "utils.ai_advisor", "utils.ml_predictor", "utils.chart_helper"
+]
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Parse `python -X importtime` output into rows of self/cumulative microseconds"""
+    rows = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append({
+                "module": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": (len(match.group(3)) - 1) // 2
+            })
+    return rows
+
+def profile_import(target: str) -> Dict:
+    """Import target in a fresh interpreter with -X importtime and summarize the cost"""
+    try:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=300
+        )
+        rows = parse_importtime(result.stderr)
+        top_level = [row for row in rows if row["depth"] == 0]
+        return {
+            "target": target,
+            "ok": result.returncode == 0,
+            "error": result.stderr.strip().splitlines()[-1] if result.returncode else None,
+            "total_ms": sum(row["cumulative_us"] for row in top_level) / 1000,
+            "module_count": len(rows),
+            "rows": rows
+        }
+    except Exception as e:
+        logger.error(f"Error profiling import of {target}: {str(e)}")
+        raise Exception(f"Error profiling import of {target}: {str(e)}")
+
+def entry_point_imports(path: str = "main.py") -> str:
+    """The module-level import statements of an app script, as source code
+
+    These run before any page is drawn, so every page (the login page included) pays for them.
+    """
+    with open(os.path.join(PROJECT_ROOT, path)) as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+def heavy_modules_loaded(imports: str, heavy=None, baseline: str = "streamlit") -> List[str]:
+    """List the heavy modules that running the imports source pulls in on top of importing baseline
+
+    Streamlit itself already loads some of them (plotly, numpy, pandas), which the app can't avoid.
+    """
+    heavy = heavy or HEAVY_MODULES
+    script = (
+        f"import sys, json; import {baseline}; before = set(sys.modules); exec({imports!r}); "
+        f"print(json.dumps([m for m in {heavy!r} if m in sys.modules and m not in before]))"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Could not run imports {imports!r}: {result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def build_report(targets=None, top=15) -> Dict:
+    """Import-time report for each target plus the slowest modules overall"""
+    targets = targets or DEFAULT_TARGETS
+    profiles = [profile_import(target) for target in targets]
+
+    slowest = {}
+    for profile in profiles:
+        for row in profile["rows"]:
+            if row["self_us"] > slowest.get(row["module"], 0):
+                slowest[row["module"]] = row["self_us"]
+
+    return {
+        "targets": [
+            {key: profile[key] for key in ("target", "ok", "error", "total_ms", "module_count")}
+            for profile in profiles
+        ],
+        "slowest_modules": [
+            {"module": module, "self_ms": self_us / 1000}
+            for module, self_us in sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:top]
+        ]
+    }
+
+def format_report(report: Dict) -> str:
+    """Render an import-time report as plain text"""
+    lines = ["Import time by entry point (fresh interpreter each)", ""]
+    for target in report["targets"]:
+        status = f"{target['total_ms']:9.1f} ms  {target['module_count']:5d} modules" if target["ok"] else f"FAILED: {target['error']}"
+        lines.append(f"  {target['target']:<24} {status}")
+    lines += ["", "Slowest modules (self time)", ""]
+    for row in report["slowest_modules"]:
+        lines.append(f"  {row['module']:<48} {row['self_ms']:9.1f} ms")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import-time cost of app entry points")
+    parser.add_argument("targets", nargs="*", help="Modules to import (defaults to the app's entry points)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to list")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file")
+    parser.add_argument("--check-login", action="store_true",
+                        help="Fail if main.py's module-level imports (all the login page runs) load any "
+                             "heavy module beyond what streamlit loads")
+    args = parser.parse_args()
+
+    if args.check_login:
+        loaded = heavy_modules_loaded(entry_point_imports("main.py"))
+        if loaded:
+            print(f"Login page loads heavy modules on top of streamlit: {', '.join(loaded)}")
+            sys.exit(1)
+        print("Login page loads no heavy modules beyond streamlit's own")
+        return
+
+    report = build_report(args.targets, args.top)
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import importlib
+import logging
+import sys
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_import_lock = threading.RLock()
+
+def _load(module_name):
+    """Import a module once, logging how long the first import took"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    with _import_lock:
+        module = sys.modules.get(module_name)
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            logger.info(f"Lazily imported {module_name} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return module
+
+class LazyModule:
+    """Module proxy that performs the real import on first attribute access"""
+
+    def __init__(self, module_name):
+        object.__setattr__(self, "_module_name", module_name)
+
+    def __getattr__(self, name):
+        return getattr(_load(self._module_name), name)
+
+    def __repr__(self):
+        state = "loaded" if self._module_name in sys.modules else "not loaded"
+        return f"<lazy module '{self._module_name}' ({state})>"
+
+class LazyAttribute:
+    """Proxy for a module attribute (function or class) that imports its module on first use"""
+
+    def __init__(self, module_name, attribute):
+        self._module_name = module_name
+        self._attribute = attribute
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = getattr(_load(self._module_name), self._attribute)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        return f"<lazy {self._module_name}.{self._attribute}>"
+
+def lazy_import(module_name):
+    """Return a proxy for module_name without importing it yet"""
+    return LazyModule(module_name)
+
+def lazy_attr(module_name, attribute):
+    """Return a proxy for module_name.attribute without importing the module yet"""
+    return LazyAttribute(module_name, attribute)
+
+def is_loaded(module_name):
+    """Check whether a module has actually been imported"""
+    return module_name in sys.modules
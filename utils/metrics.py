@@ -0,0 +1,225 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "vibro"
+QUANTILES = (0.5, 0.95, 0.99)
+# Recent samples kept per histogram; quantiles describe this window
+RESERVOIR_SIZE = 2048
+
+class Histogram:
+    """Count, sum and max of all observations plus a window of recent samples for quantiles"""
+
+    __slots__ = ("count", "total", "max", "_samples")
+
+    def __init__(self, size=RESERVOIR_SIZE):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = deque(maxlen=size)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._samples.append(value)
+
+    def quantiles(self, qs=QUANTILES):
+        """Nearest-rank quantiles of the recent samples"""
+        ordered = sorted(self._samples)
+        if not ordered:
+            return {q: 0.0 for q in qs}
+        return {q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] for q in qs}
+
+    def summary(self):
+        quantiles = self.quantiles()
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            **{f"p{int(q * 100)}": value for q, value in quantiles.items()}
+        }
+
+class MetricsRegistry:
+    """Thread-safe store of span histograms and counters, keyed by name and labels"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """All spans (latency summaries in seconds) and counters as plain dicts"""
+        with self._lock:
+            spans = [
+                {"name": name, "labels": dict(labels), **histogram.summary()}
+                for (name, labels), histogram in self._histograms.items()
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+        return {
+            "generated_at": datetime.now().isoformat(),
+            "spans": sorted(spans, key=lambda row: row["sum"], reverse=True),
+            "counters": sorted(counters, key=lambda row: (row["name"], sorted(row["labels"].items())))
+        }
+
+    def to_prometheus(self):
+        """Prometheus text exposition: one summary for spans, one counter per counter name"""
+        snapshot = self.snapshot()
+        metric = f"{METRIC_PREFIX}_span_seconds"
+        lines = [f"# HELP {metric} Latency of instrumented spans", f"# TYPE {metric} summary"]
+        for row in snapshot["spans"]:
+            labels = {"span": row["name"], **row["labels"]}
+            for q in QUANTILES:
+                lines.append(f"{metric}{_format_labels(labels, quantile=q)} {row[f'p{int(q * 100)}']:.6f}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {row['sum']:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {row['count']}")
+
+        declared = set()
+        for row in snapshot["counters"]:
+            counter = f"{METRIC_PREFIX}_{_metric_name(row['name'])}_total"
+            if counter not in declared:
+                lines.append(f"# TYPE {counter} counter")
+                declared.add(counter)
+            lines.append(f"{counter}{_format_labels(row['labels'])} {row['value']}")
+        return "\n".join(lines) + "\n"
+
+def _metric_name(name):
+    return "".join(char if char.isalnum() else "_" for char in name).lower()
+
+def _format_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    body = ",".join(f'{_metric_name(key)}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + body + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+_registry = MetricsRegistry()
+
+def get_registry():
+    """The process-wide metrics registry"""
+    return _registry
+
+def increment(name, amount=1, **labels):
+    """Add to a counter, e.g. increment("analysis_cache_requests", result="hit")"""
+    _registry.increment(name, amount, **labels)
+
+class span:
+    """Time a block (`with span("name"):`) or every call of a function (`@span("name")`)"""
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _registry.observe(self.name, time.perf_counter() - self._start, **self.labels)
+        if exc_type is not None:
+            _registry.increment("span_errors", span=self.name, **self.labels)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(self.name, **self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+def export_json(path):
+    """Write the current snapshot to a JSON file"""
+    snapshot = _registry.snapshot()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(snapshot, f, indent=4)
+    return snapshot
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(_registry.snapshot()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = _registry.to_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
+
+def start_json_exporter(path, interval=60):
+    """Rewrite the JSON snapshot every interval seconds from a daemon thread"""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                export_json(path)
+            except Exception as e:
+                logger.error(f"Error exporting metrics: {str(e)}")
+    thread = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+    thread.start()
+    return thread
+
+def start_from_env():
+    """Start exporters configured by METRICS_PORT / METRICS_JSON_PATH (METRICS_JSON_INTERVAL)"""
+    started = {}
+    port = os.environ.get("METRICS_PORT")
+    if port:
+        started["server"] = start_metrics_server(int(port), os.environ.get("METRICS_HOST", "127.0.0.1"))
+    json_path = os.environ.get("METRICS_JSON_PATH")
+    if json_path:
+        started["json"] = start_json_exporter(json_path, float(os.environ.get("METRICS_JSON_INTERVAL", 60)))
+    return started
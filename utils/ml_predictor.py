@@ -1,9 +1,8 @@
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score
 import pandas as pd
 import logging
+from .metrics import span
+from .model_zoo import make_model, default_model_name
 from datetime import datetime, timedelta
 
 # Configure logging
@@ -11,11 +10,17 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class StockPredictor:
-    def __init__(self):
+    def __init__(self, model_name=None):
+        # sklearn is imported here rather than at module load to keep app start-up light
+        from sklearn.preprocessing import MinMaxScaler
+
+        # Any utils.model_zoo.MODELS entry; defaults to the fastest profiled model meeting the accuracy floor
+        self.model_name = model_name or default_model_name()
         self.scaler = MinMaxScaler(feature_range=(0, 1))
         self.prediction_days = 60  # Number of days to use for prediction
         self.future_days = 30  # Number of days to predict into the future
 
+    @span("StockPredictor.prepare_data")
     def prepare_data(self, data):
         """Prepare data for prediction"""
         try:
@@ -38,23 +43,24 @@ class StockPredictor:
             logger.error(f"Error preparing data: {str(e)}")
             raise
 
+    @span("StockPredictor.train_model")
     def train_model(self, x, y):
         """Train the prediction model"""
         try:
-            from sklearn.ensemble import RandomForestRegressor
+            from sklearn.model_selection import train_test_split
             
             # Split data into training and testing sets
             x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=0.2, random_state=42)
             
             # Initialize and train the model
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
+            model = make_model(self.model_name)
             model.fit(x_train, y_train)
             
             # Calculate performance metrics
             train_score = model.score(x_train, y_train)
             test_score = model.score(x_test, y_test)
             
-            logger.info(f"Model training complete. Train score: {train_score:.4f}, Test score: {test_score:.4f}")
+            logger.info(f"Model training complete ({self.model_name}). Train score: {train_score:.4f}, Test score: {test_score:.4f}")
             
             return model, (train_score, test_score)
             
@@ -62,6 +68,7 @@ class StockPredictor:
             logger.error(f"Error training model: {str(e)}")
             raise
 
+    @span("StockPredictor.make_predictions")
     def make_predictions(self, model, data):
         """Generate predictions"""
         try:
@@ -83,7 +90,7 @@ class StockPredictor:
                 
                 # Update sequence for next prediction
                 current_sequence = np.roll(current_sequence, -1)
-                current_sequence[0, -1] = next_pred
+                current_sequence[0, -1] = next_pred[0]
             
             # Inverse transform predictions
             predictions = self.scaler.inverse_transform(np.array(predictions).reshape(-1, 1))
@@ -104,6 +111,8 @@ class StockPredictor:
     def calculate_metrics(self, y_true, y_pred):
         """Calculate prediction performance metrics"""
         try:
+            from sklearn.metrics import mean_squared_error, r2_score
+
             mse = mean_squared_error(y_true, y_pred)
             rmse = np.sqrt(mse)
             r2 = r2_score(y_true, y_pred)
@@ -134,6 +143,7 @@ class StockPredictor:
             confidence = {
                 'train_score': train_score,
                 'test_score': test_score,
+                'model': self.model_name,
                 'prediction_quality': 'High' if test_score > 0.7 else 'Medium' if test_score > 0.5 else 'Low'
             }
             
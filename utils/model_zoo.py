@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import pickle
+import time
+from datetime import datetime
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILES_PATH = os.environ.get("MODEL_PROFILES_PATH", "data/model_profiles.json")
+# Accuracy floor: highest acceptable mean absolute % error of the 30-day backtest forecast
+MAX_BACKTEST_ERROR = float(os.environ.get("MODEL_MAX_BACKTEST_ERROR", 0.08))
+# The original hard-wired estimator, used when no profiles have been recorded
+FALLBACK_MODEL = "random_forest"
+
+def _ridge():
+    from sklearn.linear_model import Ridge
+    return Ridge(alpha=1e-3)
+
+def _linear():
+    from sklearn.linear_model import LinearRegression
+    return LinearRegression()
+
+def _hist_gradient_boosting():
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    return HistGradientBoostingRegressor(max_iter=100, random_state=42)
+
+def _compact_forest():
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(n_estimators=30, max_depth=8, min_samples_leaf=2, random_state=42)
+
+def _random_forest():
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(n_estimators=100, random_state=42)
+
+# Estimators StockPredictor can train on its lag features (sklearn imported only when one is built)
+MODELS = {
+    "ridge": _ridge,
+    "linear": _linear,
+    "hist_gradient_boosting": _hist_gradient_boosting,
+    "compact_forest": _compact_forest,
+    "random_forest": _random_forest
+}
+
+def make_model(name):
+    if name not in MODELS:
+        raise ValueError(f"Unknown model {name!r}; choose from {', '.join(MODELS)}")
+    return MODELS[name]()
+
+def profile_model(name, histories, horizon=30):
+    """Fit/predict time, pickled size and backtest error of one model, averaged over histories
+
+    Each history is cut `horizon` days before its end; the model is trained on the rest and its
+    recursive forecast is scored against the held-out closes.
+    """
+    from .ml_predictor import StockPredictor
+    fit_seconds, predict_seconds, sizes, errors, test_scores = [], [], [], [], []
+    for hist in histories:
+        train, actual = hist.iloc[:-horizon], hist['Close'].values[-horizon:]
+        predictor = StockPredictor(model_name=name)
+        predictor.future_days = horizon
+        x, y, _ = predictor.prepare_data(train)
+        start = time.perf_counter()
+        model, (_, test_score) = predictor.train_model(x, y)
+        fit_seconds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        forecast = predictor.make_predictions(model, train)['Predicted_Close'].values
+        predict_seconds.append(time.perf_counter() - start)
+        sizes.append(len(pickle.dumps(model)))
+        errors.append(float(np.mean(np.abs(forecast - actual) / actual)))
+        test_scores.append(test_score)
+    return {
+        "fit_seconds": float(np.median(fit_seconds)),
+        "predict_seconds": float(np.median(predict_seconds)),
+        "size_bytes": int(np.median(sizes)),
+        "backtest_error": float(np.mean(errors)),
+        "test_r2": float(np.mean(test_scores))
+    }
+
+def record_profiles(path=PROFILES_PATH, n_series=8, n_days=504, seed=0, models=None):
+    """Profile every model on synthetic histories and write the results to path"""
+    import sklearn
+    from .synthetic_data import generate_ohlcv
+    histories = [generate_ohlcv(n_days, seed=seed + i) for i in range(n_series)]
+    profiles = {}
+    for name in models or MODELS:
+        logger.info(f"Profiling {name}")
+        profiles[name] = profile_model(name, histories)
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "sklearn_version": sklearn.__version__,
+        "series": n_series,
+        "days": n_days,
+        "models": profiles
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=4)
+    return report
+
+def load_profiles(path=PROFILES_PATH):
+    """{model: profile} from the recorded profiles file, or {} if there is none"""
+    try:
+        with open(path) as f:
+            return json.load(f)["models"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"No model profiles at {path}: {str(e)}")
+        return {}
+
+def choose_model(profiles, max_error=MAX_BACKTEST_ERROR):
+    """Fastest model (fit plus predict time) within the accuracy floor, else the most accurate one"""
+    profiles = {name: profile for name, profile in profiles.items() if name in MODELS}
+    if not profiles:
+        return FALLBACK_MODEL
+    eligible = [name for name, profile in profiles.items() if profile["backtest_error"] <= max_error]
+    if not eligible:
+        return min(profiles, key=lambda name: profiles[name]["backtest_error"])
+    return min(eligible, key=lambda name: profiles[name]["fit_seconds"] + profiles[name]["predict_seconds"])
+
+_default_model = None
+
+def default_model_name():
+    """STOCK_PREDICTOR_MODEL if set, otherwise the pick from the recorded profiles"""
+    global _default_model
+    if _default_model is None:
+        _default_model = os.environ.get("STOCK_PREDICTOR_MODEL") or choose_model(load_profiles())
+        logger.info(f"StockPredictor model: {_default_model}")
+    return _default_model
+
+if __name__ == "__main__":
+    # python -m utils.model_zoo  (re-record data/model_profiles.json, e.g. after upgrading scikit-learn)
+    report = record_profiles()
+    for name, profile in report["models"].items():
+        print(f"{name:24} fit {profile['fit_seconds'] * 1000:8.1f}ms  predict {profile['predict_seconds'] * 1000:7.1f}ms  "
+              f"size {profile['size_bytes'] / 1024:9.1f}KB  backtest error {profile['backtest_error']:.2%}  "
+              f"test R2 {profile['test_r2']:.3f}")
+    print(f"Chosen: {choose_model(report['models'])}")
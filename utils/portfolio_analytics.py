@@ -0,0 +1,152 @@
+import logging
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+def _daily_close(df):
+    """Closing prices indexed by calendar date so different exchanges align"""
+    close = df['Close']
+    index = close.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    return pd.Series(close.values, index=index.normalize())
+
+def build_returns_matrix(histories):
+    """Align price histories on common dates and return (symbols, dates, daily returns matrix)"""
+    try:
+        symbols = list(histories)
+        closes = pd.concat(
+            [_daily_close(histories[symbol]) for symbol in symbols],
+            axis=1, join='inner', keys=symbols
+        )
+        closes = closes[~closes.index.duplicated(keep='last')].dropna()
+        prices = closes.to_numpy(dtype=np.float64)
+        returns = prices[1:] / prices[:-1] - 1
+        return symbols, closes.index[1:], returns
+    except Exception as e:
+        logger.error(f"Error building returns matrix: {str(e)}")
+        raise Exception(f"Error building returns matrix: {str(e)}")
+
+def compute_risk_metrics(returns, weights, benchmark_returns=None, risk_free_rate=0.04,
+                         confidence=0.95, periods_per_year=TRADING_DAYS):
+    """Compute portfolio and per-holding risk metrics from a (days, holdings) returns matrix"""
+    try:
+        returns = np.asarray(returns, dtype=np.float64)
+        weights = np.asarray(weights, dtype=np.float64)
+        n_days = returns.shape[0]
+        if n_days < 2:
+            raise ValueError("At least two overlapping days of history are required")
+
+        portfolio_returns = returns @ weights
+        if benchmark_returns is None:
+            benchmark_returns = portfolio_returns
+        benchmark_returns = np.asarray(benchmark_returns, dtype=np.float64)
+
+        # Covariance and correlation from one centered matrix product
+        mean = returns.mean(axis=0)
+        centered = returns - mean
+        covariance = centered.T @ centered / (n_days - 1)
+        std = np.sqrt(np.diag(covariance))
+        safe_std = np.where(std > 0, std, np.nan)
+        correlation = covariance / np.outer(safe_std, safe_std)
+
+        portfolio_variance = weights @ covariance @ weights
+        portfolio_std = np.sqrt(portfolio_variance)
+
+        # Betas of every holding (and the portfolio) against the benchmark
+        bench_centered = benchmark_returns - benchmark_returns.mean()
+        bench_variance = bench_centered @ bench_centered / (n_days - 1)
+        betas = centered.T @ bench_centered / (n_days - 1) / bench_variance
+
+        # Holdings and portfolio side by side so tail and drawdown stats run once
+        combined = np.column_stack([returns, portfolio_returns])
+        sorted_returns = np.sort(combined, axis=0)
+        tail_count = max(int(np.ceil((1 - confidence) * n_days)), 1)
+        var = -np.quantile(combined, 1 - confidence, axis=0)
+        cvar = -sorted_returns[:tail_count].mean(axis=0)
+
+        wealth = np.cumprod(1 + combined, axis=0)
+        drawdowns = wealth / np.maximum.accumulate(wealth, axis=0) - 1
+        max_drawdown = drawdowns.min(axis=0)
+
+        annual_return = combined.mean(axis=0) * periods_per_year
+        annual_volatility = np.append(std, portfolio_std) * np.sqrt(periods_per_year)
+        safe_volatility = np.where(annual_volatility > 0, annual_volatility, np.nan)
+        sharpe = (annual_return - risk_free_rate) / safe_volatility
+
+        # Share of total portfolio variance contributed by each holding
+        risk_contribution = weights * (covariance @ weights) / portfolio_variance
+
+        return {
+            "portfolio": {
+                "annual_return": float(annual_return[-1]),
+                "annual_volatility": float(annual_volatility[-1]),
+                "beta": float(weights @ betas),
+                "var": float(var[-1]),
+                "cvar": float(cvar[-1]),
+                "max_drawdown": float(max_drawdown[-1]),
+                "sharpe_ratio": float(sharpe[-1])
+            },
+            "holdings": {
+                "weight": weights,
+                "annual_return": annual_return[:-1],
+                "annual_volatility": annual_volatility[:-1],
+                "beta": betas,
+                "var": var[:-1],
+                "cvar": cvar[:-1],
+                "max_drawdown": max_drawdown[:-1],
+                "sharpe_ratio": sharpe[:-1],
+                "risk_contribution": risk_contribution
+            },
+            "covariance": covariance * periods_per_year,
+            "correlation": correlation,
+            "confidence": confidence,
+            "observations": n_days
+        }
+    except Exception as e:
+        logger.error(f"Error computing risk metrics: {str(e)}")
+        raise Exception(f"Error computing risk metrics: {str(e)}")
+
+def analyze_histories(histories, holdings=None, benchmark_history=None, risk_free_rate=0.04,
+                      confidence=0.95):
+    """Run the risk engine over fetched histories, valuing one share of each symbol by default"""
+    try:
+        series = dict(histories)
+        if benchmark_history is not None:
+            series['__benchmark__'] = benchmark_history
+
+        symbols, dates, returns = build_returns_matrix(series)
+        benchmark_returns = None
+        if benchmark_history is not None:
+            benchmark_returns = returns[:, -1]
+            symbols, returns = symbols[:-1], returns[:, :-1]
+
+        latest_prices = np.array([histories[symbol]['Close'].iloc[-1] for symbol in symbols], dtype=np.float64)
+        shares = np.array([(holdings or {}).get(symbol, 1) for symbol in symbols], dtype=np.float64)
+        position_values = latest_prices * shares
+        total_value = position_values.sum()
+
+        metrics = compute_risk_metrics(
+            returns, position_values / total_value, benchmark_returns,
+            risk_free_rate=risk_free_rate, confidence=confidence
+        )
+
+        return {
+            "total_value": float(total_value),
+            "portfolio": metrics["portfolio"],
+            "holdings": pd.DataFrame(metrics["holdings"], index=symbols),
+            "covariance": pd.DataFrame(metrics["covariance"], index=symbols, columns=symbols),
+            "correlation": pd.DataFrame(metrics["correlation"], index=symbols, columns=symbols),
+            "benchmark": benchmark_history is not None,
+            "confidence": confidence,
+            "start_date": dates[0].strftime("%Y-%m-%d"),
+            "end_date": dates[-1].strftime("%Y-%m-%d")
+        }
+    except Exception as e:
+        logger.error(f"Error analyzing histories: {str(e)}")
+        raise Exception(f"Error analyzing histories: {str(e)}")
@@ -1,14 +1,17 @@
 import logging
 import pandas as pd
 from datetime import datetime
-from .stock_data import get_multiple_stocks_data, calculate_technical_indicators
-from .ai_advisor import get_stock_analysis
+from .stock_data import get_stock_data, get_multiple_stocks_data, calculate_technical_indicators
+from .ai_advisor import get_batch_stock_analysis
+from .portfolio_analytics import analyze_histories
+from .portfolio_optimizer import get_universe, optimize_allocation
+from .rebalancer import align_weights
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_portfolio_recommendation(risk_tolerance, investment_amount, preferences=None):
+def generate_portfolio_recommendation(risk_tolerance, investment_amount, preferences=None, universe=None, mode=None):
     """Generate AI-powered portfolio recommendations"""
     try:
         # Default sectors for diversification
@@ -26,11 +29,33 @@ def generate_portfolio_recommendation(risk_tolerance, investment_amount, prefere
         
         # Get allocation based on risk tolerance
         allocation = allocations.get(risk_tolerance.lower(), allocations["moderate"])
+
+        # Concrete weights from the local optimizer over the cached universe
+        holdings = []
+        optimizer = None
+        try:
+            optimized = optimize_allocation(
+                universe or get_universe(),
+                risk_tolerance,
+                allocation["stocks"],
+                sectors=preferences,
+                mode=mode
+            )
+            holdings = [
+                dict(holding, amount=investment_amount * holding["weight"])
+                for holding in optimized.pop("holdings")
+            ]
+            optimizer = optimized
+            sectors = list(dict.fromkeys(h["sector"] for h in holdings if h["sector"] != "Bonds"))
+        except Exception as e:
+            logger.error(f"Optimizer unavailable, returning allocation only: {str(e)}")
         
         return {
             "allocation": allocation,
             "investment_amount": investment_amount,
             "recommended_sectors": sectors,
+            "holdings": holdings,
+            "optimizer": optimizer,
             "risk_profile": risk_tolerance,
             "timestamp": datetime.now().isoformat()
         }
@@ -38,7 +63,7 @@ def generate_portfolio_recommendation(risk_tolerance, investment_amount, prefere
         logger.error(f"Error generating portfolio recommendation: {str(e)}")
         raise Exception(f"Failed to generate portfolio recommendation: {str(e)}")
 
-def analyze_portfolio_health(portfolio_stocks):
+def analyze_portfolio_health(portfolio_stocks, holdings=None, benchmark="SPY", risk_free_rate=0.04):
     """Analyze the health and balance of a portfolio"""
     try:
         # Get current data for all stocks in portfolio
@@ -51,14 +76,35 @@ def analyze_portfolio_health(portfolio_stocks):
             "risk_metrics": {},
             "recommendations": []
         }
+
+        # Risk analytics from the downloaded price histories
+        benchmark_history = None
+        if benchmark:
+            try:
+                benchmark_history, _ = get_stock_data(benchmark, '5y')
+            except Exception as e:
+                logger.warning(f"Benchmark {benchmark} unavailable, using portfolio as benchmark: {str(e)}")
+
+        try:
+            risk = analyze_histories(
+                {symbol: data['history'] for symbol, data in stock_data.items()},
+                holdings=holdings,
+                benchmark_history=benchmark_history,
+                risk_free_rate=risk_free_rate
+            )
+            portfolio_metrics["total_value"] = risk.pop("total_value")
+            portfolio_metrics["risk_metrics"] = risk
+        except Exception as e:
+            logger.error(f"Error computing portfolio risk metrics: {str(e)}")
         
-        # Analyze each stock
-        for symbol, data in stock_data.items():
-            # Get AI analysis for each stock
-            analysis = get_stock_analysis(data['info'], 
-                                       {"Market Cap": data['info'].get('marketCap'),
-                                        "PE Ratio": data['info'].get('trailingPE')})
-            
+        # AI analysis for every stock, several per model call
+        analyses = get_batch_stock_analysis([
+            (dict(data['info'], symbol=data['info'].get('symbol', symbol)),
+             {"Market Cap": data['info'].get('marketCap'), "PE Ratio": data['info'].get('trailingPE')})
+            for symbol, data in stock_data.items()
+        ])
+
+        for (symbol, data), analysis in zip(stock_data.items(), analyses):
             portfolio_metrics["recommendations"].append({
                 "symbol": symbol,
                 "analysis": analysis
@@ -79,16 +125,17 @@ def analyze_portfolio_health(portfolio_stocks):
 def calculate_rebalancing_needs(current_allocation, target_allocation):
     """Calculate portfolio rebalancing requirements"""
     try:
+        # Align on the union so target-only assets show up as buys
+        assets, current, target = align_weights(current_allocation, target_allocation)
+        diff = target - current
         differences = {}
-        for asset, current_pct in current_allocation.items():
-            target_pct = target_allocation.get(asset, 0)
-            diff = target_pct - current_pct
+        for i, asset in enumerate(assets):
             differences[asset] = {
-                "current": current_pct,
-                "target": target_pct,
-                "difference": diff,
-                "action": "buy" if diff > 0 else "sell",
-                "magnitude": abs(diff)
+                "current": float(current[i]),
+                "target": float(target[i]),
+                "difference": float(diff[i]),
+                "action": "buy" if diff[i] > 0 else "sell",
+                "magnitude": float(abs(diff[i]))
             }
         return differences
     except Exception as e:
@@ -0,0 +1,332 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from .stock_data import get_multiple_stocks_data
+from .portfolio_analytics import build_returns_matrix, TRADING_DAYS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default investable universe by sector; "Bonds" fills the bond sleeve
+DEFAULT_UNIVERSE = {
+    "Technology": ["AAPL", "MSFT", "NVDA", "GOOGL", "ORCL"],
+    "Healthcare": ["JNJ", "UNH", "PFE", "MRK", "ABT"],
+    "Financial Services": ["JPM", "BAC", "V", "MA", "BRK-B"],
+    "Consumer Cyclical": ["AMZN", "TSLA", "HD", "MCD", "NKE"],
+    "Industrial": ["CAT", "HON", "UNP", "GE", "LMT"],
+    "Energy": ["XOM", "CVX", "COP", "SLB", "EOG"],
+    "Materials": ["LIN", "APD", "SHW", "NEM", "FCX"],
+    "Real Estate": ["PLD", "AMT", "EQIX", "SPG", "O"],
+    "Utilities": ["NEE", "DUK", "SO", "D", "AEP"],
+    "Bonds": ["BND", "AGG", "TLT", "SHY", "LQD"]
+}
+
+# Optimizer mode and risk aversion for each risk tolerance
+RISK_PROFILES = {
+    "conservative": {"mode": "min_variance", "risk_aversion": None},
+    "moderate": {"mode": "risk_parity", "risk_aversion": None},
+    "aggressive": {"mode": "mean_variance", "risk_aversion": 2.0}
+}
+
+MAX_WEIGHT = 0.25
+UNIVERSE_TTL = 24 * 60 * 60
+
+_universe_cache = {}
+# key -> Future of a universe being built, shared by callers that arrive meanwhile
+_universe_builds = {}
+_universe_lock = threading.Lock()
+
+def ledoit_wolf_covariance(returns):
+    """Ledoit-Wolf shrinkage of the sample covariance towards a scaled identity"""
+    returns = np.asarray(returns, dtype=np.float64)
+    n_days, n_assets = returns.shape
+    centered = returns - returns.mean(axis=0)
+    sample = centered.T @ centered / n_days
+
+    target_scale = np.trace(sample) / n_assets
+    target = target_scale * np.eye(n_assets)
+
+    # Shrinkage intensity: estimation noise relative to distance from the target
+    squared = centered ** 2
+    noise = (squared.T @ squared / n_days - sample ** 2).sum() / n_days
+    distance = ((sample - target) ** 2).sum()
+    intensity = float(np.clip(noise / distance, 0, 1)) if distance > 0 else 1.0
+
+    return intensity * target + (1 - intensity) * sample, intensity
+
+def project_capped_simplex(v, cap=1.0):
+    """Euclidean projection onto {w : sum(w) = 1, 0 <= w <= cap}"""
+    cap = max(cap, 1.0 / len(v))
+    low, high = v.min() - cap, v.max()
+    for _ in range(60):
+        tau = (low + high) / 2
+        if np.clip(v - tau, 0, cap).sum() > 1:
+            low = tau
+        else:
+            high = tau
+    return np.clip(v - (low + high) / 2, 0, cap)
+
+def _projected_gradient(gradient, lipschitz, w0, cap, tol=1e-9, max_iter=5000):
+    """Accelerated projected gradient descent over the capped simplex"""
+    step = 1.0 / lipschitz
+    w = project_capped_simplex(np.asarray(w0, dtype=np.float64), cap)
+    y, t = w.copy(), 1.0
+    for iteration in range(max_iter):
+        w_next = project_capped_simplex(y - step * gradient(y), cap)
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = w_next + ((t - 1) / t_next) * (w_next - w)
+        if np.abs(w_next - w).max() < tol:
+            return w_next, iteration + 1
+        w, t = w_next, t_next
+    return w, max_iter
+
+def min_variance_weights(cov, w0=None, cap=MAX_WEIGHT):
+    """Long-only minimum variance portfolio"""
+    n = cov.shape[0]
+    w0 = np.full(n, 1.0 / n) if w0 is None else w0
+    lipschitz = 2 * np.linalg.eigvalsh(cov)[-1]
+    return _projected_gradient(lambda w: 2 * cov @ w, lipschitz, w0, cap)
+
+def mean_variance_weights(mu, cov, risk_aversion, w0=None, cap=MAX_WEIGHT):
+    """Long-only portfolio maximizing mu'w - (risk_aversion / 2) w'Σw"""
+    n = cov.shape[0]
+    w0 = np.full(n, 1.0 / n) if w0 is None else w0
+    lipschitz = risk_aversion * np.linalg.eigvalsh(cov)[-1]
+    return _projected_gradient(lambda w: risk_aversion * cov @ w - mu, lipschitz, w0, cap)
+
+def risk_parity_weights(cov, budgets=None, w0=None, tol=1e-10, max_iter=500):
+    """Equal (or budgeted) risk contribution weights via cyclical coordinate descent"""
+    n = cov.shape[0]
+    budgets = np.full(n, 1.0 / n) if budgets is None else np.asarray(budgets, dtype=np.float64)
+    diag = np.diag(cov)
+    x = np.full(n, 1.0 / np.sqrt(budgets.sum() * n)) if w0 is None else np.asarray(w0, dtype=np.float64).copy()
+    x = np.maximum(x, 1e-12)
+
+    # Scale the warm start so x'Σx matches the budget, the optimum's natural scale
+    x *= np.sqrt(budgets.sum() / (x @ cov @ x))
+    sigma_x = cov @ x
+    for iteration in range(max_iter):
+        x_prev = x.copy()
+        for i in range(n):
+            off_diag = sigma_x[i] - diag[i] * x[i]
+            new_xi = (-off_diag + np.sqrt(off_diag ** 2 + 4 * diag[i] * budgets[i])) / (2 * diag[i])
+            sigma_x += cov[:, i] * (new_xi - x[i])
+            x[i] = new_xi
+        if np.abs(x - x_prev).max() < tol * x.max():
+            return x / x.sum(), iteration + 1
+    return x / x.sum(), max_iter
+
+def efficient_frontier(mu, cov, n_points=20, cap=MAX_WEIGHT):
+    """Trace the long-only frontier by sweeping risk aversion with warm starts"""
+    frontier = []
+    w = None
+    for risk_aversion in np.geomspace(100, 0.5, n_points):
+        w, _ = mean_variance_weights(mu, cov, risk_aversion, w0=w, cap=cap)
+        frontier.append({
+            "risk_aversion": float(risk_aversion),
+            "expected_return": float(mu @ w),
+            "volatility": float(np.sqrt(w @ cov @ w)),
+            "weights": w
+        })
+    return frontier
+
+class OptimizerUniverse:
+    """Cached returns statistics for a symbol universe with cheap incremental price updates"""
+
+    def __init__(self, symbols, sectors, returns, last_prices):
+        self.symbols = list(symbols)
+        self.sectors = np.asarray(sectors, dtype=object)
+        self.returns = np.asarray(returns, dtype=np.float64)
+        self.last_prices = np.asarray(last_prices, dtype=np.float64)
+        self.latest_prices = self.last_prices.copy()
+        self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._last_weights = {}
+        self.built_at = time.time()
+        self.prices_at = self.built_at
+        self._lock = threading.Lock()
+        self._rebuild_statistics()
+
+    @classmethod
+    def from_histories(cls, histories, sector_map):
+        """Build a universe from price histories keyed by symbol"""
+        symbols, _, returns = build_returns_matrix(histories)
+        last_prices = [histories[symbol]['Close'].iloc[-1] for symbol in symbols]
+        return cls(symbols, [sector_map.get(symbol, "Unknown") for symbol in symbols], returns, last_prices)
+
+    def _rebuild_statistics(self):
+        """Recompute running sums and shrinkage intensity from the full returns window"""
+        self._sum = self.returns.sum(axis=0)
+        self._sum_outer = self.returns.T @ self.returns
+        self._today = np.zeros(len(self.symbols))
+        _, self.shrinkage = ledoit_wolf_covariance(self.returns)
+
+    def update_prices(self, prices):
+        """Revise today's return row for symbols whose price changed: an O(n^2) rank-one update"""
+        changed = [(self._index[s], p) for s, p in prices.items() if s in self._index]
+        if not changed:
+            return 0
+        with self._lock:
+            old_row = self._today.copy()
+            for i, price in changed:
+                self.latest_prices[i] = price
+                self._today[i] = price / self.last_prices[i] - 1
+            self._sum += self._today - old_row
+            self._sum_outer += np.outer(self._today, self._today) - np.outer(old_row, old_row)
+            self.prices_at = time.time()
+        return len(changed)
+
+    @property
+    def n_observations(self):
+        return self.returns.shape[0] + (1 if self._today.any() else 0)
+
+    def statistics(self, mask=None):
+        """Annualized expected returns and shrunk covariance, optionally for a subset"""
+        with self._lock:
+            n = self.n_observations
+            mean = self._sum / n
+            sample = self._sum_outer / n - np.outer(mean, mean)
+        target = np.trace(sample) / len(mean) * np.eye(len(mean))
+        cov = (self.shrinkage * target + (1 - self.shrinkage) * sample) * TRADING_DAYS
+
+        # Shrink noisy sample means half-way to the cross-sectional average
+        mu = (0.5 * mean + 0.5 * mean.mean()) * TRADING_DAYS
+        if mask is not None:
+            return mu[mask], cov[np.ix_(mask, mask)]
+        return mu, cov
+
+    def optimize(self, mode, mask=None, risk_aversion=2.0, cap=MAX_WEIGHT):
+        """Solve one optimizer mode, warm-starting from the previous solution for the same subset"""
+        mask = np.ones(len(self.symbols), dtype=bool) if mask is None else np.asarray(mask)
+        mu, cov = self.statistics(mask)
+        key = (mode, mask.tobytes(), risk_aversion, cap)
+        w0 = self._last_weights.get(key)
+
+        if mode == "min_variance":
+            weights, iterations = min_variance_weights(cov, w0, cap)
+        elif mode == "mean_variance":
+            weights, iterations = mean_variance_weights(mu, cov, risk_aversion, w0, cap)
+        elif mode == "risk_parity":
+            weights, iterations = risk_parity_weights(cov, w0=w0)
+        else:
+            raise ValueError(f"Unknown optimizer mode: {mode}")
+
+        self._last_weights[key] = weights
+        logger.info(f"Optimized {mode} over {mask.sum()} assets in {iterations} iterations")
+        return {
+            "symbols": [s for s, keep in zip(self.symbols, mask) if keep],
+            "weights": weights,
+            "expected_return": float(mu @ weights),
+            "volatility": float(np.sqrt(weights @ cov @ weights))
+        }
+
+    def frontier(self, mask=None, n_points=20, cap=MAX_WEIGHT):
+        """Efficient frontier over the universe or a subset"""
+        mask = np.ones(len(self.symbols), dtype=bool) if mask is None else np.asarray(mask)
+        mu, cov = self.statistics(mask)
+        return efficient_frontier(mu, cov, n_points, cap)
+
+def get_universe(universe=None, period='2y', ttl=UNIVERSE_TTL):
+    """Return the cached optimizer universe, fetching histories only when missing or expired
+
+    Histories are downloaded outside the cache lock; concurrent callers for the same universe
+    wait on the one build in progress.
+    """
+    universe = universe or DEFAULT_UNIVERSE
+    key = (tuple((sector, tuple(symbols)) for sector, symbols in universe.items()), period)
+    with _universe_lock:
+        cached = _universe_cache.get(key)
+        if cached is not None and time.time() - cached.built_at < ttl:
+            return cached
+        future = _universe_builds.get(key)
+        owner = future is None
+        if owner:
+            future = _universe_builds[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        sector_map = {symbol: sector for sector, symbols in universe.items() for symbol in symbols}
+        stock_data = get_multiple_stocks_data(list(sector_map), period)
+        cached = OptimizerUniverse.from_histories(
+            {symbol: data['history'] for symbol, data in stock_data.items()}, sector_map
+        )
+        with _universe_lock:
+            _universe_cache[key] = cached
+        future.set_result(cached)
+        return cached
+    except Exception as e:
+        logger.error(f"Error building optimizer universe: {str(e)}")
+        error = Exception(f"Error building optimizer universe: {str(e)}")
+        future.set_exception(error)
+        raise error
+    finally:
+        with _universe_lock:
+            _universe_builds.pop(key, None)
+
+def cached_latest_prices(max_age=None):
+    """Latest known prices from every cached universe, without fetching
+
+    max_age skips universes whose prices are older than that many seconds.
+    """
+    with _universe_lock:
+        universes = list(_universe_cache.values())
+    prices = {}
+    for universe in universes:
+        if max_age is None or time.time() - universe.prices_at < max_age:
+            prices.update(zip(universe.symbols, universe.latest_prices.tolist()))
+    return prices
+
+def update_cached_prices(prices):
+    """Feed fresh {symbol: price} quotes into every cached universe's statistics"""
+    with _universe_lock:
+        universes = list(_universe_cache.values())
+    return sum(universe.update_prices(prices) for universe in universes)
+
+def optimize_allocation(universe, risk_tolerance, stock_fraction, sectors=None, mode=None):
+    """Concrete holdings for a stock/bond split, optimizing each sleeve over the cached universe"""
+    try:
+        profile = RISK_PROFILES.get(risk_tolerance.lower(), RISK_PROFILES["moderate"])
+        mode = mode or profile["mode"]
+
+        is_bond = universe.sectors == "Bonds"
+        stock_mask = ~is_bond
+        if sectors:
+            preferred = stock_mask & np.isin(universe.sectors, list(sectors))
+            if preferred.sum() >= 2:
+                stock_mask = preferred
+
+        stock_result = universe.optimize(mode, stock_mask, risk_aversion=profile["risk_aversion"] or 2.0)
+        sleeves = [(stock_result, stock_fraction)]
+        if is_bond.any() and stock_fraction < 1:
+            sleeves.append((universe.optimize("min_variance", is_bond, cap=1.0), 1 - stock_fraction))
+
+        holdings = []
+        for result, fraction in sleeves:
+            # Drop dust positions and spread their weight back over the sleeve
+            kept = result["weights"] * fraction >= 0.005
+            if not kept.any():
+                kept[:] = True
+            weights = np.where(kept, result["weights"], 0)
+            weights = weights / weights.sum() * fraction
+            for symbol, weight in zip(result["symbols"], weights):
+                if weight > 0:
+                    holdings.append({
+                        "ticker": symbol,
+                        "sector": universe.sectors[universe._index[symbol]],
+                        "weight": float(weight)
+                    })
+        holdings.sort(key=lambda h: h["weight"], reverse=True)
+
+        return {
+            "mode": mode,
+            "holdings": holdings,
+            "expected_return": stock_result["expected_return"],
+            "volatility": stock_result["volatility"],
+            "shrinkage": universe.shrinkage
+        }
+    except Exception as e:
+        logger.error(f"Error optimizing allocation: {str(e)}")
+        raise Exception(f"Error optimizing allocation: {str(e)}")
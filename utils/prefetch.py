@@ -0,0 +1,130 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from .auth import AuthManager
+from .analysis_cache import warm_symbol
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Defaults, each overridable through the matching PREFETCH_* environment variable
+DEFAULT_TOP_N = 10
+DEFAULT_INTERVAL = 15 * 60
+DEFAULT_WORKERS = 2
+DEFAULT_TIME_BUDGET = 120
+DEFAULT_LOOKBACK_DAYS = 90
+
+def popular_searches(db_path="data/users.json", top_n=DEFAULT_TOP_N, lookback_days=DEFAULT_LOOKBACK_DAYS, now=None):
+    """Most requested (symbol, period) pairs across all users' recent search history"""
+    cutoff = (now or datetime.now()) - timedelta(days=lookback_days) if lookback_days else None
+    counts = Counter()
+    for _, history in AuthManager(db_path).iter_search_history():
+        for search in history:
+            symbol, period = search.get("symbol"), search.get("period")
+            if not symbol or not period:
+                continue
+            if cutoff is not None:
+                try:
+                    if datetime.fromisoformat(search["timestamp"]) < cutoff:
+                        continue
+                except (KeyError, ValueError):
+                    continue
+            counts[(symbol.upper(), period)] += 1
+    return counts.most_common(top_n)
+
+class PrefetchScheduler:
+    """Background thread that periodically warms the analysis cache for popular searches"""
+
+    def __init__(self, db_path="data/users.json", top_n=DEFAULT_TOP_N, interval=DEFAULT_INTERVAL,
+                 max_workers=DEFAULT_WORKERS, time_budget=DEFAULT_TIME_BUDGET,
+                 lookback_days=DEFAULT_LOOKBACK_DAYS, include_ai=True):
+        self.db_path = db_path
+        self.top_n = top_n
+        self.interval = interval
+        self.max_workers = max_workers
+        self.time_budget = time_budget
+        self.lookback_days = lookback_days
+        self.include_ai = include_ai
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """Warm the cache for the current top searches, stopping at the time budget"""
+        started = time.time()
+        targets = [pair for pair, _ in popular_searches(self.db_path, self.top_n, self.lookback_days)]
+        report = {"started_at": datetime.now().isoformat(), "warmed": [], "failed": [], "skipped": []}
+        if not targets:
+            self.last_run = report
+            return report
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch")
+        futures = {
+            executor.submit(warm_symbol, symbol, period, self.include_ai): (symbol, period)
+            for symbol, period in targets
+        }
+        done, pending = wait(futures, timeout=self.time_budget)
+        for future in done:
+            if future.exception() is None:
+                report["warmed"].append(futures[future])
+            else:
+                logger.warning(f"Prefetch failed for {futures[future]}: {future.exception()}")
+                report["failed"].append(futures[future])
+        # Over budget: drop work that has not started; running warm-ups finish in the background
+        for future in pending:
+            future.cancel()
+            report["skipped"].append(futures[future])
+        executor.shutdown(wait=False)
+
+        report["duration"] = time.time() - started
+        logger.info(
+            f"Prefetch warmed {len(report['warmed'])}, failed {len(report['failed'])}, "
+            f"skipped {len(report['skipped'])} in {report['duration']:.1f}s"
+        )
+        self.last_run = report
+        return report
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error in prefetch run: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the background thread (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="prefetch-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+def scheduler_from_env(db_path="data/users.json"):
+    """PrefetchScheduler configured from PREFETCH_* environment variables, or None if disabled"""
+    if os.environ.get("PREFETCH_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    return PrefetchScheduler(
+        db_path=db_path,
+        top_n=int(os.environ.get("PREFETCH_TOP_N", DEFAULT_TOP_N)),
+        interval=float(os.environ.get("PREFETCH_INTERVAL", DEFAULT_INTERVAL)),
+        max_workers=int(os.environ.get("PREFETCH_WORKERS", DEFAULT_WORKERS)),
+        time_budget=float(os.environ.get("PREFETCH_TIME_BUDGET", DEFAULT_TIME_BUDGET)),
+        lookback_days=int(os.environ.get("PREFETCH_LOOKBACK_DAYS", DEFAULT_LOOKBACK_DAYS)),
+        include_ai=os.environ.get("PREFETCH_INCLUDE_AI", "1").lower() not in ("0", "false", "no")
+    )
+
+if __name__ == "__main__":
+    # One-off warm-up, e.g. before a deploy takes traffic
+    scheduler = scheduler_from_env() or PrefetchScheduler()
+    print(scheduler.run_once())
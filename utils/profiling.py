@@ -0,0 +1,216 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# PROFILE_REQUESTS=sampling|cprofile profiles every rerun; unset, only reruns a superuser asks for
+PROFILE_MODE = os.environ.get("PROFILE_REQUESTS", "").lower()
+if PROFILE_MODE in ("1", "true", "yes"):
+    PROFILE_MODE = "sampling"
+elif PROFILE_MODE in ("0", "false", "no"):
+    PROFILE_MODE = ""
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_TOP_N = int(os.environ.get("PROFILE_TOP_N", 30))
+# Seconds between stack samples in sampling mode
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+MODES = ("sampling", "cprofile")
+
+_local = threading.local()
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+def _pstats_label(func):
+    filename, line, name = func
+    return f"{os.path.basename(filename)}:{name}:{line}" if line else name
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread, for low-overhead flame graphs"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="stack-sampler", daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed format: 'outer;...;inner count' per line"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def hotspots(self, top_n=PROFILE_TOP_N):
+        """Functions ranked by samples on top of the stack (self) and anywhere in it (total)"""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        lines = [f"{self.samples} samples every {self.interval * 1000:g}ms",
+                 f"{'self':>8} {'total':>8}  function"]
+        for frame, count in own.most_common(top_n):
+            lines.append(f"{count / self.samples:8.1%} {total[frame] / self.samples:8.1%}  {frame}")
+        return "\n".join(lines) + "\n"
+
+def collapsed_from_pstats(stats):
+    """Approximate collapsed stacks from cProfile's caller graph, splitting self time by edge share"""
+    callees = {}
+    for func, (_, _, _, cumulative, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3] / cumulative if cumulative else 0.0))
+    roots = [func for func, row in stats.stats.items() if not row[4]]
+
+    stacks = Counter()
+    def walk(func, path, share):
+        tottime = stats.stats[func][2]
+        if tottime * share >= 1e-6:
+            stacks[";".join(path)] += tottime * share
+        for callee, fraction in callees.get(func, []):
+            if callee not in stack_set and share * fraction > 1e-4:
+                stack_set.add(callee)
+                walk(callee, path + [_pstats_label(callee)], share * fraction)
+                stack_set.discard(callee)
+
+    for root in roots:
+        stack_set = {root}
+        walk(root, [_pstats_label(root)], 1.0)
+    # Microsecond weights, since flame graph tools expect integer counts
+    return "".join(f"{stack} {int(weight * 1e6)}\n" for stack, weight in stacks.most_common() if weight >= 1e-6)
+
+class RequestProfile:
+    """Profile one script rerun and write <stem>.{prof|collapsed|hotspots.txt|json} to output_dir"""
+
+    def __init__(self, mode="sampling", output_dir=PROFILE_DIR, top_n=PROFILE_TOP_N, **tags):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode {mode!r}; choose from {MODES}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.tags = tags
+        self.paths = {}
+        self._profiler = None
+        self._sampler = None
+
+    def __enter__(self):
+        self._previous = getattr(_local, "profile", None)
+        _local.profile = self
+        self._started_at = datetime.now()
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        _local.profile = self._previous
+        try:
+            self._save(duration, exc_type)
+        except Exception as e:
+            logger.error(f"Error saving profile: {str(e)}")
+        return False
+
+    def _stem(self):
+        tags = "-".join(re.sub(r"[^A-Za-z0-9.]+", "_", str(value)) for value in self.tags.values() if value)
+        return f"{self._started_at:%Y%m%d-%H%M%S-%f}-{self.mode}" + (f"-{tags}" if tags else "")
+
+    def _save(self, duration, exc_type):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = os.path.join(self.output_dir, self._stem())
+        if self._profiler is not None:
+            self.paths["profile"] = f"{stem}.prof"
+            self._profiler.dump_stats(self.paths["profile"])
+            stats = pstats.Stats(self._profiler)
+            collapsed = collapsed_from_pstats(stats)
+            report = io.StringIO()
+            stats.stream = report
+            stats.sort_stats("cumulative").print_stats(self.top_n)
+            stats.sort_stats("tottime").print_stats(self.top_n)
+            hotspots = report.getvalue()
+        else:
+            collapsed = self._sampler.collapsed()
+            hotspots = self._sampler.hotspots(self.top_n)
+
+        self.paths["collapsed"] = f"{stem}.collapsed"
+        with open(self.paths["collapsed"], "w") as f:
+            f.write(collapsed)
+        self.paths["hotspots"] = f"{stem}.hotspots.txt"
+        with open(self.paths["hotspots"], "w") as f:
+            f.write(hotspots)
+        self.paths["metadata"] = f"{stem}.json"
+        with open(self.paths["metadata"], "w") as f:
+            json.dump({
+                "started_at": self._started_at.isoformat(),
+                "mode": self.mode,
+                "duration_s": duration,
+                "tags": self.tags,
+                # Streamlit ends reruns with control-flow exceptions; record them rather than hide them
+                "exception": exc_type.__name__ if exc_type else None,
+                "files": {kind: os.path.basename(path) for kind, path in self.paths.items()}
+            }, f, indent=4)
+        logger.info(f"Saved {self.mode} profile ({duration:.2f}s) to {stem}.*")
+
+def request_profiler(mode=None, **tags):
+    """RequestProfile for this rerun if requested (or PROFILE_REQUESTS is set), else a free nullcontext"""
+    mode = mode or PROFILE_MODE
+    if not mode:
+        return nullcontext()
+    return RequestProfile(mode, **tags)
+
+def annotate_profile(**tags):
+    """Tag the profile running on this thread, e.g. with the analyzed symbol; no-op when not profiling"""
+    profile = getattr(_local, "profile", None)
+    if profile is not None:
+        profile.tags.update(tags)
+
+def list_profiles(output_dir=PROFILE_DIR, limit=20):
+    """Metadata of the most recent saved profiles, newest first"""
+    if not os.path.isdir(output_dir):
+        return []
+    profiles = []
+    for name in sorted((name for name in os.listdir(output_dir) if name.endswith(".json")), reverse=True)[:limit]:
+        try:
+            with open(os.path.join(output_dir, name)) as f:
+                profiles.append(dict(json.load(f), path=os.path.join(output_dir, name[:-len(".json")])))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable profile {name}: {str(e)}")
+    return profiles
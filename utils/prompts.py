@@ -0,0 +1,102 @@
+import json
+import math
+from .metrics import increment, get_registry
+
+# Rough size of a token for budgeting and for calls whose response carries no usage data
+CHARS_PER_TOKEN = 4
+
+# Static segments come first in every prompt, so calls share the longest possible prefix
+ANALYST_ROLE = "You are a professional financial analyst."
+JSON_ONLY = "Reply with JSON only, no markdown or other text."
+ANALYSIS_FIELDS = {
+    "summary": "concise summary of current position and outlook",
+    "strengths": ["3 strengths"],
+    "risks": ["3 risks"],
+    "recommendation": "buy/hold/sell with a brief reason",
+    "suggested_questions": ["3 follow-up questions an investor might ask"]
+}
+ANALYSIS_SCHEMA = json.dumps(ANALYSIS_FIELDS, separators=(",", ":"))
+SUGGESTION_SCHEMA = json.dumps(
+    {"suggestions": [{"ticker": "symbol", "company": "company name", "reason": "brief reason"}]},
+    separators=(",", ":")
+)
+
+def compact(text):
+    """Strip indentation and blank lines left over from triple-quoted templates"""
+    return "\n".join(line.strip() for line in text.strip().splitlines() if line.strip())
+
+def format_number(value):
+    """Short prompt form of a number: 2.95T / 350B / 12.3M / 25,000, otherwise 4 significant digits"""
+    if isinstance(value, str) or value is None:
+        return value or "N/A"
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return "N/A"
+    if not math.isfinite(value):
+        return "N/A"
+    for limit, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M")):
+        if abs(value) >= limit:
+            return f"{value / limit:.3g}{suffix}"
+    return f"{value:,.0f}" if abs(value) >= 1000 else f"{value:.4g}"
+
+def stock_facts(stock_info, metrics, symbol=False):
+    """One line of facts about a stock; symbol=True leads with the ticker for multi-stock prompts"""
+    facts = [
+        ("Company", stock_info.get("longName", "Unknown")),
+        ("Sector", stock_info.get("sector", "Unknown")),
+        ("Price", f"${format_number(stock_info.get('currentPrice'))}"),
+        ("P/E", format_number(metrics.get("PE Ratio"))),
+        ("Market cap", format_number(metrics.get("Market Cap"))),
+        ("EPS", format_number(metrics.get("EPS"))),
+        ("Dividend yield", format_number(metrics.get("Dividend Yield")))
+    ]
+    if symbol:
+        facts.insert(0, ("Symbol", stock_info.get("symbol", "Unknown")))
+    return " | ".join(f"{name}: {value}" for name, value in facts)
+
+def analysis_prompt(stock_info, metrics):
+    return compact(f"""
+        {ANALYST_ROLE} Analyze this stock and give investment insights.
+        {JSON_ONLY} Format: {ANALYSIS_SCHEMA}
+        Stock: {stock_facts(stock_info, metrics)}
+    """)
+
+def batch_analysis_prompt(stocks):
+    """One prompt for several (stock_info, metrics) pairs, answered as a JSON array"""
+    lines = "\n".join(stock_facts(stock_info, metrics, symbol=True) for stock_info, metrics in stocks)
+    return compact(f"""
+        {ANALYST_ROLE} Analyze each stock below and give investment insights.
+        {JSON_ONLY} Return a JSON array with one object per stock, in order, each with a "symbol" field plus: {ANALYSIS_SCHEMA}
+        {lines}
+    """)
+
+def follow_up_prompt(stock_info, metrics, question):
+    question = " ".join(question.split())
+    return compact(f"""
+        {ANALYST_ROLE} Answer the question about this stock in detail but concisely, sticking to what was asked.
+        Stock: {stock_facts(stock_info, metrics)}
+        Question: {question}
+    """)
+
+def suggestion_prompt(risk_profile, investment_amount, sectors=None):
+    sectors_line = f"Preferred sectors: {', '.join(sectors)}" if sectors else ""
+    return compact(f"""
+        {ANALYST_ROLE} Suggest 5 stock tickers for this investor.
+        {JSON_ONLY} Format: {SUGGESTION_SCHEMA}
+        Risk profile: {risk_profile} | Amount: ${format_number(investment_amount)}
+        {sectors_line}
+    """)
+
+def estimate_tokens(text):
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+def record_call(kind, prompt, response_text, seconds, usage=None):
+    """Export tokens in and out and latency for one model call, preferring the provider's own usage counts"""
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+    output_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(response_text)
+    increment("llm_calls", kind=kind)
+    increment("llm_prompt_tokens", prompt_tokens, kind=kind)
+    increment("llm_output_tokens", output_tokens, kind=kind)
+    get_registry().observe("llm.call", seconds, kind=kind)
+    return prompt_tokens, output_tokens
@@ -0,0 +1,218 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .metrics import increment
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open a breaker, and seconds before it lets a trial call through
+FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", 5))
+RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", 30))
+
+# Per-provider call limits: seconds before a call counts as failed, concurrent calls allowed,
+# seconds before a duplicate (hedge) request is sent for idempotent reads (None disables hedging),
+# and seconds to wait for each chunk of a streamed response (None uses the call timeout)
+PROVIDER_SETTINGS = {
+    "yahoo": {
+        "timeout": float(os.environ.get("YAHOO_TIMEOUT", 15)),
+        "max_concurrent": int(os.environ.get("YAHOO_MAX_CONCURRENT", 32)),
+        "hedge_after": float(os.environ.get("YAHOO_HEDGE_AFTER", 3)) or None
+    },
+    "gemini": {
+        "timeout": float(os.environ.get("GEMINI_TIMEOUT", 60)),
+        "max_concurrent": int(os.environ.get("GEMINI_MAX_CONCURRENT", 32)),
+        # Generation is billed per call, so Gemini requests are never duplicated
+        "hedge_after": None,
+        "chunk_timeout": float(os.environ.get("GEMINI_CHUNK_TIMEOUT", 20))
+    }
+}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_END = object()
+
+class ProviderUnavailable(Exception):
+    """Raised without calling the provider: its breaker is open or all its call slots are busy"""
+
+class CircuitBreaker:
+    """Fail fast after repeated provider failures; calls run on a bounded pool with a timeout and optional hedging"""
+
+    def __init__(self, name, timeout=30.0, max_concurrent=8, hedge_after=None, chunk_timeout=None,
+                 failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.hedge_after = hedge_after
+        self.chunk_timeout = chunk_timeout or timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._in_flight = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        # Calls that time out keep their worker until the provider gives up, so the pool size caps them
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix=f"{name}-call")
+
+    def _admit(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.time() - self.opened_at < self.reset_timeout:
+                    raise ProviderUnavailable(f"{self.name} is unavailable (circuit open after: {self.last_error})")
+                self.state = HALF_OPEN
+                logger.info(f"Circuit for {self.name} half-open, letting a trial call through")
+            if self.state == HALF_OPEN:
+                if self._trial_running:
+                    raise ProviderUnavailable(f"{self.name} is unavailable (recovery check in progress)")
+                self._trial_running = True
+            if self._in_flight >= self.max_concurrent:
+                self._trial_running = False
+                raise ProviderUnavailable(f"{self.name} is overloaded ({self._in_flight} calls in flight)")
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            self._trial_running = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Circuit for {self.name} opened: {self.last_error}")
+                    increment("circuit_opened", provider=self.name)
+                self.state = OPEN
+                self.opened_at = time.time()
+
+    def _submit(self, func, args, kwargs):
+        future = self._executor.submit(func, *args, **kwargs)
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _run(self, func, args, kwargs):
+        """First successful result of the primary call and, if it is slow, one hedge"""
+        deadline = time.monotonic() + self.timeout
+        pending = {self._submit(func, args, kwargs)}
+        hedged = self.hedge_after is None
+        error = None
+        while pending:
+            wait_for = deadline - time.monotonic()
+            if not hedged:
+                wait_for = min(wait_for, self.hedge_after)
+            done, pending = wait(pending, timeout=max(wait_for, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if time.monotonic() >= deadline:
+                break
+            if not hedged and not done:
+                hedged = True
+                with self._lock:
+                    room = self._in_flight < self.max_concurrent
+                    if room:
+                        self._in_flight += 1
+                if room:
+                    increment("provider_hedges", provider=self.name)
+                    pending.add(self._submit(func, args, kwargs))
+        if pending:
+            raise TimeoutError(f"{self.name} did not respond within {self.timeout:.0f}s")
+        raise error
+
+    def call(self, func, *args, **kwargs):
+        """func(*args, **kwargs) through the breaker; raises ProviderUnavailable without calling when open"""
+        try:
+            self._admit()
+        except ProviderUnavailable:
+            increment("provider_calls", provider=self.name, result="rejected")
+            raise
+        try:
+            result = self._run(func, args, kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            increment("provider_calls", provider=self.name, result="failure")
+            raise
+        self.record_success()
+        increment("provider_calls", provider=self.name, result="success")
+        return result
+
+    def stream(self, chunks):
+        """Yield from a streamed response opened through call(), failing the breaker if it raises or stalls
+
+        Chunks are read on a helper thread so a stalled stream is given up after chunk_timeout seconds.
+        """
+        pieces = queue.Queue()
+        stop = threading.Event()
+
+        def read():
+            try:
+                for chunk in chunks:
+                    if stop.is_set():
+                        return
+                    pieces.put((chunk, None))
+                pieces.put((_END, None))
+            except Exception as e:
+                pieces.put((None, e))
+
+        threading.Thread(target=read, name=f"{self.name}-stream", daemon=True).start()
+        try:
+            while True:
+                try:
+                    chunk, error = pieces.get(timeout=self.chunk_timeout)
+                except queue.Empty:
+                    chunk, error = None, TimeoutError(
+                        f"{self.name} stream stalled for {self.chunk_timeout:g}s")
+                if error is not None:
+                    self.record_failure(error)
+                    increment("provider_streams", provider=self.name, result="failure")
+                    raise error
+                if chunk is _END:
+                    increment("provider_streams", provider=self.name, result="success")
+                    return
+                yield chunk
+        finally:
+            # A cancelled or failed stream stops the reader at its next chunk
+            stop.set()
+
+    def status(self):
+        with self._lock:
+            return {
+                "provider": self.name,
+                "state": self.state,
+                "failures": self.failures,
+                "in_flight": self._in_flight,
+                "last_error": self.last_error,
+                "opened_at": self.opened_at
+            }
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name):
+    """The process-wide breaker for a provider named in PROVIDER_SETTINGS"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **PROVIDER_SETTINGS.get(name, {}))
+        return _breakers[name]
+
+def provider_status():
+    """Status of every breaker created so far"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.status() for breaker in breakers]
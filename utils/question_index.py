@@ -0,0 +1,127 @@
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cosine similarity at which an earlier answer is reused for a differently worded question
+SIMILARITY_THRESHOLD = float(os.environ.get("FOLLOW_UP_SIMILARITY", 0.8))
+# Seconds an answer may be reused; override per symbol with QuestionIndex.set_max_age
+MAX_AGE = float(os.environ.get("FOLLOW_UP_MAX_AGE", 6 * 60 * 60))
+MAX_QUESTIONS_PER_SYMBOL = int(os.environ.get("FOLLOW_UP_MAX_QUESTIONS", 64))
+VECTOR_DIMS = 1024
+
+# Words that carry no meaning of their own in a question about a stock
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "of", "to", "in", "on",
+    "for", "and", "or", "with", "its", "it", "this", "that", "what", "whats", "how", "me", "tell",
+    "about", "can", "you", "please", "stock", "company", "s", "who", "which", "main", "biggest", "key",
+    "major", "top"
+}
+# Spellings folded together before hashing
+SYNONYMS = {
+    "p/e ratio": "pe", "pe ratio": "pe", "p/e": "pe", "price/earnings": "pe",
+    "competitors": "competitor", "rivals": "competitor", "peers": "peer",
+    "dividends": "dividend", "risks": "risk"
+}
+
+# Questions that differ in these never share an answer, however similar the rest of the wording
+NEGATIONS = {"not", "no", "never"}
+ACTIONS = {"buy", "sell", "hold"}
+
+def _terms(text):
+    text = text.lower().replace("can't", "can not").replace("won't", "will not").replace("n't", " not")
+    for spelling, term in SYNONYMS.items():
+        text = re.sub(rf"(?<![a-z0-9]){re.escape(spelling)}(?![a-z0-9])", term, text)
+    return [word for word in re.findall(r"[a-z0-9]+", text) if word not in STOPWORDS]
+
+def question_guard(text):
+    """(negated, actions) of a question; a cached answer is only reused when these match exactly"""
+    words = set(_terms(text))
+    return bool(words & NEGATIONS), frozenset(words & ACTIONS)
+
+def question_vector(text, dims=VECTOR_DIMS):
+    """Unit-length hashed vector of a question's words, word pairs and character trigrams"""
+    words = _terms(text)
+    features = [f"w:{word}" for word in words]
+    features += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    vector = np.zeros(dims, dtype=np.float32)
+    for feature in features:
+        # crc32 rather than hash(), so vectors are the same in every process
+        digest = zlib.crc32(feature.encode("utf-8"))
+        weight = 2.0 if feature[0] == "w" else 1.0
+        vector[digest % dims] += weight if digest & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class QuestionIndex:
+    """Answered questions per symbol as rows of a vector matrix, searched by cosine similarity"""
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, max_age=MAX_AGE, max_per_symbol=MAX_QUESTIONS_PER_SYMBOL):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.max_per_symbol = max_per_symbol
+        self._max_ages = {}
+        # symbol -> {"vectors": (n, dims) array, "questions", "guards", "answers", "answered_at": lists}
+        self._symbols = {}
+        self._lock = threading.Lock()
+
+    def set_max_age(self, symbol, seconds):
+        """Freshness limit for one symbol's answers (e.g. shorter for volatile names)"""
+        self._max_ages[symbol.upper()] = seconds
+
+    def add(self, symbol, question, answer, answered_at=None):
+        vector = question_vector(question)
+        if not vector.any():
+            return
+        with self._lock:
+            entry = self._symbols.setdefault(symbol.upper(), {
+                "vectors": np.empty((0, len(vector)), dtype=np.float32),
+                "questions": [], "guards": [], "answers": [], "answered_at": []
+            })
+            entry["vectors"] = np.vstack([entry["vectors"], vector])[-self.max_per_symbol:]
+            for field, value in (("questions", question), ("guards", question_guard(question)),
+                                 ("answers", answer), ("answered_at", answered_at or time.time())):
+                entry[field] = (entry[field] + [value])[-self.max_per_symbol:]
+
+    def lookup(self, symbol, question, now=None):
+        """(answer, similarity, earlier question) for the closest fresh match above the threshold, else None"""
+        symbol = symbol.upper()
+        with self._lock:
+            entry = self._symbols.get(symbol)
+            if entry is None:
+                return None
+            vectors, questions, guards = entry["vectors"], entry["questions"], entry["guards"]
+            answers, answered_at = entry["answers"], np.array(entry["answered_at"])
+        max_age = self._max_ages.get(symbol, self.max_age)
+        scores = vectors @ question_vector(question, vectors.shape[1])
+        scores[(now or time.time()) - answered_at > max_age] = -1.0
+        # "buy" vs "sell", or "should I buy" vs "should I not buy", are different questions
+        guard = question_guard(question)
+        scores[[other != guard for other in guards]] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return answers[best], float(scores[best]), questions[best]
+
+    def clear(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._symbols.clear()
+            else:
+                self._symbols.pop(symbol.upper(), None)
+
+_index = QuestionIndex()
+
+def get_question_index():
+    """The process-wide index of answered follow-up questions"""
+    return _index
@@ -0,0 +1,180 @@
+import logging
+import os
+import numpy as np
+from .auth import AuthManager
+from .stock_data import get_multiple_stocks_data
+from .portfolio_optimizer import cached_latest_prices, update_cached_prices
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_TRADE_VALUE = 50.0
+DEFAULT_COST_BPS = 5.0
+DEFAULT_FIXED_COST = 0.0
+DEFAULT_MAX_COST_FRACTION = 0.01
+# Seconds a cached universe price may be used to plan trades before it is fetched again
+PRICE_MAX_AGE = float(os.environ.get("REBALANCE_PRICE_MAX_AGE", 15 * 60))
+
+def align_weights(current, target):
+    """Align two {asset: weight} mappings on the union of their assets"""
+    assets = list(dict.fromkeys(list(current) + list(target)))
+    current_vec = np.array([current.get(asset, 0.0) for asset in assets], dtype=np.float64)
+    target_vec = np.array([target.get(asset, 0.0) for asset in assets], dtype=np.float64)
+    return assets, current_vec, target_vec
+
+def plan_trades_batch(shares, target_weights, prices, cash=None, lot_sizes=None,
+                      min_trade_value=DEFAULT_MIN_TRADE_VALUE, cost_bps=DEFAULT_COST_BPS,
+                      fixed_cost=DEFAULT_FIXED_COST, max_cost_fraction=DEFAULT_MAX_COST_FRACTION):
+    """Share-level trades for many portfolios at once: shares/targets are (portfolios, assets)"""
+    try:
+        shares = np.atleast_2d(np.asarray(shares, dtype=np.float64))
+        target_weights = np.atleast_2d(np.asarray(target_weights, dtype=np.float64))
+        prices = np.asarray(prices, dtype=np.float64)
+        n_portfolios, n_assets = shares.shape
+        cash = np.zeros(n_portfolios) if cash is None else np.broadcast_to(np.asarray(cash, dtype=np.float64), (n_portfolios,))
+        lot_sizes = np.ones(n_assets) if lot_sizes is None else np.broadcast_to(np.asarray(lot_sizes, dtype=np.float64), (n_assets,))
+
+        values = shares * prices
+        total = values.sum(axis=1) + cash
+        target_sums = target_weights.sum(axis=1, keepdims=True)
+        targets = np.divide(target_weights, target_sums, out=np.zeros_like(target_weights), where=target_sums > 0)
+
+        # Whole lots towards the target, rounding towards zero so we never overshoot
+        desired = (targets * total[:, None] - values) / prices
+        lots = np.trunc(desired / lot_sizes)
+        trade_shares = lots * lot_sizes
+        trade_values = trade_shares * prices
+
+        # Drop trades that are too small or whose costs eat too much of the trade
+        costs = fixed_cost + np.abs(trade_values) * cost_bps / 10000
+        keep = (np.abs(trade_values) >= min_trade_value) & (costs <= max_cost_fraction * np.abs(trade_values))
+        trade_shares = np.where(keep, trade_shares, 0)
+        trade_values = trade_shares * prices
+        costs = np.where(keep, costs, 0)
+
+        # Net sells against buys: scale buys down to the cash the sells and balance provide
+        sell_proceeds = -np.where(trade_values < 0, trade_values, 0).sum(axis=1)
+        buy_values = np.where(trade_values > 0, trade_values, 0).sum(axis=1)
+        budget = cash + sell_proceeds - costs.sum(axis=1)
+        scale = np.minimum(np.divide(budget, buy_values, out=np.ones_like(budget), where=buy_values > 0), 1)
+        scale = np.maximum(scale, 0)
+        buys = trade_shares > 0
+        scaled_buys = np.floor(trade_shares * scale[:, None] / lot_sizes) * lot_sizes
+        trade_shares = np.where(buys, scaled_buys, trade_shares)
+        trade_values = trade_shares * prices
+        costs = np.where(trade_shares != 0, fixed_cost + np.abs(trade_values) * cost_bps / 10000, 0)
+
+        new_values = values + trade_values
+        new_cash = cash - trade_values.sum(axis=1) - costs.sum(axis=1)
+        new_total = new_values.sum(axis=1) + new_cash
+        safe_total = np.where(total > 0, total, 1)[:, None]
+
+        return {
+            "trade_shares": trade_shares,
+            "trade_values": trade_values,
+            "costs": costs,
+            "current_weights": values / safe_total,
+            "target_weights": targets,
+            "new_weights": new_values / np.where(new_total > 0, new_total, 1)[:, None],
+            "ending_cash": new_cash
+        }
+    except Exception as e:
+        logger.error(f"Error planning trades: {str(e)}")
+        raise Exception(f"Failed to plan trades: {str(e)}")
+
+def plan_trades(holdings, target_allocation, prices, cash=0.0, lot_sizes=None, **kwargs):
+    """Share-level trade list turning {symbol: shares} holdings into a target {symbol: weight} allocation"""
+    try:
+        assets, shares, targets = align_weights(holdings, target_allocation)
+        missing = [asset for asset in assets if asset not in prices]
+        if missing:
+            raise ValueError(f"No price available for: {', '.join(missing)}")
+
+        price_vec = np.array([prices[asset] for asset in assets], dtype=np.float64)
+        lots = None if lot_sizes is None else [lot_sizes.get(asset, 1) for asset in assets]
+        plan = plan_trades_batch(shares, targets, price_vec, cash, lots, **kwargs)
+        return _trade_list(assets, price_vec, plan, 0), float(plan["ending_cash"][0])
+    except Exception as e:
+        logger.error(f"Error planning trades: {str(e)}")
+        raise Exception(f"Failed to plan trades: {str(e)}")
+
+def _trade_list(assets, prices, plan, row):
+    """Non-zero trades of one portfolio as a list of dicts"""
+    trades = []
+    for i in np.flatnonzero(plan["trade_shares"][row]):
+        trades.append({
+            "symbol": assets[i],
+            "action": "buy" if plan["trade_shares"][row, i] > 0 else "sell",
+            "shares": float(abs(plan["trade_shares"][row, i])),
+            "price": float(prices[i]),
+            "value": float(abs(plan["trade_values"][row, i])),
+            "cost": float(plan["costs"][row, i]),
+            "current_weight": float(plan["current_weights"][row, i]),
+            "target_weight": float(plan["target_weights"][row, i]),
+            "new_weight": float(plan["new_weights"][row, i])
+        })
+    return trades
+
+def get_latest_prices(symbols, max_age=PRICE_MAX_AGE):
+    """Latest closing prices, preferring recent optimizer universe prices over a fresh fetch
+
+    Fetched prices are passed back to the cached universes so the optimizer sees today's returns.
+    """
+    prices = cached_latest_prices(max_age)
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        stock_data = get_multiple_stocks_data(missing, '5d')
+        fetched = {symbol: float(data['history']['Close'].iloc[-1]) for symbol, data in stock_data.items()}
+        update_cached_prices(fetched)
+        prices.update(fetched)
+    return {symbol: prices[symbol] for symbol in symbols if symbol in prices}
+
+def rebalance_all_portfolios(db_path="data/users.json", prices=None, **kwargs):
+    """Plan trades for every saved portfolio with holdings and a target allocation in one pass"""
+    try:
+        portfolios = [
+            (username, portfolio)
+            for username, portfolio in AuthManager(db_path).iter_user_portfolios()
+            if isinstance(portfolio, dict) and portfolio.get("holdings") and portfolio.get("target_allocation")
+        ]
+        if not portfolios:
+            return {}
+
+        assets = list(dict.fromkeys(
+            symbol for _, portfolio in portfolios
+            for symbol in list(portfolio["holdings"]) + list(portfolio["target_allocation"])
+        ))
+        prices = prices or get_latest_prices(assets)
+        priced = [asset for asset in assets if asset in prices]
+        if len(priced) < len(assets):
+            logger.warning(f"Skipping unpriced assets: {sorted(set(assets) - set(priced))}")
+        column = {asset: i for i, asset in enumerate(priced)}
+
+        # One (portfolios x assets) matrix per input so the whole batch is planned together
+        shares = np.zeros((len(portfolios), len(priced)))
+        targets = np.zeros((len(portfolios), len(priced)))
+        cash = np.zeros(len(portfolios))
+        for row, (_, portfolio) in enumerate(portfolios):
+            for symbol, count in portfolio["holdings"].items():
+                if symbol in column:
+                    shares[row, column[symbol]] = count
+            for symbol, weight in portfolio["target_allocation"].items():
+                if symbol in column:
+                    targets[row, column[symbol]] = weight
+            cash[row] = portfolio.get("cash", 0.0)
+
+        price_vec = np.array([prices[asset] for asset in priced], dtype=np.float64)
+        plan = plan_trades_batch(shares, targets, price_vec, cash, **kwargs)
+
+        results = {}
+        for row, (username, _) in enumerate(portfolios):
+            results[username] = {
+                "trades": _trade_list(priced, price_vec, plan, row),
+                "ending_cash": float(plan["ending_cash"][row])
+            }
+        logger.info(f"Planned rebalancing for {len(results)} portfolios")
+        return results
+    except Exception as e:
+        logger.error(f"Error rebalancing portfolios: {str(e)}")
+        raise Exception(f"Failed to rebalance portfolios: {str(e)}")
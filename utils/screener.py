@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from .analysis_cache import cached_stock_data, cached_indicators
+from .stock_data import get_key_metrics
+from .symbol_directory import get_symbol_directory
+from .metrics import span
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Numeric snapshot columns and their display labels
+NUMERIC_COLUMNS = {
+    "price": "Price",
+    "change_pct": "Period Change %",
+    "rsi": "RSI",
+    "sma_20": "SMA 20",
+    "sma_50": "SMA 50",
+    "price_vs_sma_50": "Price vs SMA 50 %",
+    "market_cap": "Market Cap",
+    "pe_ratio": "PE Ratio",
+    "eps": "EPS",
+    "dividend_yield": "Dividend Yield",
+    "volume": "Volume",
+    "pct_below_52w_high": "% Below 52W High"
+}
+CATEGORY_COLUMNS = {"sector": "Sector", "exchange": "Exchange"}
+KEY_METRIC_COLUMNS = {
+    "market_cap": "Market Cap",
+    "pe_ratio": "PE Ratio",
+    "eps": "EPS",
+    "dividend_yield": "Dividend Yield",
+    "volume": "Volume"
+}
+OPERATORS = ["<", "<=", ">", ">=", "between"]
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value if np.isfinite(value) else np.nan
+
+def snapshot_row(symbol, indicators, info):
+    """Latest indicator values and key metrics for one symbol as a flat dict"""
+    close = indicators["Close"]
+    latest = indicators.iloc[-1]
+    metrics = get_key_metrics(info, numeric=True)
+    row = {"symbol": symbol, "sector": info.get("sector") or "", "exchange": info.get("exchange") or ""}
+    row.update({column: _number(metrics.get(label)) for column, label in KEY_METRIC_COLUMNS.items()})
+    row["price"] = _number(latest["Close"])
+    row["change_pct"] = _number((close.iloc[-1] / close.iloc[0] - 1) * 100) if len(close) > 1 else np.nan
+    row["rsi"] = _number(latest.get("RSI"))
+    row["sma_20"] = _number(latest.get("SMA_20"))
+    row["sma_50"] = _number(latest.get("SMA_50"))
+    row["price_vs_sma_50"] = (row["price"] / row["sma_50"] - 1) * 100 if row["sma_50"] else np.nan
+    high = _number(metrics.get("52 Week High"))
+    row["pct_below_52w_high"] = (1 - row["price"] / high) * 100 if high else np.nan
+    return row
+
+class ScreenerSnapshot:
+    """Columnar snapshot of the universe with a sorted index per numeric column and a bitmap per category"""
+
+    def __init__(self, rows, built_at=None):
+        self.built_at = built_at or time.time()
+        self.symbols = np.array([row["symbol"] for row in rows], dtype=object)
+        self.numeric = {
+            column: np.array([row.get(column, np.nan) for row in rows], dtype=np.float64)
+            for column in NUMERIC_COLUMNS
+        }
+        self.categories = {
+            column: np.array([row.get(column) or "" for row in rows], dtype=object)
+            for column in CATEGORY_COLUMNS
+        }
+        # Row numbers ordered by value with NaNs dropped, and the matching sorted values
+        self._order = {}
+        self._sorted = {}
+        for column, values in self.numeric.items():
+            order = np.argsort(values, kind="stable")
+            valid = order[~np.isnan(values[order])]
+            self._order[column] = valid
+            self._sorted[column] = values[valid]
+        self._bitmaps = {
+            column: {value: values == value for value in np.unique(values) if value}
+            for column, values in self.categories.items()
+        }
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def category_values(self, column):
+        return sorted(self._bitmaps[column])
+
+    def _range_mask(self, column, op, value):
+        """Rows satisfying `column op value`, found by binary search on the sorted index"""
+        sorted_values, order = self._sorted[column], self._order[column]
+        if op in ("<", "<="):
+            end = np.searchsorted(sorted_values, value, side="left" if op == "<" else "right")
+            rows = order[:end]
+        elif op in (">", ">="):
+            start = np.searchsorted(sorted_values, value, side="right" if op == ">" else "left")
+            rows = order[start:]
+        elif op == "between":
+            low, high = value
+            rows = order[np.searchsorted(sorted_values, low, "left"):np.searchsorted(sorted_values, high, "right")]
+        else:
+            raise ValueError(f"Unknown comparison {op!r}")
+        mask = np.zeros(len(self), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def filter_mask(self, filters):
+        """AND of (column, op, value) filters; categories take op 'in' with a list of values"""
+        mask = np.ones(len(self), dtype=bool)
+        for column, op, value in filters:
+            if column in self._bitmaps:
+                if op != "in":
+                    raise ValueError(f"Category column {column} only supports 'in'")
+                allowed = np.zeros(len(self), dtype=bool)
+                for item in value:
+                    bitmap = self._bitmaps[column].get(item)
+                    if bitmap is not None:
+                        allowed |= bitmap
+                mask &= allowed
+            elif column in self._order:
+                mask &= self._range_mask(column, op, value)
+            else:
+                raise ValueError(f"Unknown screener column {column!r}")
+        return mask
+
+    @span("ScreenerSnapshot.query")
+    def query(self, filters=(), sort_by="market_cap", descending=True, limit=50):
+        """Matching rows ranked by sort_by (missing values last), as a DataFrame indexed by symbol
+
+        attrs["matches"] holds the number of matching rows before `limit` is applied.
+        """
+        mask = self.filter_mask(filters)
+        ranked = self._order[sort_by]
+        ranked = ranked[mask[ranked]]
+        if descending:
+            ranked = ranked[::-1]
+        unranked = np.flatnonzero(mask & np.isnan(self.numeric[sort_by]))
+        rows = np.concatenate([ranked, unranked])[:limit]
+        results = pd.DataFrame(
+            {
+                **{column: values[rows] for column, values in self.categories.items()},
+                **{column: values[rows] for column, values in self.numeric.items()}
+            },
+            index=pd.Index(self.symbols[rows], name="symbol")
+        )
+        # Every match, not just the `limit` rows returned
+        results.attrs["matches"] = int(mask.sum())
+        return results
+
+    def to_frame(self):
+        return pd.DataFrame({**self.categories, **self.numeric}, index=pd.Index(self.symbols, name="symbol"))
+
+@span("build_snapshot")
+def build_snapshot(symbols, period="1y", max_workers=8):
+    """Snapshot from the shared analysis cache; symbols that fail to load are skipped"""
+    directory = get_symbol_directory()
+
+    def load(symbol):
+        try:
+            _, info = cached_stock_data(symbol, period)
+            row = snapshot_row(symbol, cached_indicators(symbol, period), info)
+            listing = directory.lookup(symbol) or {}
+            row["sector"] = row["sector"] or listing.get("sector", "")
+            row["exchange"] = listing.get("exchange") or row["exchange"]
+            return row
+        except Exception as e:
+            logger.warning(f"Screener skipped {symbol}: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="screener") as executor:
+        rows = [row for row in executor.map(load, symbols) if row is not None]
+    logger.info(f"Screener snapshot built with {len(rows)} of {len(symbols)} symbols")
+    return ScreenerSnapshot(rows)
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+# Future of the build in progress, shared by everyone who asks for a refresh meanwhile
+_refresh = None
+
+def get_snapshot():
+    """The last snapshot built by refresh_snapshot, or None"""
+    return _snapshot
+
+def refresh_in_progress():
+    return _refresh is not None
+
+def _run_refresh(future, symbols, period, max_workers):
+    global _snapshot, _refresh
+    try:
+        if symbols is None:
+            symbols = get_symbol_directory().symbols()
+        snapshot = build_snapshot(symbols, period, max_workers)
+        with _snapshot_lock:
+            _snapshot = snapshot
+        future.set_result(snapshot)
+    except Exception as e:
+        logger.error(f"Error refreshing screener snapshot: {str(e)}")
+        future.set_exception(e)
+    finally:
+        with _snapshot_lock:
+            _refresh = None
+
+def refresh_snapshot(symbols=None, period="1y", max_workers=8, wait=True):
+    """Rebuild the shared snapshot (defaults to every symbol in the symbol directory)
+
+    Only one build runs at a time: callers arriving during a build share its result. With
+    wait=False the build runs on a background thread and its Future is returned at once.
+    """
+    global _refresh
+    with _snapshot_lock:
+        future = _refresh
+        owner = future is None
+        if owner:
+            future = _refresh = Future()
+    if owner:
+        if wait:
+            _run_refresh(future, symbols, period, max_workers)
+        else:
+            threading.Thread(target=_run_refresh, args=(future, symbols, period, max_workers),
+                             name="screener-refresh", daemon=True).start()
+    return future.result() if wait else future
@@ -1,25 +1,113 @@
+import math
 import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
+from .metrics import span
+from .provider_health import get_breaker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_stock_data(symbol, period='1y'):
-    """Fetch stock data from Yahoo Finance"""
+# Columns no page uses; dropped as soon as a history is downloaded
+UNUSED_COLUMNS = ['Dividends', 'Stock Splits', 'Capital Gains']
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+# Below this, float32 keeps prices within a tenth of a cent (Yahoo's own quotes are float32-precision)
+FLOAT32_PRICE_LIMIT = 2 ** 15
+INT32_MAX = 2 ** 31 - 1
+
+# Intraday bar sizes and the longest period Yahoo serves for each
+INTRADAY_FETCH_PERIODS = {'1m': '7d', '5m': '60d', '15m': '60d', '30m': '60d', '1h': '730d'}
+PERIOD_DAYS = {'1d': 1, '5d': 5, '7d': 7, '1mo': 31, '60d': 60, '3mo': 92, '6mo': 183, '1y': 366,
+               '730d': 730, '2y': 731, '5y': 1827, '10y': 3653}
+
+def yahoo_price_provider(symbol, period, interval='1d'):
+    """Default price provider: (history, info) from Yahoo Finance"""
+    stock = yf.Ticker(symbol)
+    return stock.history(period=period, interval=interval), stock.info
+
+def yahoo_info_provider(symbol):
+    """Default fundamentals provider: the Ticker.info dict alone, without a price download"""
+    return yf.Ticker(symbol).info
+
+_price_provider = yahoo_price_provider
+_info_provider = yahoo_info_provider
+
+def set_price_provider(provider=None, info_provider=None):
+    """Swap the (symbol, period, interval) -> (history, info) source, e.g. for offline load tests; None restores Yahoo
+
+    info_provider (symbol -> info) defaults to the info half of a short download from provider.
+    """
+    global _price_provider, _info_provider
+    _price_provider = provider or yahoo_price_provider
+    if info_provider is None and provider is not None:
+        info_provider = lambda symbol: provider(symbol, '5d')[1]
+    _info_provider = info_provider or yahoo_info_provider
+
+@span("get_stock_info")
+def get_stock_info(symbol):
+    """Fetch only the company info / fundamentals dict for symbol"""
+    try:
+        return get_breaker("yahoo").call(_info_provider, symbol)
+    except Exception as e:
+        logger.error(f"Error fetching info for {symbol}: {str(e)}")
+        raise Exception(f"Error fetching info for {symbol}: {str(e)}")
+
+def compact_history(hist):
+    """Drop unused columns and downcast prices to float32 / volume to int32 where no precision is lost"""
+    hist = hist.drop(columns=[col for col in UNUSED_COLUMNS if col in hist.columns])
+    prices = [col for col in PRICE_COLUMNS if col in hist.columns]
+    if prices and len(hist) and hist[prices].abs().max().max() < FLOAT32_PRICE_LIMIT:
+        hist[prices] = hist[prices].astype('float32')
+    if 'Volume' in hist.columns and len(hist) and hist['Volume'].notna().all():
+        volume = hist['Volume']
+        if volume.min() >= 0 and volume.max() <= INT32_MAX and (volume % 1 == 0).all():
+            hist['Volume'] = volume.astype('int32')
+    return hist
+
+@span("get_stock_data")
+def get_stock_data(symbol, period='1y', interval='1d'):
+    """Fetch stock data from Yahoo Finance; intraday intervals (1m/5m/15m/30m/1h) go through the on-disk store"""
     try:
         logger.info(f"Fetching data for symbol: {symbol}")
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period=period)
-        info = stock.info
+        if interval in INTRADAY_FETCH_PERIODS:
+            hist, info = get_intraday_data(symbol, period, interval)
+        else:
+            hist, info = get_breaker("yahoo").call(_price_provider, symbol, period)
+            hist = compact_history(hist)
         logger.info(f"Successfully fetched data for {symbol}")
         return hist, info
     except Exception as e:
         logger.error(f"Error fetching stock data for {symbol}: {str(e)}")
         raise Exception(f"Error fetching stock data for {symbol}: {str(e)}")
 
+def get_intraday_data(symbol, period, interval):
+    """Download the latest bars Yahoo allows, merge them into the store and return the requested period
+
+    Yahoo only serves a few days of minute bars, so periods longer than that are filled from
+    earlier downloads kept in the store.
+    """
+    from .history_store import get_history_store
+    days = PERIOD_DAYS.get(period)
+    fetch_period = INTRADAY_FETCH_PERIODS[interval]
+    if days is not None and days <= PERIOD_DAYS[fetch_period]:
+        fetch_period = period
+    bars, info = get_breaker("yahoo").call(_price_provider, symbol, fetch_period, interval)
+    bars = compact_history(bars)
+    store = get_history_store()
+    store.append(symbol, interval, bars)
+    if fetch_period == period:
+        return bars, info
+    # Longer than one download ('max' and other open-ended periods: everything stored)
+    start = bars.index[-1] - timedelta(days=days) if days is not None and len(bars) else None
+    return store.load(symbol, interval, start=start), info
+
+def iter_history_windows(symbol, interval='1m', window=50_000, start=None, end=None, columns=None, overlap=0):
+    """Stored bars for symbol in fixed-size windows, for long histories that should not be loaded at once"""
+    from .history_store import get_history_store
+    return get_history_store().iter_windows(symbol, interval, window, start, end, columns, overlap)
+
 def get_multiple_stocks_data(symbols, period='5y'):
     """Fetch data for multiple stocks"""
     try:
@@ -43,22 +131,43 @@ def get_multiple_stocks_data(symbols, period='5y'):
         logger.error(f"Error in get_multiple_stocks_data: {str(e)}")
         raise Exception(f"Error fetching multiple stocks data: {str(e)}")
 
-def get_key_metrics(info):
-    """Extract key financial metrics"""
+# Display name -> Ticker.info field, in display order
+KEY_METRIC_FIELDS = {
+    'Market Cap': 'marketCap',
+    'PE Ratio': 'trailingPE',
+    'EPS': 'trailingEps',
+    '52 Week High': 'fiftyTwoWeekHigh',
+    '52 Week Low': 'fiftyTwoWeekLow',
+    'Dividend Yield': 'dividendYield',
+    'Volume': 'volume',
+}
+
+def _metric_number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+    return value if math.isfinite(value) else float('nan')
+
+def get_key_metrics(info, numeric=False):
+    """Extract key financial metrics; numeric=True gives floats with NaN for missing values instead of 'N/A'"""
     try:
-        metrics = {
-            'Market Cap': info.get('marketCap', 'N/A'),
-            'PE Ratio': info.get('trailingPE', 'N/A'),
-            'EPS': info.get('trailingEps', 'N/A'),
-            '52 Week High': info.get('fiftyTwoWeekHigh', 'N/A'),
-            '52 Week Low': info.get('fiftyTwoWeekLow', 'N/A'),
-            'Dividend Yield': info.get('dividendYield', 'N/A'),
-            'Volume': info.get('volume', 'N/A'),
-        }
-        return metrics
+        if numeric:
+            return {metric: _metric_number(info.get(field)) for metric, field in KEY_METRIC_FIELDS.items()}
+        return {metric: info.get(field, 'N/A') for metric, field in KEY_METRIC_FIELDS.items()}
     except Exception as e:
         logger.error(f"Error extracting metrics: {str(e)}")
-        return {metric: 'N/A' for metric in ['Market Cap', 'PE Ratio', 'EPS', '52 Week High', '52 Week Low', 'Dividend Yield', 'Volume']}
+        return {metric: float('nan') if numeric else 'N/A' for metric in KEY_METRIC_FIELDS}
+
+def format_metric(metric, value):
+    """Display string for one key metric value (numeric or legacy 'N/A')"""
+    if not isinstance(value, (int, float)) or pd.isna(value):
+        return 'N/A' if not isinstance(value, str) else value
+    if metric == 'Market Cap':
+        return format_large_number(value)
+    if metric == 'Volume':
+        return f'{value:,.0f}'
+    return f'{value:,.2f}'
 
 def format_large_number(num):
     """Format large numbers for display"""
@@ -78,6 +187,7 @@ def format_large_number(num):
         logger.error(f"Error formatting number: {str(e)}")
         return 'N/A'
 
+@span("calculate_technical_indicators")
 def calculate_technical_indicators(df):
     """Calculate technical indicators for the stock"""
     try:
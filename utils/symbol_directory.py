@@ -0,0 +1,125 @@
+import csv
+import logging
+import os
+import re
+import threading
+from bisect import bisect_left
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SYMBOLS_PATH = os.environ.get("SYMBOL_DIRECTORY_PATH", "data/symbols.csv")
+FIELDS = ["symbol", "name", "exchange", "sector"]
+
+def normalize_symbol(symbol):
+    """Uppercase ticker in Yahoo's spelling (BRK.B -> BRK-B)"""
+    return (symbol or "").strip().upper().replace(".", "-")
+
+class SymbolDirectory:
+    """Symbol master held as sorted arrays: O(log n) lookups and prefix searches by ticker or company name"""
+
+    def __init__(self, records):
+        by_symbol = {}
+        for record in records:
+            symbol = normalize_symbol(record.get("symbol"))
+            if symbol:
+                by_symbol[symbol] = {field: (record.get(field) or "").strip() for field in FIELDS}
+                by_symbol[symbol]["symbol"] = symbol
+        self._symbols = sorted(by_symbol)
+        self._records = [by_symbol[symbol] for symbol in self._symbols]
+        # (lowercase word of the company name, position in _symbols), for "apple" -> AAPL
+        self._name_words = sorted(
+            (word, position)
+            for position, record in enumerate(self._records)
+            for word in set(re.findall(r"[a-z0-9&]+", record["name"].lower()))
+        )
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline="") as f:
+            return cls(list(csv.DictReader(f)))
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def _position(self, symbol):
+        symbol = normalize_symbol(symbol)
+        position = bisect_left(self._symbols, symbol)
+        if position < len(self._symbols) and self._symbols[position] == symbol:
+            return position
+        return None
+
+    def symbols(self):
+        return list(self._symbols)
+
+    def contains(self, symbol):
+        return self._position(symbol) is not None
+
+    def lookup(self, symbol):
+        """Record for symbol, or None if it is not listed"""
+        position = self._position(symbol)
+        return dict(self._records[position]) if position is not None else None
+
+    def search(self, query, limit=10):
+        """Type-ahead matches: ticker prefixes first (exact match on top), then company-name word prefixes"""
+        query = (query or "").strip()
+        if not query:
+            return []
+        positions = []
+
+        prefix = normalize_symbol(query)
+        start = bisect_left(self._symbols, prefix)
+        for position in range(start, len(self._symbols)):
+            if len(positions) >= limit or not self._symbols[position].startswith(prefix):
+                break
+            positions.append(position)
+
+        word = query.lower()
+        start = bisect_left(self._name_words, (word, -1))
+        for index in range(start, len(self._name_words)):
+            if len(positions) >= limit or not self._name_words[index][0].startswith(word):
+                break
+            if self._name_words[index][1] not in positions:
+                positions.append(self._name_words[index][1])
+        return [dict(self._records[position]) for position in positions]
+
+_directory = None
+_directory_mtime = None
+_directory_lock = threading.Lock()
+
+def get_symbol_directory(path=SYMBOLS_PATH):
+    """Shared directory for path, rebuilt when the file changes on disk (no network involved)"""
+    global _directory, _directory_mtime
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError as e:
+        logger.error(f"Symbol directory unavailable: {str(e)}")
+        return _directory or SymbolDirectory([])
+    with _directory_lock:
+        if _directory is None or mtime != _directory_mtime:
+            _directory = SymbolDirectory.from_csv(path)
+            _directory_mtime = mtime
+            logger.info(f"Loaded {len(_directory)} symbols from {path}")
+        return _directory
+
+def refresh_from_file(source, path=SYMBOLS_PATH):
+    """Replace the symbol master with the rows of another CSV (symbol,name,exchange,sector columns)"""
+    try:
+        directory = SymbolDirectory.from_csv(source)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(directory._records)
+        os.replace(tmp_path, path)
+        logger.info(f"Symbol directory refreshed with {len(directory)} symbols from {source}")
+        return len(directory)
+    except Exception as e:
+        logger.error(f"Error refreshing symbol directory: {str(e)}")
+        raise Exception(f"Error refreshing symbol directory: {str(e)}")
+
+if __name__ == "__main__":
+    # e.g. python -m utils.symbol_directory exported_listing.csv
+    import sys
+    print(f"{refresh_from_file(sys.argv[1])} symbols written to {SYMBOLS_PATH}")
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+SECTORS = ["Technology", "Healthcare", "Financial Services", "Consumer Cyclical", "Energy"]
+SEARCH_PERIODS = ["1mo", "3mo", "6mo", "1y", "2y", "5y"]
+
+def generate_ohlcv(n_days=252, seed=0, start_price=100.0, annual_drift=0.08, annual_volatility=0.25,
+                   end_date="2024-12-31", freq="B"):
+    """Synthetic OHLCV history shaped like yfinance's Ticker.history output (daily unless freq says otherwise)"""
+    rng = np.random.default_rng(seed)
+    # Drift and volatility per bar; n_days counts bars when freq is intraday
+    bars_per_year = 252
+    if freq != "B":
+        bars_per_year *= 390 / (pd.Timedelta(pd.tseries.frequencies.to_offset(freq)) / pd.Timedelta(minutes=1))
+    daily_returns = rng.normal(annual_drift / bars_per_year, annual_volatility / np.sqrt(bars_per_year), n_days)
+    close = start_price * np.exp(np.cumsum(daily_returns))
+    open_ = close * np.exp(rng.normal(0, annual_volatility / np.sqrt(bars_per_year) / 2, n_days))
+    spread = np.abs(rng.normal(0, annual_volatility / np.sqrt(bars_per_year), n_days))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(mean=15, sigma=0.4, size=n_days).astype(np.int64)
+
+    index = pd.date_range(end=end_date, periods=n_days, freq=freq, tz="America/New_York", name="Date")
+    return pd.DataFrame({
+        "Open": open_,
+        "High": high,
+        "Low": low,
+        "Close": close,
+        "Volume": volume,
+        "Dividends": 0.0,
+        "Stock Splits": 0.0
+    }, index=index)
+
+def generate_stock_info(symbol, hist, seed=0):
+    """Synthetic Ticker.info dict consistent with a generated history"""
+    rng = np.random.default_rng(seed)
+    close = hist["Close"]
+    price = float(close.iloc[-1])
+    eps = float(rng.uniform(1, 10))
+    return {
+        "symbol": symbol,
+        "longName": f"{symbol} Holdings Inc.",
+        "sector": SECTORS[seed % len(SECTORS)],
+        "industry": "Synthetic",
+        "currentPrice": price,
+        "regularMarketChangePercent": float((close.iloc[-1] / close.iloc[-2] - 1) * 100) if len(close) > 1 else 0.0,
+        "marketCap": float(price * rng.uniform(1e8, 1e10)),
+        "trailingPE": price / eps,
+        "trailingEps": eps,
+        "fiftyTwoWeekHigh": float(close.tail(252).max()),
+        "fiftyTwoWeekLow": float(close.tail(252).min()),
+        "dividendYield": float(rng.uniform(0, 0.04)),
+        "volume": int(hist["Volume"].iloc[-1])
+    }
+
+def generate_universe(n_symbols=4, n_days=252, seed=0):
+    """{symbol: {'history', 'info'}} in the shape returned by get_multiple_stocks_data"""
+    data = {}
+    for i in range(n_symbols):
+        symbol = f"SYN{i:03d}"
+        hist = generate_ohlcv(n_days, seed=seed + i, start_price=50.0 + 10 * i)
+        data[symbol] = {"history": hist, "info": generate_stock_info(symbol, hist, seed=seed + i)}
+    return data
+
+def generate_users_db(n_users, searches_per_user=5, chat_messages=100, seed=0, password="benchmark"):
+    """Synthetic users.json contents with n_users accounts, all sharing one password"""
+    rng = np.random.default_rng(seed)
+    password_hash = hashlib.sha256(password.encode()).hexdigest()
+    symbols = ["AAPL", "MSFT", "META", "GOOG", "AMZN", "NVDA", "COST", "QQQ"]
+    now = datetime(2024, 12, 31)
+
+    users = {}
+    for i in range(n_users):
+        users[f"user{i}"] = {
+            "password": password_hash,
+            "created_at": now.isoformat(),
+            "last_login": None,
+            "search_history": [
+                {
+                    "timestamp": (now - timedelta(minutes=int(minutes))).isoformat(),
+                    "symbol": symbols[symbol],
+                    "period": SEARCH_PERIODS[period]
+                }
+                for minutes, symbol, period in zip(
+                    rng.integers(0, 60 * 24 * 30, searches_per_user),
+                    rng.integers(0, len(symbols), searches_per_user),
+                    rng.integers(0, len(SEARCH_PERIODS), searches_per_user)
+                )
+            ],
+            "portfolio": [],
+            "goals": []
+        }
+
+    messages = [
+        {"id": i, "username": f"user{i % max(n_users, 1)}", "message": f"Message {i}",
+         "timestamp": (now - timedelta(minutes=chat_messages - i)).isoformat()}
+        for i in range(chat_messages)
+    ]
+    return {"users": users, "chat_messages": messages, "chat_next_id": chat_messages, "notifications": {}}
+
+PERIOD_DAYS = {"1d": 1, "5d": 5, "7d": 5, "1mo": 21, "60d": 42, "3mo": 63, "6mo": 126, "1y": 252, "730d": 504,
+               "2y": 504, "5y": 1260, "10y": 2520, "max": 2520}
+# Regular-session bars per trading day; synthetic intraday bars run around the clock for simplicity
+INTRADAY_BARS_PER_DAY = {"1m": 390, "5m": 78, "15m": 26, "30m": 13, "1h": 7}
+INTRADAY_FREQ = {"1m": "min", "5m": "5min", "15m": "15min", "30m": "30min", "1h": "h"}
+
+class SyntheticPriceProvider:
+    """Drop-in for stock_data.set_price_provider: deterministic histories per symbol, optional fake latency"""
+
+    def __init__(self, latency=0.0, intraday_end="2024-12-31 16:00"):
+        self.latency = latency
+        self.intraday_end = intraday_end
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, symbol, period, interval="1d"):
+        if self.latency:
+            time.sleep(self.latency)
+        key = (symbol, period, interval)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is None:
+            seed = zlib.crc32(symbol.encode())
+            days = PERIOD_DAYS.get(period, 252)
+            if interval in INTRADAY_BARS_PER_DAY:
+                hist = generate_ohlcv(days * INTRADAY_BARS_PER_DAY[interval], seed=seed, start_price=20.0 + seed % 400,
+                                      freq=INTRADAY_FREQ[interval], end_date=self.intraday_end)
+            else:
+                hist = generate_ohlcv(days, seed=seed, start_price=20.0 + seed % 400)
+            cached = (hist, generate_stock_info(symbol, hist, seed=seed))
+            with self._lock:
+                self._cache[key] = cached
+        # Fresh copies, like a real download
+        return cached[0].copy(), dict(cached[1])
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Stand-in for a Gemini GenerativeModel that returns well-formed analyses after a fixed latency
+
+    Batched prompts (asking for a JSON array) get one analysis per "Symbol:" entry, follow-up
+    questions a short prose answer, and stream=True yields the text in pieces.
+    """
+
+    def __init__(self, model_name="stub", latency=0.0):
+        self.model_name = model_name
+        self.latency = latency
+        self.calls = 0
+        self.prompt_chars = 0
+
+    @staticmethod
+    def _analysis():
+        return {
+            "summary": "Synthetic analysis for load testing.",
+            "strengths": ["Stable synthetic cash flows"],
+            "risks": ["Synthetic volatility"],
+            "recommendation": "Hold - generated by the stub model.",
+            "suggested_questions": ["What drives the synthetic price?"]
+        }
+
+    def _text(self, prompt):
+        if "Question:" in prompt:
+            return ("Synthetic answer for load testing: the stub model has no view on this stock, "
+                    "but a real model would discuss its valuation, growth and risks here.")
+        if "JSON array" in prompt:
+            symbols = re.findall(r"Symbol: ([^\s|]+)", prompt)
+            return json.dumps([dict(self._analysis(), symbol=symbol) for symbol in symbols])
+        return json.dumps(self._analysis())
+
+    def _stream(self, text, pieces=8):
+        # The latency is spread over the pieces, like tokens arriving from a real model
+        size = -(-len(text) // pieces)
+        for start in range(0, len(text), size):
+            if self.latency:
+                time.sleep(self.latency / pieces)
+            yield _StubResponse(text[start:start + size])
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        if stream:
+            return self._stream(self._text(prompt))
+        if self.latency:
+            time.sleep(self.latency)
+        return _StubResponse(self._text(prompt))
+
+def stub_llm_provider(latency=0.0):
+    """Drop-in for ai_advisor.set_llm_provider"""
+    return lambda model_name: StubModel(model_name, latency)